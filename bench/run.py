@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+run.py
+
+Benchmarks each stage of the pipeline against synthetic franchises at
+several scales and records wall time, CPU time and peak memory.
+
+    $ python bench/run.py                       # 1x, 10x and 100x
+    $ python bench/run.py --scales 1 10 --stages join genders
+    $ python bench/run.py --compare bench/results/a.json bench/results/b.json
+
+Each stage runs its module in a fresh interpreter, with the synthetic
+project as its working directory. Peak memory is reported for that
+interpreter (`own_rss_kb`) and for the largest worker process it started
+(`children_rss_kb`), and as their sum in `peak_rss_kb`, so a stage that
+hands its work to a pool is not reported at the size of its parent alone.
+
+Results are written to bench/results/<commit>.json so runs from
+different commits can be compared.
+"""
+import argparse
+import os
+import resource
+import runpy
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import ujson as json
+
+import synthetic
+
+ROOT = synthetic.ROOT
+WORK_DIR = os.path.join(ROOT, 'bench', '.work')
+RESULTS_DIR = os.path.join(ROOT, 'bench', 'results')
+
+SCALES = [1, 10, 100]
+
+STAGES = [
+    ('join', 'law_and_order.join'),
+    ('entities', 'law_and_order.entities'),
+    ('genders', 'law_and_order.genders'),
+    ('crimes', 'law_and_order.crimes'),
+    ('vectorize', 'law_and_order.vectorize'),
+]
+
+TOKEN_CACHE = ['ref/token_cache.npz', 'ref/token_cache.words.bin',
+               'ref/token_cache.tags.bin']
+
+# files a stage writes that would let a later run skip its work
+CACHES = {
+    'entities': ['ref/entity_cache.json'] + TOKEN_CACHE,
+    'vectorize': TOKEN_CACHE + ['data/franchise/dtm.npz',
+                                'data/franchise/dtm.json'],
+}
+
+MARKER = 'BENCH '
+
+def measure(module):
+    """
+    Run `module` as __main__ in this interpreter and print its timings on
+    the last line of stdout.
+    """
+    sys.path.insert(0, ROOT)
+    sys.argv = [module]
+    start, cpu = time.time(), os.times()
+    runpy.run_module(module, run_name='__main__', alter_sys=True)
+    end, cpu_end = time.time(), os.times()
+
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    sys.stdout.flush()
+    print MARKER + json.dumps({
+        'wall_s': end - start
+        , 'cpu_s': sum(cpu_end[:4]) - sum(cpu[:4])
+        , 'own_rss_kb': own
+        , 'children_rss_kb': children
+        , 'peak_rss_kb': own + children
+    })
+
+def run_stage(stage, module, project):
+    for f in CACHES.get(stage, []):
+        p = os.path.join(project, f)
+        if os.path.exists(p):
+            os.remove(p)
+
+    cmd = [sys.executable, os.path.abspath(__file__),
+           '--measure', module]
+    proc = subprocess.Popen(cmd, cwd=project, stdout=subprocess.PIPE)
+    out, _ = proc.communicate()
+
+    if proc.returncode != 0:
+        return {'error': 'exit status %d' % proc.returncode}
+
+    lines = [l for l in out.splitlines() if l.startswith(MARKER)]
+    return json.loads(lines[-1][len(MARKER):])
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=ROOT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def run(scales, stages):
+    report = {
+        'commit': commit()
+        , 'date': datetime.utcnow().isoformat()
+        , 'python': sys.version.split()[0]
+        , 'scales': {}
+    }
+
+    for scale in scales:
+        project = os.path.join(WORK_DIR, '%dx' % scale)
+        if not os.path.isdir(project):
+            print 'Generating %dx franchise in %s' % (scale, project)
+            synthetic.generate(scale, project)
+
+        results = report['scales'][str(scale)] = {}
+        for stage, module in STAGES:
+            if stage not in stages:
+                continue
+            print 'Running %s at %dx' % (stage, scale)
+            results[stage] = run_stage(stage, module, project)
+            print '    %s' % json.dumps(results[stage])
+
+    return report
+
+def compare(before, after):
+    a = json.loads(open(before).read())
+    b = json.loads(open(after).read())
+    print '%-8s %-10s %12s %12s %8s' % ('scale', 'stage', a['commit'],
+                                         b['commit'], 'ratio')
+    for scale in sorted(set(a['scales']) & set(b['scales']), key=int):
+        for stage, _ in STAGES:
+            x = a['scales'][scale].get(stage, {})
+            y = b['scales'][scale].get(stage, {})
+            if 'wall_s' not in x or 'wall_s' not in y:
+                continue
+            print '%-8s %-10s %11.2fs %11.2fs %7.2fx' % (scale + 'x', stage,
+                x['wall_s'], y['wall_s'], x['wall_s'] / max(y['wall_s'], 1e-9))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark pipeline stages.')
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES)
+    parser.add_argument('--stages', nargs='+',
+                        default=[stage for stage, _ in STAGES])
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure)
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        report = run(args.scales, args.stages)
+        if not os.path.isdir(RESULTS_DIR):
+            os.makedirs(RESULTS_DIR)
+        f = os.path.join(RESULTS_DIR, '%s.json' % report['commit'])
+        with open(f, 'w') as fh:
+            fh.write(json.dumps(report, indent=2))
+        print 'Wrote %s' % f
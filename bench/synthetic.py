@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+synthetic.py
+
+Generates a scaled copy of the franchise for benchmarking.
+
+A copy at scale `k` holds `k` replicas of every show. Replica `c` of
+season `s` becomes season `c * n_seasons + s`, so each replica has its
+own seasons. In every replica after the first, each recap is rebuilt
+from as many sentences as it had, drawn with a fixed seed from all the
+recaps of its show. The text stays realistic, but no two replicas hash
+the same, so content caches cannot short-circuit the work. Episode
+titles in later replicas get the replica number as a prefix, so title
+matching treats them as distinct episodes. Scale 1 is an exact copy of
+the real data.
+
+A rebuilt recap shares few 5-word shingles with any other, so `join`'s
+MinHash dedup (`law_and_order.dedup`) drops exactly what it drops from
+the real data and the bench joins `scale` times as many rows.
+
+The layout matches the project root, so every script can run against it
+unchanged:
+
+    <dest>/
+    |-- data/
+    |   |-- <show>/
+    |   |   |-- episodes/season_N.csv
+    |   |   |-- recaps/season_N.json
+    |   |-- franchise/
+    |   |   |-- episodes_and_recaps.txt
+    |-- ref/
+    |   |-- crimes.txt
+    |   |-- entities.txt
+    |   |-- stopwords.txt
+
+    $ python bench/synthetic.py 10 /tmp/franchise_10x
+"""
+import csv
+import os
+import random
+import re
+import shutil
+import sys
+
+import ujson as json
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SHOWS = ['criminal_intent', 'trial_by_jury', 'svu', 'original']
+
+SEED = 2013
+
+SENTENCES = re.compile('(?<=[.!?])\\s+')
+
+csv.field_size_limit(sys.maxsize)
+
+def sentence_pool(texts):
+    return [sentence for txt in texts if txt
+                for sentence in SENTENCES.split(txt)]
+
+def remix_text(txt, pool, rng):
+    n = len(SENTENCES.split(txt))
+    return ' '.join(rng.choice(pool) for _ in xrange(n))
+
+def retitle(title, copy):
+    return '%d %s' % (copy, title) if copy and title else title
+
+def season_files(show, kind, ext):
+    p = os.path.join(ROOT, 'data', show, kind)
+    if not os.path.isdir(p):
+        return {}
+    rg = re.compile('season_(\\d+)\\' + ext + '$')
+    return dict((int(rg.match(f).group(1)), os.path.join(p, f))
+                for f in os.listdir(p) if rg.match(f))
+
+def _makedirs(p):
+    if not os.path.isdir(p):
+        os.makedirs(p)
+
+def write_episodes(show, scale, dest):
+    files = season_files(show, 'episodes', '.csv')
+    n_seasons = max(files) if files else 0
+    out = os.path.join(dest, 'data', show, 'episodes')
+    _makedirs(out)
+
+    for copy in range(scale):
+        for season, f in files.iteritems():
+            nth_season = copy * n_seasons + season
+            rows = list(csv.reader(open(f, 'rb')))
+            col = rows[0].index('nth_season')
+            title = rows[0].index('Title')
+            for row in rows[1:]:
+                row[col] = str(nth_season)
+                row[title] = retitle(row[title], copy)
+            fname = os.path.join(out, 'season_%d.csv' % nth_season)
+            with open(fname, 'wb') as fh:
+                csv.writer(fh).writerows(rows)
+
+def write_recaps(show, scale, dest):
+    files = season_files(show, 'recaps', '.json')
+    n_seasons = max(files) if files else 0
+    out = os.path.join(dest, 'data', show, 'recaps')
+    _makedirs(out)
+
+    seasons = dict((season, open(f, 'r').read())
+                   for season, f in files.iteritems())
+    pool = sentence_pool(rec.get('corpus') for txt in seasons.itervalues()
+                         for rec in json.loads(txt)['episode_recaps'])
+
+    for copy in range(scale):
+        rng = random.Random('%s-%s-%d' % (SEED, show, copy))
+        for season, txt in sorted(seasons.iteritems()):
+            nth_season = copy * n_seasons + season
+            data = json.loads(txt)
+            for rec in data['episode_recaps']:
+                rec['nth_season'] = nth_season
+                rec['episode_title'] = retitle(rec['episode_title'], copy)
+                if copy and rec.get('corpus'):
+                    rec['corpus'] = remix_text(rec['corpus'], pool, rng)
+            fname = os.path.join(out, 'season_%d.json' % nth_season)
+            with open(fname, 'w') as fh:
+                json.dump(data, fh, ensure_ascii=False)
+
+def write_franchise(scale, dest):
+    src = os.path.join(ROOT, 'data', 'franchise', 'episodes_and_recaps.txt')
+    out = os.path.join(dest, 'data', 'franchise')
+    _makedirs(out)
+
+    rows = list(csv.reader(open(src, 'rb'), delimiter='|'))
+    header, rows = rows[0], rows[1:]
+    season_col = header.index('nth_season')
+    show_col = header.index('show')
+    corpus_col = header.index('corpus')
+    title_col = header.index('title')
+
+    n_seasons = {}
+    texts = {}
+    for row in rows:
+        n_seasons[row[show_col]] = max(n_seasons.get(row[show_col], 0),
+                                       int(row[season_col]))
+        texts.setdefault(row[show_col], []).append(row[corpus_col])
+    pools = dict((show, sentence_pool(txts)) for show, txts in texts.iteritems())
+
+    with open(os.path.join(out, 'episodes_and_recaps.txt'), 'wb') as fh:
+        writer = csv.writer(fh, delimiter='|')
+        writer.writerow(header)
+        for copy in range(scale):
+            rng = random.Random('%s-franchise-%d' % (SEED, copy))
+            for row in rows:
+                row = list(row)
+                row[season_col] = str(copy * n_seasons[row[show_col]]
+                                      + int(row[season_col]))
+                row[title_col] = retitle(row[title_col], copy)
+                if copy and row[corpus_col]:
+                    row[corpus_col] = remix_text(row[corpus_col],
+                                                 pools[row[show_col]], rng)
+                writer.writerow(row)
+
+def write_refs(scale, dest):
+    out = os.path.join(dest, 'ref')
+    _makedirs(out)
+    for name in ['crimes.txt', 'stopwords.txt']:
+        shutil.copy(os.path.join(ROOT, 'ref', name), out)
+
+    # entities get a numeric suffix per replica; numbers are never names,
+    # so find_sex sees the same words it would for the real list
+    entities = open(os.path.join(ROOT, 'ref', 'entities.txt')).read().split('\n')
+    scaled = [entity if copy == 0 else '%s %d' % (entity, copy)
+                for copy in range(scale) for entity in entities]
+    with open(os.path.join(out, 'entities.txt'), 'w') as fh:
+        fh.write('\n'.join(sorted(scaled)))
+
+def generate(scale, dest):
+    for show in SHOWS:
+        write_episodes(show, scale, dest)
+        write_recaps(show, scale, dest)
+    write_franchise(scale, dest)
+    write_refs(scale, dest)
+    return dest
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print 'usage: python bench/synthetic.py <scale> <dest>'
+        sys.exit(1)
+    generate(int(sys.argv[1]), sys.argv[2])
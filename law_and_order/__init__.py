@@ -0,0 +1,33 @@
+"""
+law_and_order
+
+Crawls, cleans and analyses Law and Order episode data. Every module can
+be imported without side effects; heavy dependencies (pandas, nltk,
+scikit-learn, bs4, requests) are only loaded by the functions that use
+them. Each script is a `main()` run with `python -m`, from the project
+root:
+
+    law_and_order/
+    |-- crawl/
+    |   |-- wikipedia.py     <- episode tables   -> data/<show>/episodes/
+    |   |-- tvdotcom.py      <- recaps           -> data/<show>/recaps/
+    |   |-- crime_words.py   <- list of crimes   -> ref/crimes.txt
+    |-- dedup.py             <- near-duplicate recaps, dropped by join
+    |-- titles.py            <- recap to episode matching by title, used by join
+    |-- join.py              <- episodes + recaps -> data/franchise/
+    |-- corpus.py            <- recaps by episode -> data/franchise/corpus.bin
+    |-- tokens.py            <- tagged recaps    -> ref/token_cache.npz
+    |-- entities.py          <- named entities   -> ref/entities.txt
+    |-- genders.py           <- characters       -> ref/list_of_characters.txt
+    |-- cooccurrence.py      <- character graph  -> data/franchise/cooccurrence_edges.txt
+    |-- crimes.py            <- crime mentions   -> data/franchise/crime_counts.npz
+    |-- vectorize.py         <- term counts      -> data/franchise/dtm.npz
+    |-- search.py            <- recap search     -> data/franchise/search.db
+    |-- schema.py            <- compact, typed tables and their memory report
+    |-- pipeline.py          <- crawl -> join -> entities -> genders, skipping what is up to date
+    |-- serve.py             <- read-only HTTP/JSON queries on episodes, recaps, characters
+
+    $ python -m law_and_order.pipeline
+    $ python -m law_and_order.join --save
+    $ python -m law_and_order.genders --help
+"""
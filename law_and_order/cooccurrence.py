@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+cooccurrence.py
+
+Builds a character x character co-occurrence graph from the entities
+found in each episode's recap.
+
+Each recap's entities come from the entity cache kept by
+`law_and_order.entities`, held as `schema.EntityLists` (recaps missing
+from it are tagged here and added), and are matched against the
+characters in `ref/list_of_characters.txt`. That gives a sparse episode x character
+incidence matrix E, and the co-occurrence counts are its product
+
+    C = E.T * E
+
+so `C[i, j]` is the number of episodes in which characters i and j both
+appear, and `C[i, i]` the number of episodes i appears in. The product is
+taken once per show and season over that season's rows of E, never pair
+by pair, so its cost depends on how many characters share an episode
+rather than on how many characters there are.
+
+    Project/
+    |-- data/
+    |   |-- franchise/
+    |   |   |-- cooccurrence.npz          <- C over the whole franchise
+    |   |   |-- cooccurrence_edges.txt    <- edge list per show and season
+
+The edge list is pipe delimited, one row per pair of characters for each
+show and season they share, with the number of episodes they share there:
+
+    source|target|show|nth_season|n_episodes
+
+    $ python -m law_and_order.cooccurrence
+    $ python -m law_and_order.cooccurrence --all-entities
+"""
+import argparse
+import csv
+from array import array
+
+from law_and_order.entities import (cache_key, read_cache, recap_entities,
+                                    tagger_version, write_cache)
+from law_and_order.franchise import CHUNK_ROWS, iter_franchise
+from law_and_order.instrument import run
+from law_and_order.schema import EntityLists
+from law_and_order.tokens import read_token_cache, save_token_cache
+
+CHARACTERS_FILE = './ref/list_of_characters.txt'
+
+MATRIX_FILE = './data/franchise/cooccurrence.npz'
+EDGES_FILE  = './data/franchise/cooccurrence_edges.txt'
+
+EDGE_COLUMNS = ['source', 'target', 'show', 'nth_season', 'n_episodes']
+
+def read_characters(f=CHARACTERS_FILE):
+    import pandas as pd
+    names = pd.read_csv(f, sep='|', usecols=['character_name'])
+    return sorted(set(names.character_name.dropna()))
+
+def incidence(cache, characters=None, chunksize=CHUNK_ROWS, tokens=None):
+    """
+    Sparse binary episode x character matrix, one row per recap, and the
+    row ids, (show, season) of each row and character labels that go
+    with it. With `characters=None` every entity is a character.
+
+    `cache` is an `EntityLists`; recaps missing from it are tagged and
+    added to it, using the tags in `tokens` (a `tokens.TokenCache`) when
+    it has them.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    fixed = characters is not None
+    columns = dict((name, i) for i, name in enumerate(characters or []))
+    version = tagger_version()
+
+    rows, cols = array('i'), array('i')
+    row_ids, groups = [], []
+    for df in iter_franchise(columns=['show', 'nth_season', 'corpus'],
+                             dropna=['corpus'], chunksize=chunksize):
+        for row_id, show, nth_season, corpus in zip(df.index, df.show,
+                                                    df.nth_season, df.corpus):
+            key = cache_key(corpus, version)
+            if key not in cache:
+                cache.add(key, sorted(recap_entities(corpus, tokens)))
+                run.count('recaps_tagged')
+
+            row = len(row_ids)
+            for name in cache[key]:
+                col = columns.get(name) if fixed \
+                    else columns.setdefault(name, len(columns))
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+
+            row_ids.append(row_id)
+            groups.append((show, int(nth_season)))
+        if tokens is not None:
+            tokens.flush()
+
+    labels = sorted(columns, key=columns.get)
+    rows = np.frombuffer(rows, dtype=np.int32)
+    cols = np.frombuffer(cols, dtype=np.int32)
+    data = np.ones(len(rows), dtype=np.int32)
+    shape = (len(row_ids), len(labels))
+    E = sparse.coo_matrix((data, (rows, cols)), shape=shape).tocsr()
+    # an entity listed twice for one recap still means one episode
+    E.data[:] = 1
+    return E, row_ids, groups, labels
+
+def cooccurrence(E):
+    """Character x character episode counts, `E.T * E`."""
+    return (E.T * E).tocsr()
+
+def by_season(E, groups):
+    """
+    Co-occurrence counts for each (show, season), as
+    `((show, nth_season), C)` pairs in sorted order.
+    """
+    import numpy as np
+
+    keys = sorted(set(groups))
+    index = dict((key, i) for i, key in enumerate(keys))
+    codes = np.array([index[key] for key in groups])
+    for i, key in enumerate(keys):
+        yield key, cooccurrence(E[np.flatnonzero(codes == i)])
+
+def edges(C):
+    """(i, j, count) for every pair i < j that shares an episode."""
+    from scipy import sparse
+    upper = sparse.triu(C, k=1).tocoo()
+    return upper.row, upper.col, upper.data
+
+def write_edges(seasons, labels, f=EDGES_FILE):
+    import numpy as np
+
+    labels = np.asarray(labels, dtype=object)
+    n = 0
+    with open(f, 'wb') as fh:
+        writer = csv.writer(fh, delimiter='|')
+        writer.writerow(EDGE_COLUMNS)
+        for (show, nth_season), C in seasons:
+            i, j, counts = edges(C)
+            writer.writerows(zip(labels[i], labels[j], [show] * len(i),
+                                 [nth_season] * len(i), counts))
+            n += len(i)
+    return n
+
+def save_matrix(C, labels, f=MATRIX_FILE):
+    import numpy as np
+    np.savez(f,
+        data=C.data,
+        indices=C.indices,
+        indptr=C.indptr,
+        shape=C.shape,
+        labels=np.asarray(labels))
+
+def load_matrix(f=MATRIX_FILE):
+    """The franchise co-occurrence matrix and its character labels."""
+    import numpy as np
+    from scipy import sparse
+
+    npz = np.load(f)
+    C = sparse.csr_matrix(
+        (npz['data'], npz['indices'], npz['indptr']), shape=npz['shape'])
+    return C, list(npz['labels'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Build the character co-occurrence graph.')
+    parser.add_argument('--all-entities', action='store_true',
+                        help='use every entity, not just known characters')
+    parser.add_argument('--batch-rows', type=int, default=CHUNK_ROWS,
+                        help='recaps read from the franchise at a time')
+    args = parser.parse_args(argv)
+
+    with run.stage('cooccurrence') as stage:
+        characters = None if args.all_entities else read_characters()
+        cache = EntityLists.from_cache(read_cache())
+        tokens = read_token_cache()
+        E, row_ids, groups, labels = incidence(cache, characters,
+                                               args.batch_rows, tokens)
+        if stage.counters['recaps_tagged']:
+            write_cache(cache.to_cache())
+            save_token_cache(tokens)
+        stage.rows_in = len(row_ids)
+
+        C = cooccurrence(E)
+        save_matrix(C, labels)
+        n_edges = write_edges(by_season(E, groups), labels)
+        stage.rows_out = n_edges
+
+    print 'Wrote %d edges between %d characters in %d episodes' % (
+        n_edges, len(labels), len(row_ids))
+
+if __name__ == '__main__':
+    main()
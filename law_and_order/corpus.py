@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+corpus.py
+
+Random access to single recaps without reading the franchise file.
+
+`franchise.write_franchise` also writes every recap into one contiguous
+UTF-8 blob, with an index of where each one starts and ends:
+
+    Project/
+    |-- data/
+    |   |-- franchise/
+    |   |   |-- corpus.bin          <- every recap, back to back
+    |   |   |-- corpus_index.npz    <- (show, nth_season, no_in_season)
+    |                                  and offsets into corpus.bin
+
+`CorpusStore` memory-maps the blob. `view` returns a zero-copy buffer
+over one recap and `store[key]` a copy of it as a str. Processes that
+open the same store share its pages through the OS page cache, so a
+process pool can be sent keys instead of pickled recap text; see
+`attach` and `stored`, and `law_and_order.entities`.
+
+The store is written from the same frame as the text file. `open_store`
+returns None when it is missing or older than the text file.
+
+    $ python -m law_and_order.corpus --build
+    $ python -m law_and_order.corpus svu 3 12
+"""
+import argparse
+import mmap
+import os
+
+from law_and_order.franchise import TEXT_FILE, read_franchise
+
+BLOB_FILE  = './data/franchise/corpus.bin'
+INDEX_FILE = './data/franchise/corpus_index.npz'
+
+KEY = ['show', 'nth_season', 'no_in_season']
+
+def write_store(df, blob_file=BLOB_FILE, index_file=INDEX_FILE):
+    """
+    Write the `corpus` of every row of `df` that has one, keyed by
+    (show, nth_season, no_in_season). Returns the number of recaps.
+    """
+    import numpy as np
+
+    df = df.dropna(subset=['corpus']).sort_index(by=KEY)
+    offsets = np.zeros(len(df) + 1, dtype=np.int64)
+    with open(blob_file + '.tmp', 'wb') as fh:
+        for i, corpus in enumerate(df.corpus):
+            if isinstance(corpus, unicode):
+                corpus = corpus.encode('utf-8')
+            fh.write(corpus)
+            offsets[i + 1] = offsets[i] + len(corpus)
+
+    with open(index_file + '.tmp', 'wb') as fh:
+        np.savez(fh,
+            shows=np.array(df.show.tolist(), dtype=str),
+            seasons=df.nth_season.values.astype(np.int32),
+            episodes=df.no_in_season.values.astype(np.int32),
+            offsets=offsets)
+    os.rename(blob_file + '.tmp', blob_file)
+    os.rename(index_file + '.tmp', index_file)
+    return len(df)
+
+class CorpusStore(object):
+    """Read-only, memory-mapped recaps keyed by (show, season, episode)."""
+
+    def __init__(self, blob_file=BLOB_FILE, index_file=INDEX_FILE):
+        import numpy as np
+
+        self.blob_file = blob_file
+        self.index_file = index_file
+
+        npz = np.load(index_file)
+        offsets = npz['offsets'].tolist()
+        keys = zip(npz['shows'].tolist(), npz['seasons'].tolist(),
+                   npz['episodes'].tolist())
+        self.spans = dict((key, (offsets[i], offsets[i + 1]))
+                          for i, key in enumerate(keys))
+        self.positions = dict((key, i) for i, key in enumerate(keys))
+        self._keys = keys
+
+        self._fh = open(blob_file, 'rb')
+        # mmap refuses empty files
+        self._blob = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) \
+            if offsets[-1] else ''
+
+    def keys(self):
+        """Every key, sorted by show, season and episode."""
+        return list(self._keys)
+
+    def view(self, key):
+        """Zero-copy buffer over the recap at `key`."""
+        start, end = self.spans[_key(key)]
+        return buffer(self._blob, start, end - start)
+
+    def __getitem__(self, key):
+        start, end = self.spans[_key(key)]
+        return self._blob[start:end]
+
+    def at(self, i):
+        """The recap at position `i` of `keys()`."""
+        return self[self._keys[i]]
+
+    def get(self, key, default=None):
+        return self[key] if _key(key) in self.spans else default
+
+    def __contains__(self, key):
+        return _key(key) in self.spans
+
+    def __len__(self):
+        return len(self._keys)
+
+    def nbytes(self):
+        return len(self._blob)
+
+    def close(self):
+        if not isinstance(self._blob, str):
+            self._blob.close()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _key(key):
+    show, nth_season, no_in_season = key
+    return show, int(nth_season), int(no_in_season)
+
+def open_store(blob_file=BLOB_FILE, index_file=INDEX_FILE,
+        text_file=TEXT_FILE):
+    """The `CorpusStore`, or None if it is missing or out of date."""
+    if not (os.path.exists(blob_file) and os.path.exists(index_file)):
+        return None
+    if os.path.exists(text_file) and \
+            os.path.getmtime(index_file) < os.path.getmtime(text_file):
+        return None
+    return CorpusStore(blob_file, index_file)
+
+# the store a pool worker reads from, opened once per process by `attach`
+_store = None
+
+def attach(blob_file=BLOB_FILE, index_file=INDEX_FILE):
+    """Pool initializer: map the store into this process."""
+    global _store
+    _store = CorpusStore(blob_file, index_file)
+
+def stored(key):
+    """The recap at `key` in the store attached to this process."""
+    return _store[key]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Build the recap store or print one recap from it.')
+    parser.add_argument('--build', action='store_true',
+                        help='write the store from the franchise file')
+    parser.add_argument('key', nargs='*',
+                        help='show, season and episode of a recap to print')
+    args = parser.parse_args(argv)
+
+    if args.build:
+        df = read_franchise(columns=KEY + ['corpus'], dropna=['corpus'])
+        print 'Wrote %d recaps to %s' % (write_store(df), BLOB_FILE)
+
+    if args.key:
+        if len(args.key) != 3:
+            parser.error('expected show, season and episode')
+        store = open_store()
+        if store is None:
+            parser.error('no up to date store; run with --build')
+        with store:
+            if args.key not in store:
+                parser.error('no recap for %s' % ' '.join(args.key))
+            print store[args.key]
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+"""
+Crawlers for wikipedia and tv.com, and the shared HTTP fetcher, response
+cache and crawl journal they use.
+"""
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+cache.py
+
+On-disk HTTP response cache shared by the crawlers.
+
+Response bodies are content-addressed: each body is stored once under
+the sha1 of its bytes, and an index maps every url to its body along with
+the `ETag` / `Last-Modified` validators the server sent. A `Fetcher` with
+a cache revalidates known urls with a conditional GET, so pages that have
+not changed come back as a cheap `304 Not Modified`.
+
+The cache is bounded by `max_bytes`. When it grows past that, the least
+recently used urls are evicted and bodies no longer referenced by any
+url are deleted.
+
+Recency is kept in memory, along with how many urls share each body
+and the total size of the bodies, so reads and evictions never scan the
+index. The index is written at most every `save_interval` seconds while
+pages come in, and on `close()` or interpreter exit.
+
+Several processes can share one cache, as the pipeline's crawls do.
+Each index write holds an exclusive lock on index.lock, reads the index
+as the other processes left it and applies only this process's changes
+on top, so no one's entries are lost. A body that one process evicts
+while another still uses it is simply fetched again: `lookup` treats an
+entry whose body is missing as not cached.
+
+With `offline=True` the fetcher never touches the network and serves
+pages only from the cache, which is handy for re-running parsers.
+
+    Project/
+    |-- data/
+    |   |-- .http_cache/
+    |   |   |-- index.json
+    |   |   |-- index.lock
+    |   |   |-- objects/
+"""
+import atexit
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import ujson as json
+
+from law_and_order.instrument import run
+
+CACHE_DIR = './data/.http_cache'
+MAX_BYTES = 512 * 1024 * 1024
+
+# seconds between index writes; the index is also written on close/exit
+SAVE_INTERVAL = 30
+
+class ResponseCache(object):
+
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_BYTES, offline=False,
+            save_interval=SAVE_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.save_interval = save_interval
+
+        self._lock = threading.RLock()
+        self._index_file = os.path.join(path, 'index.json')
+        self._lock_file = os.path.join(path, 'index.lock')
+
+        if not os.path.isdir(os.path.join(path, 'objects')):
+            os.makedirs(os.path.join(path, 'objects'))
+
+        self._use(self._read_index())
+        self._saved_at = time.time()
+        atexit.register(self.flush)
+
+    def _read_index(self):
+        if not os.path.exists(self._index_file):
+            return {}
+        with open(self._index_file, 'r') as f:
+            return json.loads(f.read())
+
+    def _use(self, index):
+        self.index = index
+        # urls from least to most recently used, how many urls share each
+        # body, and the size of every distinct body
+        self._lru = OrderedDict((url, None) for url in
+                                sorted(index, key=lambda u: index[u]['atime']))
+        self._refs = {}
+        self._bytes = 0
+        for entry in index.itervalues():
+            self._ref(entry)
+        # urls this process stored or read, and urls it dropped, since the
+        # index was last written
+        self._changed = set()
+        self._dropped = set()
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[:2], digest)
+
+    def _ref(self, entry):
+        digest = entry['digest']
+        if digest not in self._refs:
+            self._refs[digest] = 0
+            self._bytes += entry['size']
+        self._refs[digest] += 1
+
+    def _unref(self, entry):
+        """Forget one url's use of its body; True if no url uses it now."""
+        digest = entry['digest']
+        self._refs[digest] -= 1
+        if self._refs[digest]:
+            return False
+        del self._refs[digest]
+        self._bytes -= entry['size']
+        return True
+
+    def _drop(self, url):
+        entry = self.index.pop(url)
+        del self._lru[url]
+        self._changed.discard(url)
+        self._dropped.add(url)
+        return entry, self._unref(entry)
+
+    def _touch(self, url):
+        self.index[url]['atime'] = time.time()
+        self._lru.pop(url, None)
+        self._lru[url] = None
+        self._changed.add(url)
+
+    @property
+    def _dirty(self):
+        return bool(self._changed or self._dropped)
+
+    def _save(self):
+        """
+        Write this process's changes over the index on disk, under the
+        index lock, and carry on from the merged index.
+        """
+        with open(self._lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                for url in self._dropped:
+                    index.pop(url, None)
+                for url in self._changed:
+                    index[url] = self.index[url]
+                tmp = '%s.%d.tmp' % (self._index_file, os.getpid())
+                with open(tmp, 'w') as f:
+                    f.write(json.dumps(index))
+                os.rename(tmp, self._index_file)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self._use(index)
+        self._saved_at = time.time()
+
+    def _maybe_save(self):
+        if self._dirty and time.time() - self._saved_at >= self.save_interval:
+            self._save()
+
+    def flush(self):
+        """Write the index if anything changed since it was last written."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def close(self):
+        self.flush()
+
+    def size(self):
+        return self._bytes
+
+    def lookup(self, url):
+        with self._lock:
+            entry = self.index.get(url)
+            if entry is not None and \
+                    not os.path.exists(self._object_path(entry['digest'])):
+                self._drop(url)
+                entry = None
+            return entry
+
+    def validators(self, entry):
+        """Conditional GET headers for a cached entry."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, url):
+        with self._lock:
+            entry = self.index[url]
+            self._touch(url)
+            run.count('cache_hits')
+            with open(self._object_path(entry['digest']), 'rb') as f:
+                body = f.read()
+            self._maybe_save()
+        return body.decode('utf-8')
+
+    def store(self, url, text, headers):
+        body = text.encode('utf-8')
+        digest = hashlib.sha1(body).hexdigest()
+        p = self._object_path(digest)
+
+        with self._lock:
+            run.count('cache_misses')
+            if not os.path.exists(p):
+                try:
+                    os.makedirs(os.path.dirname(p))
+                except OSError:
+                    # another process may have made it first
+                    if not os.path.isdir(os.path.dirname(p)):
+                        raise
+                tmp = '%s.%d.tmp' % (p, os.getpid())
+                with open(tmp, 'wb') as f:
+                    f.write(body)
+                os.rename(tmp, p)
+
+            entry = {
+                'digest': digest
+                , 'size': len(body)
+                , 'etag': headers.get('ETag')
+                , 'last_modified': headers.get('Last-Modified')
+                , 'atime': time.time()
+            }
+            # ref the new body before releasing the old one, which may be
+            # the same body
+            self._ref(entry)
+            if url in self.index:
+                self._remove(*self._drop(url))
+            self.index[url] = entry
+            self._lru[url] = None
+            self._dropped.discard(url)
+            self._changed.add(url)
+            self.evict()
+            self._maybe_save()
+
+    def evict(self):
+        """Drop least recently used urls until the cache fits."""
+        with self._lock:
+            while self._bytes > self.max_bytes and self._lru:
+                self._remove(*self._drop(next(iter(self._lru))))
+
+    def _remove(self, entry, unused):
+        p = self._object_path(entry['digest'])
+        if unused and os.path.exists(p):
+            os.remove(p)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+crime_words.py
+
+Downloads the names of crimes listed on wikipedia's Category:Crimes page,
+one per line. Copy the output to ref/crimes.txt to use it.
+
+    $ python -m law_and_order.crawl.crime_words -o crimes.txt
+"""
+import argparse
+
+URL = 'http://en.wikipedia.org/wiki/Category:Crimes'
+
+weird_shit = list(set([u'L\xe8se-majest\xe9',
+              u'learn more',
+              u"1788 Doctors' Riot",
+              u'EAFCT',
+              u'Qatl',u'TWOC',]))
+
+def fetch_crimes(url=URL):
+    import requests
+    from bs4 import BeautifulSoup,SoupStrainer
+
+    strain = SoupStrainer(id='mw-pages')
+    soup = BeautifulSoup(requests.get(url).text, parse_only=strain)
+    links = soup.find_all('a')
+
+    crimes = sorted([ link.text for link in links if len(link.text) > 0
+                        and link.text not in weird_shit ])
+    return crimes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Download the list of crimes from wikipedia.')
+    parser.add_argument('-o', '--output', default='crimes.txt')
+    args = parser.parse_args(argv)
+
+    crimes = fetch_crimes()
+    with open(args.output, 'w') as f:
+        f.write('\n'.join(crime for crime in crimes))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+fetch.py
+
+Shared HTTP fetching for the crawlers.
+
+A single `Fetcher` owns one pooled `requests.Session`, so every page
+reuses the same keep-alive connections instead of opening a new one per
+`requests.get`. Pages can be fetched one at a time with `get` or
+concurrently with `fetch_all`, which uses a bounded thread pool and
+returns results in the same order as the urls it was given.
+
+Each host gets its own concurrency cap so a large worker pool never
+hammers a single site. Connection errors, timeouts, 5xx responses and
+408 and 429 answers are retried with exponential backoff.
+
+Usage:
+
+    fetcher = Fetcher(per_host=4, timeout=10)
+    pages = fetcher.fetch_all(urls, n_workers=8)
+
+`pages[i]` is the text of `urls[i]`, or None if it could not be fetched.
+
+Pass a `law_and_order.crawl.cache.ResponseCache` to revalidate pages with conditional GETs
+instead of downloading them again, or to run entirely offline.
+"""
+import threading
+import time
+from itertools import izip
+from urlparse import urlparse
+
+from law_and_order.instrument import run
+
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
+
+class FetchError(Exception):
+    pass
+
+def is_terminal(error):
+    """
+    True if retrying will not help: the server answered 4xx, other than
+    the timeouts and rate limits in RETRY_STATUS.
+    """
+    resp = getattr(error, 'response', None)
+    return (resp is not None and 400 <= resp.status_code < 500
+            and resp.status_code not in RETRY_STATUS)
+
+class Fetcher(object):
+
+    def __init__(self, headers=None, timeout=10, retries=3, backoff=0.5,
+            per_host=4, pool_size=16, cache=None, verbose=True):
+        self.headers = dict(HEADERS if headers is None else headers)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.per_host = per_host
+        self.cache = cache
+        self.verbose = verbose
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def _request(self, url, headers):
+        with self._host_slot(url):
+            resp = self.session.get(url, headers=headers,
+                                    timeout=self.timeout)
+        run.count('http_requests')
+        run.count('http_bytes', len(resp.content))
+        if resp.status_code == 304:
+            run.count('http_not_modified')
+        return resp
+
+    def request(self, url, headers=None):
+        """
+        GET `url` and return the response, retrying connection errors,
+        timeouts and RETRY_STATUS responses with exponential backoff.
+        """
+        import requests
+
+        h = dict(self.headers)
+        h.update(headers or {})
+
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self._request(url, h)
+                if resp.status_code not in RETRY_STATUS:
+                    return resp
+                err = FetchError('%d for %s' % (resp.status_code, url))
+
+            except (requests.ConnectionError, requests.Timeout), e:
+                err = e
+
+            if attempt < self.retries:
+                time.sleep(self.backoff * (2 ** attempt))
+
+        raise FetchError(str(err))
+
+    def get(self, url, verbose=None):
+        verbose = self.verbose if verbose is None else verbose
+        cache = self.cache
+        entry = cache.lookup(url) if cache is not None else None
+
+        if cache is not None and cache.offline:
+            if entry is None:
+                raise FetchError('%s is not cached' % url)
+            return cache.read(url)
+
+        if verbose:
+            print "GET %s" % url
+
+        headers = cache.validators(entry) if entry is not None else {}
+        resp = self.request(url, headers)
+
+        if resp.status_code == 304 and entry is not None:
+            return cache.read(url)
+
+        resp.raise_for_status()
+        if cache is not None:
+            cache.store(url, resp.text, resp.headers)
+        return resp.text
+
+    def _safe_get(self, url):
+        try:
+            return self.get(url), None
+        except Exception, e:
+            print 'Something went wrong'
+            print e
+            return None, e
+
+    def iter_fetch(self, urls, n_workers=8, errors=False):
+        """
+        Fetch every url concurrently, yielding `(url, text)` pairs in the
+        same order as `urls` as soon as each one is ready. Failed pages
+        yield None. With `errors`, yields `(url, text, error)` where
+        `error` is the exception a failed page raised.
+        """
+        from multiprocessing.pool import ThreadPool
+
+        urls = list(urls)
+        if n_workers <= 1 or len(urls) <= 1:
+            for url in urls:
+                text, error = self._safe_get(url)
+                yield (url, text, error) if errors else (url, text)
+            return
+
+        pool = ThreadPool(min(n_workers, len(urls)))
+        try:
+            for url, (text, error) in izip(urls, pool.imap(self._safe_get,
+                                                            urls)):
+                yield (url, text, error) if errors else (url, text)
+        finally:
+            pool.close()
+            pool.join()
+
+    def fetch_all(self, urls, n_workers=8):
+        """
+        Fetch every url concurrently. Results come back in the same
+        order as `urls`; failed pages are None.
+        """
+        return [text for url, text in self.iter_fetch(urls, n_workers)]
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+journal.py
+
+Checkpoint journal for resumable crawls.
+
+Every finished episode record is appended to a JSONL journal as soon as
+it is scraped and fsync'd to disk, so an interrupted crawl loses at most
+the page that was in flight. On restart the journal is replayed and urls
+it already holds are skipped.
+
+A page the server refuses for good (a 4xx) is journaled too, with an
+empty corpus and an `error`, so it is not fetched again. Once every
+episode of a season is in the journal, `compact` writes the usual
+season file and removes the journal:
+
+    Project/
+    |-- data/
+    |   |-- svu/
+    |   |   |-- recaps/
+    |   |   |   |-- season_1.jsonl    <- while crawling
+    |   |   |   |-- season_1.json     <- after compaction
+
+If a season was already compacted by an earlier run, its records seed
+the journal so a re-crawl only fetches episodes that are new.
+"""
+import os
+
+import ujson as json
+
+class CrawlJournal(object):
+
+    def __init__(self, path, seed=None, key='corpus_url'):
+        self.path = path
+        self.key = key
+        self.records = {}
+
+        if seed is not None and os.path.exists(seed) \
+                and not os.path.exists(path):
+            data = json.loads(open(seed, 'r').read())
+            for rec in data['episode_recaps']:
+                self.records[rec[key]] = rec
+
+        if os.path.exists(path):
+            self._replay()
+
+    def _replay(self):
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # a torn final line from a crash mid-write
+                    continue
+                self.records[rec[self.key]] = rec
+
+    def __len__(self):
+        return len(self.records)
+
+    def done(self, url):
+        return url in self.records
+
+    def append(self, rec):
+        line = json.dumps(rec, ensure_ascii=False)
+        with open(self.path, 'a') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.records[rec[self.key]] = rec
+
+    def compact(self, fname, order_by='nth_episode'):
+        """
+        Write the journal out as a season file and remove it. Records
+        keep tv.com's reverse chronological order.
+        """
+        recs = sorted(self.records.values(),
+                      key=lambda rec: rec[order_by], reverse=True)
+
+        tmp = fname + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'episode_recaps': recs}, f, ensure_ascii=False)
+        os.rename(tmp, fname)
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+tvdotcom.py
+
+This script downloads Law and Order TV data from tv.com.
+
+It visits the list of episodes page on TV.com. From there, it
+finds each URL specific to a user-submitted summary page.
+
+Although a summary / recap page exists for each episode,
+not every episode actually has a recap.
+
+This is due to the fact that users haven't written recaps for every episode.
+
+For example:
+
+    This page:
+        http://www.tv.com/shows/law-order/season-10/
+
+    Yields a list of URLs specific to each episode in season 1 of
+    the original law and order series.
+
+    From there, the script is able to grab each episode recap URL:
+
+        http://www.tv.com/shows/law-order/stiff-9729/recap
+
+You should run this script from the project root:
+
+    $ python -m law_and_order.crawl.tvdotcom --show svu --show original
+
+Results will be stored here.
+
+    Project/
+    |-- data/
+    |   |-- original/
+    |   |   |-- recaps/
+    |   |   |   |-- season_1.json
+    |   |   |   |-- season_2.json
+    |   |   |   |-- season_3.json
+    |   |-- svu/
+    |   |   |-- recaps/
+    |   |   |   |-- season_1.json
+    |   |   |   |-- season_2.json
+    |   |   |   |-- season_3.json
+"""
+import argparse
+import re
+
+from law_and_order.instrument import run
+from law_and_order.crawl.fetch import is_terminal
+from law_and_order.crawl.journal import CrawlJournal
+
+# --base-url points the crawl at another server, such as a local copy
+BASE_URL = 'http://www.tv.com'
+
+# fetch recap pages concurrently over one pooled session
+N_WORKERS = 8
+PER_HOST  = 4
+
+# serve pages only from ./data/.http_cache, without touching the network
+OFFLINE = False
+
+FRANCHISE = [
+    {'name': 'svu', 'n_seasons': 14},
+    {'name': 'original', 'n_seasons': 20},
+    {'name': 'trial_by_jury', 'n_seasons': 1},
+    {'name': 'criminal_intent', 'n_seasons': 10}
+]
+
+# shows crawled when none are named on the command line
+DEFAULT_SHOWS = ['trial_by_jury', 'criminal_intent']
+
+_fetcher = None
+
+def make_fetcher(offline=OFFLINE, n_workers=N_WORKERS, per_host=PER_HOST):
+    from law_and_order.crawl.cache import ResponseCache
+    from law_and_order.crawl.fetch import Fetcher
+
+    cache = ResponseCache(offline=offline)
+    return Fetcher(per_host=per_host, pool_size=n_workers, cache=cache)
+
+def default_fetcher():
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = make_fetcher()
+    return _fetcher
+
+def make_url(show, season, base=None):
+    base = (base or BASE_URL) + '/shows'
+    franchise = {
+        'original': '/law-order/season-{num}/',
+        'svu': '/law-order-special-victims-unit/season-{num}/',
+        'trial_by_jury': '/law-and-order-trial-by-jury/season-{num}/',
+        'criminal_intent': '/law-order-criminal-intent/season-{num}/'
+    }
+
+    return base+franchise.get(show).format(num=season)
+
+# only the episode list is ever read from a season page and only the
+# recap text from a recap page, so neither needs a full document tree
+SEASON_EPISODES = re.compile('^season-\d+-eps')
+
+RECAP_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' text ')]"
+
+_html_parser = None
+
+def season_strainer():
+    from bs4 import SoupStrainer
+    return SoupStrainer('ul', id=SEASON_EPISODES)
+
+def html_parser():
+    global _html_parser
+    if _html_parser is None:
+        import lxml.html
+        _html_parser = lxml.html.HTMLParser(encoding='utf-8')
+    return _html_parser
+
+def make_soup(html, parse_only=None):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html.encode('utf-8'), 'lxml', parse_only=parse_only)
+
+def get_soup(url, verbose=True, parse_only=None, fetcher=None):
+    fetcher = fetcher or default_fetcher()
+    try:
+        soup = make_soup(fetcher.get(url, verbose=verbose), parse_only)
+
+    except Exception, e:
+        print 'Something went wrong'
+        print e
+        soup = None
+
+    return soup
+
+def find_episodes(soup):
+    from bs4 import Tag
+
+    ul = soup.find('ul', id=SEASON_EPISODES)
+
+    if ul is None:
+        return []
+
+    episodes = [ li for li in ul.children if isinstance(li, Tag)]
+    return episodes
+
+def find_links(episode):
+    css = {'class': 'title'}
+    title = [ a for a in episode.find_all('a', attrs=css)]
+
+    css   = {'class': '_inline_navigation'}
+    nav   = [a for tag in episode.find_all('ul', attrs=css)
+                for a in tag.find_all('a')]
+
+    nested = nav + title
+
+    return nested
+
+def identify_links(episode_links):
+    res = []
+    for ep in episode_links:
+        rec = {}
+        for a in ep:
+            if 'class' in a.attrs and 'title' in a['class']:
+                title = a.text
+                rec['title'] = title
+            else:
+                href = a['href']
+                link_type  = a.text
+                rec[link_type] = href
+        res.append(rec)
+    return res
+
+# BeautifulSoup turns every string of only these characters into a
+# single '\n' (or ' ' if it has no newline), except inside PRESERVED tags
+ASCII_SPACES = re.compile('^[ \n\t\f\r]+$')
+PRESERVED = ('pre', 'textarea')
+
+def _soup_string(s):
+    if not ASCII_SPACES.match(s):
+        return s
+    parent = s.getparent()
+    if s.is_tail:
+        parent = parent.getparent()
+    while parent is not None:
+        if parent.tag in PRESERVED:
+            return s
+        parent = parent.getparent()
+    return '\n' if '\n' in s else ' '
+
+def find_corpus(html):
+    """
+    Recap text of a recap page, or '' unless the page has exactly one
+    `div.text`. Same result as `get_text()` on the full soup.
+    """
+    import lxml.html
+
+    if not html.strip():
+        return ''
+
+    doc = lxml.html.document_fromstring(html.encode('utf-8'),
+                                        parser=html_parser())
+    divs = doc.xpath(RECAP_XPATH)
+
+    if len(divs) == 1:
+        return utf8ify(_soup_string(s) for s in divs[0].xpath('.//text()'))
+    return ''
+
+def get_recap(episode_url, base=None):
+    return '{base}{overview}recap'.format(base=base or BASE_URL,
+                                          overview=episode_url)
+
+def utf8ify(txt):
+    return u''.join(txt).encode('utf-8').strip()
+
+def crawl_season(name, nth_season, season_url, fetcher, n_workers=N_WORKERS,
+        base=None):
+    import pandas as pd
+
+    with run.stage('tvdotcom.%s.season_%d' % (name, nth_season)) as stage:
+        soup = get_soup(season_url, parse_only=season_strainer(),
+                        fetcher=fetcher)
+        if soup is None:
+            print 'Skipping Season %d' % nth_season
+            return
+
+        episodes = find_episodes(soup)
+
+        if len(episodes) > 0:
+            print 'Episodes for Season: %d' % nth_season
+
+            episode_links = [find_links(ep) for ep in episodes]
+            links = pd.DataFrame(identify_links(episode_links))
+            total = len(links)
+            stage.rows_in = total
+
+            links['recap'] = links['Episode Overview'].apply(
+                lambda overview: get_recap(overview, base))
+            links['nth_season'] = nth_season
+
+            # tv.com arranges episodes in reverse chronological order
+            # this ensures proper enumeration
+            links['nth_episode'] = list(reversed(range(1,total+1)))
+
+            p = './data/{show}/recaps'.format(show=name)
+            fname = p+'/season_{0}.json'.format(nth_season)
+
+            # finished episodes are journaled as they come in, so a
+            # restart only fetches what is still missing
+            journal = CrawlJournal(fname+'l', seed=fname)
+
+            links['recap'] = links['recap'].apply(utf8ify)
+            recap_urls = list(links['recap'])
+            links = links[~links['recap'].apply(journal.done)]
+            print 'Resuming with %d of %d done' % (total-len(links), total)
+
+            rows = dict((row['recap'], row) for j, row in links.iterrows())
+            pages = fetcher.iter_fetch(links['recap'], n_workers=n_workers,
+                                       errors=True)
+
+            for url, html, error in pages:
+                row = rows[url]
+                nth_episode = int(row['nth_episode'])
+                title = utf8ify(row['title'])
+
+                # a page the server refuses (404, removed) is journaled
+                # without a recap, so the season can still be compacted
+                if html is None and not is_terminal(error):
+                    print '%s: %s' % (title, 'ERROR')
+                    continue
+
+                rec = {
+                    'nth_episode': nth_episode
+                    , 'nth_season': nth_season
+                    , 'source': u'http://www.tv.com'
+                    , 'corpus_url': url
+                    , 'episode_title': title
+                    , 'corpus': '' if html is None else find_corpus(html)
+                    , 'show': name
+                }
+                if html is None:
+                    rec['error'] = str(error)
+
+                journal.append(rec)
+                print '%s: %s' % (title, 'DONE' if html is not None
+                                  else 'FAILED (%s)' % error)
+
+            finished = [journal.records[url] for url in recap_urls
+                        if journal.done(url)]
+            successful = sum('error' not in rec for rec in finished)
+            stage.rows_out = successful
+
+            print 'Finished Season %d' % nth_season
+            print 'Percent Success: {:.2%}'.format(float(successful)/total)
+
+            if len(finished) == total:
+                journal.compact(fname)
+            else:
+                print 'Season %d is incomplete; rerun to resume' % nth_season
+
+def crawl_show(name, n_seasons, fetcher, n_workers=N_WORKERS, base=None):
+    urls = [ make_url(name, i, base) for i in range(1, n_seasons+1) ]
+
+    for i, season_url in enumerate(urls):
+        crawl_season(name, i + 1, season_url, fetcher, n_workers, base)
+
+def main(argv=None):
+    shows = [show['name'] for show in FRANCHISE]
+    parser = argparse.ArgumentParser(description='Crawl recaps from tv.com.')
+    parser.add_argument('--show', action='append', choices=shows,
+                        help='show to crawl; repeat for several '
+                             '(default: %s)' % ', '.join(DEFAULT_SHOWS))
+    parser.add_argument('--workers', type=int, default=N_WORKERS)
+    parser.add_argument('--offline', action='store_true', default=OFFLINE,
+                        help='serve pages only from the HTTP cache')
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help='site to crawl (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    pd.options.display.width = 200
+    pd.options.display.max_columns = 15
+    pd.options.display.max_colwidth = 25
+
+    fetcher = make_fetcher(args.offline, args.workers)
+    names = args.show or DEFAULT_SHOWS
+    try:
+        for show in FRANCHISE:
+            if show['name'] in names:
+                crawl_show(show['name'], show['n_seasons'], fetcher,
+                           args.workers, args.base_url.rstrip('/'))
+    finally:
+        fetcher.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+wikipedia.py
+
+Created by Austin Ogilvie on 2013-06-29.
+Copyright (c) 2013. All rights reserved.
+
+This script downloads Law and Order TV data from wikipedia.
+
+It visits the list of episodes page on wikipedia
+and grabs each of the tables for each season of the show.
+
+For example:
+http://en.wikipedia.org/wiki/List_of_Law_%26_Order_episodes
+http://en.wikipedia.org/wiki/List_of_Law_%26_Order:_Special_Victims_Unit_episodes
+
+You should run this script from the project root:
+
+    $ python -m law_and_order.crawl.wikipedia --show svu
+
+Results will be stored here.
+
+    Project/
+    |-- data/
+    |   |-- original/
+    |   |   |-- episodes/
+    |   |   |   |-- season_1.csv
+    |   |   |   |-- season_2.csv
+    |   |   |   |-- season_3.csv
+    |   |-- svu/
+    |   |   |-- episodes/
+    |   |   |   |-- season_1.csv
+    |   |   |   |-- season_2.csv
+    |   |   |   |-- season_3.csv
+"""
+import argparse
+import re
+from collections import defaultdict
+from datetime import datetime
+
+from law_and_order.instrument import run
+
+# serve pages only from ./data/.http_cache, without touching the network
+OFFLINE = False
+
+BASE_URL = 'http://en.wikipedia.org/wiki'
+
+FRANCHISE = {
+    'original': BASE_URL+'/List_of_Law_%26_Order_episodes'
+    , 'svu': BASE_URL+'/List_of_Law_%26_Order:_Special_Victims_Unit_episodes'
+    , 'criminal_intent': BASE_URL+'/List_of_Law_%26_Order:_Criminal_Intent_episodes'
+    , 'trial_by_jury': BASE_URL+'/List_of_Law_%26_Order:_Trial_by_Jury_episodes'
+}
+
+# shows crawled when none are named on the command line
+DEFAULT_SHOWS = ['trial_by_jury']
+
+def make_fetcher(offline=OFFLINE):
+    from law_and_order.crawl.cache import ResponseCache
+    from law_and_order.crawl.fetch import Fetcher
+
+    return Fetcher(cache=ResponseCache(offline=offline), verbose=False)
+
+ISO_DATE_PAT = re.compile('(\d{4}-\d{2}-\d{2})', re.DOTALL|re.IGNORECASE)
+FLOAT_PAT    = re.compile( '(\d{1,2}\.\d{1,2})', re.DOTALL|re.IGNORECASE)
+
+def get_tables(soup):
+    css = {'class': 'wikitable plainrowheaders'}
+    tables = [table for table in soup.find_all('table', css)]
+    return tables
+
+def find_rows(table):
+    return [row for row in table.find_all('tr')]
+
+def find_columns(row):
+    return list(row.find_all('th'))
+
+def clean_txt(tag):
+    txt = tag.get_text().split('\n')
+    return u' '.join(txt).encode('utf-8').strip()
+
+def find_headers(table):
+    rows = find_rows(table)
+    rows = [find_columns(row) for row in rows]
+    rows = [ row for row in rows if len(row) >= 6 ]
+    headers = rows[0] if len(rows) == 1 else []
+    headers = [clean_txt(h) for h in headers]
+    return headers
+
+def parse_text(txt, rg):
+    txt = txt.strip()
+    matches = rg.findall(txt)
+    res = matches[0] if len(matches) else txt
+    return res
+
+def rm_quotes(txt):
+    return txt.strip('"') if len(txt) else ''
+
+def find_data(table):
+    from bs4 import Tag
+
+    css = {'class': 'vevent'}
+    rows = table.find_all('tr', css)
+
+    if len(rows) == 1:
+        return
+
+    episode_numbers = [row.find('th').get_text() for row in rows
+                        if row is not None and isinstance(row, Tag)]
+
+    rows = [[clean_txt(td) for td in row.find_all('td')]
+                for row in rows]
+
+    for (ep, row) in zip(episode_numbers, rows):
+        ep = int(ep) if ep.isdigit() else ep
+
+        row[0] = int(row[0]) if row[0].isdigit() else row[0]
+        row[1] = rm_quotes(row[1])
+        row[4] = parse_text(row[4], rg=ISO_DATE_PAT)
+        if len(row[4]) != 10:
+            try:
+                row[4] = datetime.strptime(row[4], '%B %d, %Y')
+            except:
+                pass
+
+        # only some have
+        # `U.S. Viewers (millions)`
+        if len(row) == 7:
+            row[6] = parse_text(row[6], rg=FLOAT_PAT)
+
+        row.insert(0, ep)
+
+    return rows
+
+def crawl_show(show, fetcher):
+    from bs4 import BeautifulSoup
+    import pandas as pd
+
+    with run.stage('wikipedia.%s' % show) as stage:
+        url = FRANCHISE.get(show)
+        print "Working on %s" % show
+        print "GET %s" % url
+
+        html = fetcher.get(url).encode('utf-8')
+        soup = BeautifulSoup(html, 'lxml')
+
+        tables = get_tables(soup)
+
+        if show == 'original':
+            tables.pop(0)
+
+        tables = [ t for t in tables if 'Law & Order Movie' not in t.get_text() ]
+
+        n_tables = len(tables)
+        stage.rows_in = n_tables
+        stage.rows_out = 0
+        for i, table in enumerate(tables):
+            nth_season = i + 1
+            print 'Processing season %d of %d' % ( nth_season, n_tables )
+            rows = find_data(table)
+            h = find_headers(table)
+
+            if rows is None or len(rows) == 0:
+                continue
+
+            data = defaultdict(list)
+
+            for j in range(len(h)):
+                data[h[j]] = [row[j] for row in rows]
+
+            df = pd.DataFrame(data)
+            print 'Season has %d episodes' % len(df)
+            df['nth_season'] = nth_season
+            f = './data/{show}/episodes/season_{num}.csv'
+            f = f.format(show=show, num=nth_season)
+            df.to_csv(f, index=False)
+            stage.rows_out += len(df)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Crawl episode tables from wikipedia.')
+    parser.add_argument('--show', action='append', choices=sorted(FRANCHISE),
+                        help='show to crawl; repeat for several '
+                             '(default: %s)' % ', '.join(DEFAULT_SHOWS))
+    parser.add_argument('--offline', action='store_true', default=OFFLINE,
+                        help='serve pages only from the HTTP cache')
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    pd.options.display.width = 200
+    pd.options.display.max_columns = 15
+    pd.options.display.max_colwidth = 25
+
+    fetcher = make_fetcher(args.offline)
+    for show in args.show or DEFAULT_SHOWS:
+        crawl_show(show, fetcher)
+
+if __name__ == '__main__':
+    main()
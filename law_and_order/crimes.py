@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+crimes.py
+
+Counts mentions of every crime in `ref/crimes.txt` in every recap and
+saves a sparse episode x crime matrix here:
+
+    Project/
+    |-- data/
+    |   |-- franchise/
+    |   |   |-- crime_counts.npz
+
+    $ python -m law_and_order.crimes
+
+Recaps are streamed from the franchise a chunk of rows at a time and only
+the (row, crime) pairs of each mention are kept, so memory grows with the
+number of mentions rather than the size of the corpus.
+
+Every recap is tokenized from its raw text with `tokenize`, never from
+the token cache in `law_and_order.tokens`: matching crimes needs no POS
+tags, and nltk splits words like "don't" differently, so counts from
+cached words would depend on what happened to be cached.
+"""
+import argparse
+import re
+from array import array
+from string import punctuation
+
+from law_and_order.franchise import CHUNK_ROWS, iter_franchise
+
+STOP_WORDS_FILE = './ref/stopwords.txt'
+
+OUTPUT_FILE = './data/franchise/crime_counts.npz'
+
+TOKENS = re.compile("[a-z0-9]+(?:'[a-z]+)?")
+QUALIFIER = re.compile('\\(.*?\\)')
+
+# marks the end of a phrase in the trie
+LEAF = None
+
+def read_stop_words(f=STOP_WORDS_FILE):
+    return [word for word in open(f).read().split('\n')]
+
+def rm_punct(txt):
+    return ''.join(ch for ch in txt if ch not in punctuation)
+
+def tokenize(txt):
+    return TOKENS.findall(txt.lower())
+
+def list_of_crimes():
+    """
+    Crime phrases from ref/crimes.txt, lower cased, with wikipedia
+    qualifiers like "(law)" dropped. Multi-word crimes stay whole.
+    """
+    crimes = [QUALIFIER.sub('', line).lower().strip() for line in
+                open('./ref/crimes.txt').read().split('\n')]
+
+    stop_words = set(read_stop_words())
+    crimes = [' '.join(tokenize(rm_punct(crime))) for crime in crimes]
+    crimes = list(set(crime for crime in crimes
+                        if crime and crime not in stop_words))
+    return sorted(crimes)
+
+def build_trie(phrases):
+    """
+    Token trie over every phrase. Each node is a dict of token -> child,
+    and a node that ends a phrase maps LEAF to that phrase's column.
+    """
+    trie = {}
+    for col, phrase in enumerate(phrases):
+        node = trie
+        for token in phrase.split():
+            node = node.setdefault(token, {})
+        node[LEAF] = col
+    return trie
+
+def find_crimes(tokens, trie):
+    """
+    Column of every crime phrase mentioned in `tokens`, overlapping
+    mentions included. One left-to-right pass: each position only walks
+    the trie as deep as the longest phrase that still matches.
+    """
+    found = []
+    for i in xrange(len(tokens)):
+        node = trie.get(tokens[i])
+        j = i + 1
+        while node is not None:
+            if LEAF in node:
+                found.append(node[LEAF])
+            if j == len(tokens):
+                break
+            node = node.get(tokens[j])
+            j += 1
+    return found
+
+def count_crimes(corpuses, crimes):
+    """
+    Sparse episode x crime matrix of mention counts, one row per corpus
+    and one column per crime phrase. `corpuses` can be any iterable and
+    is read once.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    trie = build_trie(crimes)
+    rows, cols = array('i'), array('i')
+    n_rows = 0
+    for row, corpus in enumerate(corpuses):
+        found = find_crimes(tokenize(corpus), trie)
+        rows.extend([row] * len(found))
+        cols.extend(found)
+        n_rows = row + 1
+
+    rows = np.frombuffer(rows, dtype=np.int32)
+    cols = np.frombuffer(cols, dtype=np.int32)
+    data = np.ones(len(rows), dtype=np.int32)
+    shape = (n_rows, len(crimes))
+    return sparse.coo_matrix((data, (rows, cols)), shape=shape).tocsr()
+
+def save_counts(counts, row_ids, crimes, f=OUTPUT_FILE):
+    import numpy as np
+    np.savez(f,
+        data=counts.data,
+        indices=counts.indices,
+        indptr=counts.indptr,
+        shape=counts.shape,
+        row_id=np.asarray(row_ids),
+        crimes=np.asarray(crimes))
+
+def load_counts(f=OUTPUT_FILE):
+    """The saved matrix, its franchise row ids and its crime labels."""
+    import numpy as np
+    from scipy import sparse
+
+    npz = np.load(f)
+    counts = sparse.csr_matrix(
+        (npz['data'], npz['indices'], npz['indptr']), shape=npz['shape'])
+    return counts, npz['row_id'], list(npz['crimes'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Count crime mentions in every recap.')
+    parser.add_argument('--batch-rows', type=int, default=CHUNK_ROWS,
+                        help='recaps read from the franchise at a time')
+    args = parser.parse_args(argv)
+
+    row_ids = []
+    def corpuses():
+        for df in iter_franchise(columns=['corpus'], dropna=['corpus'],
+                                 chunksize=args.batch_rows):
+            row_ids.extend(df.index)
+            for corpus in df.corpus:
+                yield corpus
+
+    crimes = list_of_crimes()
+    counts = count_crimes(corpuses(), crimes)
+    save_counts(counts, row_ids, crimes)
+
+    print 'Counted %d mentions of %d crimes in %d episodes' % (
+        counts.sum(), len(crimes), counts.shape[0])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+dedup.py
+
+Finds near-duplicate recaps: user submissions copied from one episode to
+another, or pasted twice with small edits under different titles.
+
+Each recap is cut into overlapping word shingles (SHINGLE words long)
+and summarized by a MinHash signature of N_PERM hashes. Two recaps agree
+on any one hash with probability equal to the Jaccard similarity of
+their shingle sets. Signatures are split into BANDS bands and every
+band is bucketed, so only recaps that collide in some band are ever
+compared. With 16 bands of 8 rows, pairs above ~0.7 similarity almost
+always collide and pairs below ~0.4 rarely do. Candidates are then
+checked against THRESHOLD with their exact Jaccard similarity. The
+work grows with the number of recaps, not the number of pairs.
+
+Near-duplicates are grouped. In each group the longest recap is kept
+and the others are dropped; `law_and_order.join` does this for every
+show before joining recaps to episodes.
+
+To list near-duplicate pairs across the whole franchise:
+
+    $ python -m law_and_order.dedup --threshold 0.8
+"""
+import argparse
+import re
+import zlib
+
+SHINGLE = 5
+N_PERM  = 128
+BANDS   = 16
+
+THRESHOLD = 0.8
+
+SEED = 2013
+
+# shingle hashes are polynomials over the word hashes, taken modulo a
+# Mersenne prime below 2**31 so every product fits in uint64
+PRIME = (1 << 31) - 1
+BASE  = 1000003
+
+TOKENS = re.compile("[a-z0-9]+(?:'[a-z]+)?")
+
+def shingles(txt, k=SHINGLE):
+    """Hashes of every run of `k` words in `txt`, as a sorted array."""
+    import numpy as np
+
+    if isinstance(txt, unicode):
+        txt = txt.encode('utf-8')
+    words = np.array([zlib.crc32(w) & PRIME for w in TOKENS.findall(txt.lower())],
+                     dtype=np.uint64)
+    if not len(words):
+        return words
+
+    n = max(len(words) - k + 1, 1)
+    hashes = np.zeros(n, dtype=np.uint64)
+    for j in xrange(min(k, len(words))):
+        hashes = (hashes * BASE + words[j:j + n]) % PRIME
+    return np.unique(hashes)
+
+def permutations(n_perm=N_PERM, seed=SEED):
+    """Odd multipliers and offsets for `n_perm` multiply-shift hashes."""
+    import numpy as np
+    rng = np.random.RandomState(seed)
+    hi, lo, b = rng.randint(0, 1 << 31, size=(3, n_perm)).astype(np.uint64)
+    a = (hi << np.uint64(32)) | (lo << np.uint64(1)) | np.uint64(1)
+    return a, b << np.uint64(32)
+
+def minhash(hashes, perms):
+    """
+    MinHash signature of one shingle set. Each hash is the high 32 bits
+    of `a * x + b` in wrapping 64-bit arithmetic.
+    """
+    import numpy as np
+
+    a, b = perms
+    values = (a[:, None] * hashes[None, :] + b[:, None]) >> np.uint64(32)
+    return values.min(axis=1).astype(np.uint32)
+
+def jaccard(x, y):
+    import numpy as np
+    if not len(x) and not len(y):
+        return 0.0
+    shared = len(np.intersect1d(x, y, assume_unique=True))
+    return float(shared) / (len(x) + len(y) - shared)
+
+def candidates(signatures, bands=BANDS):
+    """Pairs (i, j), i < j, whose signatures match in at least one band."""
+    n_docs, n_perm = signatures.shape
+    rows = n_perm // bands
+    pairs = set()
+    for band in xrange(bands):
+        buckets = {}
+        chunk = signatures[:, band * rows:(band + 1) * rows]
+        for i in xrange(n_docs):
+            buckets.setdefault(chunk[i].tostring(), []).append(i)
+        for docs in buckets.itervalues():
+            for x in xrange(len(docs)):
+                for y in xrange(x + 1, len(docs)):
+                    pairs.add((docs[x], docs[y]))
+    return pairs
+
+def near_duplicates(texts, threshold=THRESHOLD, k=SHINGLE, n_perm=N_PERM,
+        bands=BANDS):
+    """
+    Pairs of near-duplicate texts as (i, j, similarity) with i < j,
+    sorted. Empty or missing texts never match.
+    """
+    import numpy as np
+
+    perms = permutations(n_perm)
+    docs = [i for i, txt in enumerate(texts)
+                if isinstance(txt, basestring) and txt.strip()]
+    sets = [shingles(texts[i], k) for i in docs]
+    if not sets:
+        return []
+    signatures = np.vstack([minhash(s, perms) for s in sets])
+
+    found = []
+    for x, y in candidates(signatures, bands):
+        similarity = jaccard(sets[x], sets[y])
+        if similarity >= threshold:
+            found.append((docs[x], docs[y], similarity))
+    return sorted(found)
+
+def groups(n, pairs):
+    """Connected groups of indices, given (i, j, ...) pairs."""
+    parent = range(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for pair in pairs:
+        parent[find(pair[0])] = find(pair[1])
+
+    found = {}
+    for i in xrange(n):
+        found.setdefault(find(i), []).append(i)
+    return [g for g in found.itervalues() if len(g) > 1]
+
+def duplicates_to_drop(texts, threshold=THRESHOLD):
+    """
+    Positions in `texts` to drop: every near-duplicate except the
+    longest one of its group (the first, on ties).
+    """
+    pairs = near_duplicates(texts, threshold)
+    drop = []
+    for group in groups(len(texts), pairs):
+        keep = max(group, key=lambda i: (len(texts[i]), -i))
+        drop.extend(i for i in group if i != keep)
+    return sorted(drop)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='List near-duplicate recaps across the franchise.')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    from law_and_order.franchise import read_franchise
+
+    df = read_franchise(columns=['show', 'nth_season', 'no_in_season',
+                                 'title', 'corpus'], dropna=['corpus'])
+    pairs = near_duplicates(df.corpus.tolist(), args.threshold)
+    for i, j, similarity in pairs:
+        a, b = df.iloc[i], df.iloc[j]
+        print '%.2f  %s s%s e%s %s  |  %s s%s e%s %s' % (similarity,
+            a['show'], a['nth_season'], a['no_in_season'], a['title'],
+            b['show'], b['nth_season'], b['no_in_season'], b['title'])
+    print '%d near-duplicate pairs among %d recaps' % (len(pairs), len(df))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+entities.py
+
+Created by Austin Ogilvie on 2013-06-29.
+Copyright (c) 2013. All rights reserved.
+
+This script extracts all entities (people, names, places, etc.)
+from law and order episode recaps submitted by TV.com users.
+
+The script expects a single pipe delimited file as input here:
+
+    Project/
+    |-- data/
+    |   |-- franchise/
+    |   |   |   |-- episodes_and_recaps.txt
+
+The script will read in this file as a pandas DataFrame. Then it finds The
+`corpus` column and extracts all entities found within each record.
+
+Output stored here:
+
+    Project/
+    |-- ref/
+    |   |-- entities.txt
+
+    $ python -m law_and_order.entities --workers 4
+
+This takes a while to run. Recaps are sharded across a process pool;
+pass `--workers 1` to run serially.
+
+Recaps are streamed from the franchise `--batch-rows` at a time, and
+each recap is chunked and reduced to its entities one sentence at a
+time, so no entity trees outlive their sentence. The tags of each batch
+are appended to the memory-mapped token cache before the next batch is
+read, so they do not pile up in memory either.
+
+Entities found in each recap are cached in `ref/entity_cache.json`,
+keyed by a hash of the recap text and the tagger/chunker version, so a
+rerun only tags recaps that are new or have changed. Entries for recaps
+that are no longer in the corpus are dropped on every run.
+
+Tagging itself goes through the token cache in `law_and_order.tokens`:
+a recap that is already POS-tagged there is only chunked, and a recap
+tagged here is added to it for the other analyses.
+
+When the recap store from `law_and_order.corpus` is up to date, recaps
+are read from it instead of the franchise file. Workers then map the
+store themselves and are sent episode keys, not recap text.
+"""
+import argparse
+import hashlib
+import itertools
+import os
+from multiprocessing import Pool, cpu_count
+
+import ujson as json
+
+from law_and_order.corpus import attach, open_store, stored
+from law_and_order.franchise import CHUNK_ROWS, iter_franchise, read_franchise
+from law_and_order.instrument import run
+from law_and_order.tokens import (TokenCache, iter_tagged, read_token_cache,
+                                  save_token_cache, tag_recap)
+
+N_WORKERS  = cpu_count()
+CHUNK_SIZE = 8
+
+CACHE_FILE = './ref/entity_cache.json'
+
+# bump when iter_entities / find_entities change what they extract;
+# v2 reads chunk labels on nltk 3, where v1 found nothing
+TAGGER = 'ne_chunk-binary-v2'
+
+def tagger_version():
+    import nltk
+    return 'nltk-%s/%s' % (nltk.__version__, TAGGER)
+
+def read_data():
+    return read_franchise(columns=['corpus'], dropna=['corpus'])
+
+def iter_corpuses(chunksize=CHUNK_ROWS):
+    for df in iter_franchise(columns=['corpus'], dropna=['corpus'],
+                             chunksize=chunksize):
+        for corpus in df.corpus:
+            yield corpus
+
+def parts_of_speech(corpus):
+    return tag_recap(corpus)
+
+def tree_label(tree):
+    """A chunk's label: `label()` on nltk 3, `node` on nltk 2."""
+    label = getattr(tree, 'label', None)
+    if callable(label):
+        return label()
+    return getattr(tree, 'node', None)
+
+def find_entities(tree):
+    entity_names = []
+
+    label = tree_label(tree)
+    if label:
+        if label == 'NE':
+            entity_names.append(' '.join([child[0] for child in tree]))
+        else:
+            for child in tree:
+                entity_names.extend(find_entities(child))
+
+    return entity_names
+
+def cache_key(corpus, version=None):
+    if version is None:
+        version = tagger_version()
+    if isinstance(corpus, unicode):
+        corpus = corpus.encode('utf-8')
+    # update() takes buffers too, so store views are hashed in place
+    h = hashlib.sha1(version + '\0')
+    h.update(corpus)
+    return h.hexdigest()
+
+def read_cache(f=CACHE_FILE):
+    if not os.path.exists(f):
+        return {}
+    cache = json.loads(open(f, 'r').read())
+    # keep entities as utf-8 byte strings, like those read from the corpus
+    return dict((key, [word.encode('utf-8') for word in words])
+                for key, words in cache.iteritems())
+
+def write_cache(cache, f=CACHE_FILE):
+    with open(f + '.tmp', 'w') as fh:
+        fh.write(json.dumps(cache))
+    os.rename(f + '.tmp', f)
+
+def chunk_entities(sentences):
+    """Entities in already tagged sentences, one sentence at a time."""
+    import nltk
+    for tagged in sentences:
+        for word in find_entities(nltk.ne_chunk(tagged, binary=True)):
+            yield word
+
+def iter_entities(corpus):
+    """
+    Entities in `corpus`, sentence by sentence. Each sentence is tagged,
+    chunked and dropped before the next one is read.
+    """
+    return chunk_entities(iter_tagged(corpus))
+
+def recap_entities(corpus, tokens=None):
+    """
+    Entities in `corpus`. With a `tokens.TokenCache`, its tags are used,
+    and the recap is tagged and added to it if it is new.
+    """
+    if tokens is None:
+        return set(iter_entities(corpus))
+    return set(chunk_entities(tokens.tagged(corpus)))
+
+def keyed_entities(item):
+    """
+    (key, entities, tags) for a (key, corpus, tags) triple. A recap sent
+    without tags is tagged here and its tags are sent back for the token
+    cache; otherwise the tags that came with it are used.
+    """
+    key, corpus, tagged = item
+    if tagged is not None:
+        return key, sorted(set(chunk_entities(tagged))), None
+    tagged = tag_recap(corpus)
+    return key, sorted(set(chunk_entities(tagged))), tagged
+
+def stored_entities(item):
+    key, location, tagged = item
+    if tagged is None:
+        location = stored(location)
+    return keyed_entities((key, location, tagged))
+
+def make_pool(n_workers, store=None):
+    if store is None:
+        return Pool(n_workers)
+    return Pool(n_workers, attach, (store.blob_file, store.index_file))
+
+def extract_all(corpuses, n_workers=N_WORKERS, chunk_size=CHUNK_SIZE,
+        cache=None, batch_rows=CHUNK_ROWS, store=None, tokens=None):
+    """
+    Union of the entities found in every recap, sorted. `corpuses` can be
+    any iterable; it is read `batch_rows` recaps at a time and each batch
+    is finished before the next is read. Each worker handles `chunk_size`
+    recaps at a time and sends back one list per recap, so the output is
+    the same whatever the worker count.
+
+    Recaps whose key is already in `cache` are not tagged again. The
+    cache is updated in place and pruned to the current corpus.
+
+    Recaps missing from `cache` but found in `tokens`, a
+    `tokens.TokenCache`, are sent to the workers already tagged and are
+    only chunked. Any other recap is tagged by its worker and its tags
+    are added to `tokens`. Both caches are updated in place and pruned
+    to the current corpus.
+
+    With a `corpus.CorpusStore` as `store`, `corpuses` are its keys and
+    workers read each recap from the store themselves.
+    """
+    cache = {} if cache is None else cache
+    tokens = TokenCache() if tokens is None else tokens
+    version = tagger_version()
+    corpuses = iter(corpuses)
+    seen, seen_tokens, entities = set(), set(), set()
+    n_recaps = n_chunked = n_tagged = 0
+    pool = None
+
+    try:
+        while True:
+            batch = list(itertools.islice(corpuses, batch_rows))
+            if not batch:
+                break
+            texts = batch if store is None else map(store.view, batch)
+            keys = [cache_key(corpus, version) for corpus in texts]
+            token_keys = map(tokens.key, texts)
+            todo = dict((key, (item, token_key)) for key, item, token_key
+                        in zip(keys, batch, token_keys) if key not in cache)
+            token_key_of = dict((key, token_key) for key, (_, token_key)
+                                in todo.iteritems())
+            items = [(key, None, tokens.sentences(token_key))
+                     if token_key in tokens else (key, item, None)
+                     for key, (item, token_key) in todo.iteritems()]
+            n_untagged = sum(1 for item in items if item[2] is None)
+            run.count('token_cache_hits', len(items) - n_untagged)
+            del batch, texts, todo
+
+            if n_workers <= 1 or len(items) <= 1:
+                if store is not None:
+                    items = [(key, store[item] if item else None, tagged)
+                             for key, item, tagged in items]
+                found = itertools.imap(keyed_entities, items)
+            else:
+                pool = pool or make_pool(n_workers, store)
+                work = keyed_entities if store is None else stored_entities
+                found = pool.imap_unordered(work, items, chunk_size)
+
+            for key, names, tagged in found:
+                cache[key] = names
+                if tagged is not None:
+                    tokens.add(token_key_of[key], tagged)
+
+            run.count('recaps_in', len(keys))
+            run.count('entity_cache_hits', len(keys) - len(items))
+            n_recaps += len(keys)
+            n_chunked += len(items)
+            n_tagged += n_untagged
+            seen.update(keys)
+            seen_tokens.update(token_keys)
+            entities.update(word for key in keys for word in cache[key])
+            tokens.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print 'Chunked %d of %d recaps, POS-tagged %d' % (n_chunked, n_recaps,
+                                                      n_tagged)
+
+    for key in set(cache) - seen:
+        del cache[key]
+    tokens.prune(seen_tokens)
+
+    return sorted(entities)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Extract named entities from every recap.')
+    parser.add_argument('--workers', type=int, default=N_WORKERS)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--batch-rows', type=int, default=CHUNK_ROWS,
+                        help='recaps read from the franchise at a time')
+    args = parser.parse_args(argv)
+
+    with run.stage('entities') as stage:
+        print 'Extracting entities...'
+        print 'Grab a coffee. Using %d workers.' % args.workers
+        cache = read_cache()
+        tokens = read_token_cache()
+        store = open_store()
+        corpuses = iter_corpuses(args.batch_rows) if store is None \
+            else store.keys()
+        entity_names = extract_all(corpuses, args.workers, args.chunk_size,
+                                   cache=cache, batch_rows=args.batch_rows,
+                                   store=store, tokens=tokens)
+        write_cache(cache)
+        save_token_cache(tokens)
+        stage.rows_in = stage.counters['recaps_in']
+        stage.rows_out = len(entity_names)
+
+    print 'Writing entities to reference folder'
+    with open('./ref/entities.txt', 'w') as f:
+        f.write('\n'.join(word for word in entity_names))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+franchise.py
+
+Shared reader and writer for the combined franchise dataset.
+
+`law_and_order.join --save` writes the data twice, plus the recaps on
+their own:
+
+    Project/
+    |-- data/
+    |   |-- franchise/
+    |   |   |-- episodes_and_recaps.txt        <- pipe delimited text
+    |   |   |-- episodes_and_recaps.feather    <- typed, pre-sorted columns
+    |   |   |-- corpus.bin, corpus_index.npz   <- recaps by episode
+
+The Feather copy is an Arrow IPC file, already sorted by show, season
+and episode and typed, so `read_franchise` can memory-map it and pull
+out only the columns a script asks for instead of reparsing the whole
+text file. Rows keep the index they have in the text file, so anything
+that uses it as a row id sees the same ids from either copy, and text
+comes back as utf-8 `str` with NaN for missing values, as read_csv
+gives it.
+
+The table is built a column at a time (`to_table`) and written with
+`RecordBatchFileWriter`, since `pyarrow.feather` cannot convert frames
+from the pandas this project pins. If pyarrow is not installed or the
+write fails anyway, there is no Feather file. Without one, or when the
+text file is newer, `read_franchise` reads the text file.
+
+`law_and_order.schema.read_compact` returns the same frame with
+categorical, interned and small integer columns.
+
+Jobs that touch every recap once can use `iter_franchise` instead. It
+yields the same rows a `CHUNK_ROWS` slice at a time, so memory stays
+bounded by the chunk size rather than by the size of the franchise.
+
+Jobs that want single recaps by episode can use
+`law_and_order.corpus.open_store` and read nothing else.
+"""
+import os
+
+TEXT_FILE    = './data/franchise/episodes_and_recaps.txt'
+FEATHER_FILE = './data/franchise/episodes_and_recaps.feather'
+
+ORDER_BY = ['show', 'nth_season', 'no_in_season']
+
+CHUNK_ROWS = 256
+
+def _arrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    return pa
+
+def _text(v):
+    if v is None or v != v:
+        return None
+    return v if isinstance(v, basestring) else str(v)
+
+def _str(v):
+    return v.encode('utf-8') if type(v) is unicode else v
+
+def to_table(df):
+    """`df`'s columns as a pyarrow Table: text, timestamps or numbers."""
+    import numpy as np
+
+    pa = _arrow()
+    arrays = []
+    for col in df.columns:
+        values = df[col]
+        nulls = values.isnull().values
+        if values.dtype == object:
+            arrays.append(pa.array([_text(v) for v in values],
+                                   type=pa.string()))
+        elif values.dtype.kind == 'M':
+            arrays.append(pa.array(values.values.astype(np.int64),
+                                   type=pa.timestamp('ns'), mask=nulls))
+        else:
+            arrays.append(pa.array(values.values,
+                                   mask=nulls if nulls.any() else None))
+    return pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+
+def to_frame(table):
+    """A pyarrow Table as a DataFrame, with text as utf-8 `str`."""
+    df = table.to_pandas()
+    for col in df.columns:
+        if df[col].dtype == object:
+            values = df[col].map(_str)
+            df[col] = values.where(values.notnull())
+    return df
+
+def read_table(f, columns=None):
+    """The Arrow file `f`, memory-mapped, or just its `columns`."""
+    pa = _arrow()
+    table = pa.ipc.open_file(pa.memory_map(f)).read_all()
+    if columns is None:
+        return table
+    return pa.Table.from_arrays([table.column(c) for c in columns],
+                                names=list(columns))
+
+def write_franchise(df, text_file=TEXT_FILE, feather_file=FEATHER_FILE):
+    from law_and_order.corpus import write_store
+
+    df.to_csv(text_file, sep='|', index=False, encoding='utf-8')
+    write_store(df)
+    write_feather(df, feather_file, text_file)
+
+def write_feather(df, feather_file=FEATHER_FILE, text_file=TEXT_FILE):
+    """
+    The Feather copy of the franchise `df`, sorted, with the row ids it
+    has in `text_file`.
+    """
+    import pandas as pd
+
+    pa = _arrow()
+    if pa is None:
+        print 'pyarrow is not installed; skipping %s' % feather_file
+        return
+
+    df = df.reset_index(drop=True)
+    df.original_air_date = pd.to_datetime(df.original_air_date)
+    df = df.sort_index(by=ORDER_BY)
+    df = df.reset_index().rename(columns={'index': 'row_id'})
+
+    # the text file is already written, so a failed write drops the
+    # Feather copy rather than fail
+    tmp = feather_file + '.tmp'
+    try:
+        table = to_table(df)
+        writer = pa.RecordBatchFileWriter(tmp, table.schema)
+        try:
+            writer.write_table(table)
+        finally:
+            writer.close()
+        os.rename(tmp, feather_file)
+    except Exception, e:
+        print 'Could not write %s (%s: %s); reading will use %s' % (
+            feather_file, type(e).__name__, e, text_file)
+        for f in (tmp, feather_file):
+            if os.path.exists(f):
+                os.remove(f)
+
+def _use_feather(text_file, feather_file):
+    if _arrow() is None or not os.path.exists(feather_file):
+        return False
+    if not os.path.exists(text_file):
+        return True
+    return os.path.getmtime(feather_file) >= os.path.getmtime(text_file)
+
+def read_franchise(columns=None, dropna=None, text_file=TEXT_FILE,
+        feather_file=FEATHER_FILE):
+    """
+    The franchise as a DataFrame sorted by show, season and episode.
+
+    `columns` limits which columns are read; `dropna` drops rows with
+    nulls in any of the given columns.
+    """
+    import pandas as pd
+
+    if _use_feather(text_file, feather_file):
+        cols = None if columns is None else ['row_id'] + list(columns)
+        df = to_frame(read_table(feather_file, cols))
+        df = df.set_index('row_id')
+        df.index.name = None
+    else:
+        usecols = None
+        if columns is not None:
+            usecols = list(columns) + [c for c in ORDER_BY
+                                        if c not in columns]
+        df = pd.read_csv(text_file, sep='|', usecols=usecols)
+        df = df.sort_index(by=ORDER_BY)
+        if columns is not None:
+            df = df[list(columns)]
+
+    if dropna is not None:
+        df = df.dropna(subset=dropna)
+    return df
+
+def iter_franchise(columns=None, dropna=None, chunksize=CHUNK_ROWS,
+        text_file=TEXT_FILE, feather_file=FEATHER_FILE):
+    """
+    The franchise as a stream of DataFrames of at most `chunksize` rows,
+    indexed by row id like `read_franchise`. Rows come in storage order:
+    sorted from the Feather copy, join order from the text file.
+    """
+    import pandas as pd
+
+    if _use_feather(text_file, feather_file):
+        cols = None if columns is None else ['row_id'] + list(columns)
+        table = read_table(feather_file, cols)
+        chunks = (to_frame(table.slice(offset, chunksize))
+                    .set_index('row_id')
+                    for offset in xrange(0, table.num_rows, chunksize))
+    else:
+        usecols = None if columns is None else list(columns)
+        chunks = pd.read_csv(text_file, sep='|', usecols=usecols,
+                             chunksize=chunksize)
+
+    for df in chunks:
+        df.index.name = None
+        if columns is not None:
+            df = df[list(columns)]
+        if dropna is not None:
+            df = df.dropna(subset=dropna)
+        if len(df):
+            yield df
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+genders.py
+
+Labels the entities in `ref/entities.txt` with the sex of any known first
+name they contain and writes the ones that look like people here:
+
+    Project/
+    |-- ref/
+    |   |-- list_of_characters.txt
+
+    $ python -m law_and_order.genders
+"""
+import argparse
+
+from law_and_order.franchise import (CHUNK_ROWS, TEXT_FILE, iter_franchise,
+                                    read_franchise)
+from law_and_order.instrument import run
+
+def read_data(f=TEXT_FILE, columns=None):
+    return read_franchise(columns=columns, dropna=['corpus'], text_file=f)
+
+def read_entities(f='./ref/entities.txt'):
+    import pandas as pd
+    return pd.Series(row for row in open(f).read().split('\n'))
+
+def read_corpuses():
+    corpuses = read_data(columns=['corpus'])['corpus']
+    corpuses = corpuses.reset_index()
+    corpuses = corpuses.rename(columns={'index':'row_id'})
+    return corpuses
+
+def iter_corpuses(f=TEXT_FILE, chunksize=CHUNK_ROWS):
+    """`read_corpuses`, streamed `chunksize` rows at a time."""
+    for df in iter_franchise(columns=['corpus'], dropna=['corpus'],
+                             chunksize=chunksize, text_file=f):
+        corpuses = df['corpus'].reset_index()
+        yield corpuses.rename(columns={'index':'row_id'})
+
+def names_by_gender():
+    import nltk
+    import pandas as pd
+
+    names = nltk.corpus.names
+    male_names = pd.DataFrame(
+        {'name': names.words('male.txt'),
+        'sex': 'male'}
+    )
+    female_names = pd.DataFrame(
+        {'name': names.words('female.txt'),
+        'sex': 'female'}
+    )
+    names = male_names.append(female_names,ignore_index=True)
+    names = names.join(pd.get_dummies(names.sex))
+    names = names.groupby('name')[['female','male']].max()
+    names = names.sort_index()
+    names = names.reset_index()
+    return names
+
+def find_sex(entities, names):
+    """
+    Label each entity with the `male` / `female` flags of the last word
+    in it that is a known first name. Entities without one get NaN.
+
+    Every word of every entity is looked up at once: the entities are
+    split into a long (row_id, position, word) frame and merged against
+    the hash-indexed names table, instead of scanning the names table
+    once per word.
+    """
+    import pandas as pd
+
+    words = [(row_id, position, word)
+                for row_id, entity in zip(entities.row_id, entities.entity)
+                for position, word in enumerate(entity.split())]
+    words = pd.DataFrame(words, columns=['row_id', 'position', 'word'])
+
+    index = names.set_index('name')[['male', 'female']]
+    words = words.join(index, on='word', how='inner')
+    words = words.sort_index(by=['row_id', 'position'])
+
+    sex = words.groupby('row_id')[['male', 'female']].last()
+    return entities.join(sex, on='row_id')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Label entities by sex and write the list of characters.')
+    parser.parse_args(argv)
+
+    import pandas as pd
+    pd.options.display.width = 500
+    pd.options.display.max_columns = 6
+    pd.options.display.max_colwidth = 100
+
+    with run.stage('genders') as stage:
+        entities = read_entities()
+        names = names_by_gender().reset_index()
+        entities = entities.reset_index(name='entity')
+        entities.columns = ['row_id', 'entity']
+        stage.rows_in = len(entities)
+
+        entities = find_sex(entities, names)
+
+        entities['is_name'] = \
+            entities[['male', 'female']].notnull().any(axis=1)
+
+        people = entities[entities['is_name']==True]
+        people = people.ix[:, ['row_id','entity','male','female']]
+        people = people.reset_index(drop=True)
+        people = people.rename(columns={'entity':'character_name'})
+        people.to_csv('./ref/list_of_characters.txt', index=False, sep='|')
+        stage.rows_out = len(people)
+
+if __name__ == '__main__':
+    main()
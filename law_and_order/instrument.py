@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+instrument.py
+
+Run instrumentation shared by the crawlers and the processing scripts.
+
+Each script wraps its work in named stages and bumps counters as it goes:
+
+    from law_and_order.instrument import run
+
+    with run.stage('genders') as stage:
+        stage.rows_in = len(entities)
+        ...
+        stage.rows_out = len(people)
+
+    run.count('http_requests')
+    run.count('http_bytes', len(body))
+
+For every stage the run records wall time, process CPU time, rows in and
+out, the counters bumped while it was active, and peak RSS when it
+finished. Counters are also totalled for the whole run. Stages can nest
+and can run in several threads at once; counts go to the innermost stage
+of the thread that made them.
+
+Nothing is written unless asked for, so scripts behave as before. Two
+environment variables turn reporting on without editing any code:
+
+    LAO_REPORT=run.json     write a JSON run report when the script exits
+    LAO_PROFILE=genders     cProfile the named stage into genders.prof
+"""
+import atexit
+import cProfile
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import ujson as json
+
+REPORT_ENV  = 'LAO_REPORT'
+PROFILE_ENV = 'LAO_PROFILE'
+
+def peak_rss_kb():
+    """Peak resident set size of this process or any of its children."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children)
+
+def cpu_seconds():
+    t = os.times()
+    return t[0] + t[1] + t[2] + t[3]
+
+class Stage(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.rows_in = None
+        self.rows_out = None
+        self.counters = defaultdict(int)
+        self.wall_s = None
+        self.cpu_s = None
+        self.peak_rss_kb = None
+
+    def to_dict(self):
+        return {
+            'name': self.name
+            , 'wall_s': self.wall_s
+            , 'cpu_s': self.cpu_s
+            , 'rows_in': self.rows_in
+            , 'rows_out': self.rows_out
+            , 'counters': dict(self.counters)
+            , 'peak_rss_kb': self.peak_rss_kb
+        }
+
+class Run(object):
+
+    def __init__(self):
+        self.started = datetime.utcnow()
+        self.stages = []
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name):
+        stage = Stage(name)
+        stack = self._stack()
+        stack.append(stage)
+
+        profiler = None
+        if os.environ.get(PROFILE_ENV) == name:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        start, cpu = time.time(), cpu_seconds()
+        try:
+            yield stage
+        finally:
+            stage.wall_s = time.time() - start
+            stage.cpu_s = cpu_seconds() - cpu
+            stage.peak_rss_kb = peak_rss_kb()
+            stack.pop()
+
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats('%s.prof' % name)
+
+            with self._lock:
+                self.stages.append(stage)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+            stack = self._stack()
+            if stack:
+                stack[-1].counters[name] += n
+
+    def report(self):
+        return {
+            'script': os.path.basename(sys.argv[0])
+            , 'started': self.started.isoformat()
+            , 'stages': [stage.to_dict() for stage in self.stages]
+            , 'counters': dict(self.counters)
+            , 'peak_rss_kb': peak_rss_kb()
+        }
+
+    def write(self, f):
+        with open(f, 'w') as fh:
+            fh.write(json.dumps(self.report(), indent=2))
+
+run = Run()
+
+def _write_report():
+    f = os.environ.get(REPORT_ENV)
+    if f:
+        run.write(f)
+
+atexit.register(_write_report)
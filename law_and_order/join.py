@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+join.py
+
+Created by Austin Ogilvie on 2013-06-29.
+Copyright (c) 2013. All rights reserved.
+
+This script cleans and combines Law and Order TV data
+from several sources. The script expects that the data
+has already been downloaded and stored within a particular
+directory structure.
+
+Directory structure expected is as follows:
+
+    Project/
+    |-- data/
+    |   |-- original/
+    |   |   |-- episodes/
+    |   |   |-- recaps/
+    |   |-- svu/
+    |   |   |-- episodes/
+    |   |   |   |-- season_1.csv
+    |   |   |   |-- season_2.csv
+    |   |   |   |-- season_3.csv
+    |   |   |-- recaps/
+    |   |   |   |-- season_1.json
+    |   |   |   |-- season_2.json
+    |   |   |   |-- season_3.json
+    |
+    |-- law_and_order/
+    |   |-- join.py
+
+
+Recaps are user-submitted text corpuses from tv.com.
+Because these are submitted by users, not every episode will have
+a recap / corpus.
+
+Episodes describe data pulled from wikipedia. Records describe individual
+episodes along with their air date, viewership, title, etc.
+
+The script will combine the two sources into one pipe delimtied txt file here,
+along with a typed, pre-sorted Feather copy read by `franchise.read_franchise`:
+
+    Project/
+    |-- data/
+    |   |-- franchise/
+    |   |   |   |-- episodes_and_recaps.txt
+    |   |   |   |-- episodes_and_recaps.feather
+
+Recaps are matched to episodes by title, not by episode number, since
+tv.com and wikipedia number episodes differently (see
+`law_and_order.titles`). `match_confidence` holds the title similarity
+of each match; episodes without a recap have none.
+
+Near-duplicate recaps within a show (the same text pasted under several
+episodes, give or take a few edits) are found with `law_and_order.dedup`.
+Only the longest of each group is joined.
+
+Each season file is read into its own frame and every stage concatenates
+them once, rather than appending file by file, which copied everything
+read so far on each append. Median wall time and peak RSS of
+`join_episodes_and_recaps.py` on bench copies (`bench/synthetic.py`),
+before (repeated `DataFrame.append`) and after:
+
+    scale   rows     before            after
+    1x        983     1.05 s   96 MB    0.72 s   60 MB
+    10x     9,830     8.25 s  154 MB    5.30 s  132 MB
+    100x   98,300   144.4 s   783 MB   45.8 s   837 MB
+
+Run it from the project root; `--save` writes the combined files:
+
+    $ python -m law_and_order.join --save
+    $ python -m law_and_order.join --dedup-threshold 0.9
+    $ python -m law_and_order.join --no-dedup
+"""
+import argparse
+import os
+import re
+from string import punctuation
+
+import ujson as json
+
+from law_and_order.dedup import THRESHOLD, duplicates_to_drop
+from law_and_order.instrument import run
+from law_and_order.titles import match_titles
+
+show_names = ['criminal_intent','trial_by_jury', 'svu', 'original']
+
+colorder = ['directed_by','no_in_season','no_in_series','original_air_date',
+            'production_code','title','us_viewers_millions','written_by',
+            'nth_season','show','corpus_url','source','match_confidence',
+            'corpus']
+
+def snakify(txt):
+    txt = txt.strip().lower()
+    exclude = [ch for ch in punctuation if ch != '_']
+    txt = ''.join(c for c in txt if c not in exclude)
+    return txt.replace(' ', '_')
+
+def utf8ify(txt):
+    txt = ' '.join(txt.split())
+    try:
+        txt = u''.join(txt).encode('utf-8').strip()
+    except:
+        txt = ''.join(ch for ch in txt if ord(ch) < 128)
+        return utf8ify(txt)
+    return txt
+
+def ls_files_by_type(p, ext='.json'):
+    names = [p+'/'+f for f in os.listdir(p)
+            if f.endswith(ext)]
+    return names
+
+def json_to_dataframe(f):
+    """
+    The recaps in one season file, leaving out pages the crawler
+    journaled as failed: those have an `error` and no text.
+    """
+    import pandas as pd
+    data = json.loads(open(f, 'r').read())['episode_recaps']
+    return pd.DataFrame.from_records([rec for rec in data
+                                      if 'error' not in rec])
+
+def read_recaps(show):
+    import pandas as pd
+    p = './data/{show}/{kind}'
+    json_path = p.format(show=show, kind='recaps')
+    files = ls_files_by_type(json_path)
+    if len(files) == 0:
+        return []
+
+    recaps = pd.concat([json_to_dataframe(f) for f in files])
+    if len(recaps) == 0:
+        return []
+    recaps.nth_season = recaps.nth_season.astype(int)
+    recaps.nth_episode = recaps.nth_episode.astype(int)
+    return recaps
+
+def read_episodes(show):
+    import pandas as pd
+
+    def ensure_columns(frame):
+        frame.columns = [snakify(col) for col in frame.columns]
+        frame['show_name'] = show
+
+        colnames = map(snakify,
+            ['show_name',
+            'Directed by',
+            'No. in season',
+            'No. in series',
+            'Original air date',
+            'Production code',
+            'Title',
+            'U.S. viewers (millions)',
+            'Written by',
+            'nth_season'])
+
+        swap = {
+            'no': 'no_in_series',
+            'ep': 'no_in_season',
+            'us_viewers_millions29': 'us_viewers_millions',
+            'season_no': 'no_in_season',
+            'series_no': 'no_in_series',
+            'directed_by': 'directed_by',
+            'original_airdate':'original_air_date',
+            'written_by': 'written_by'
+        }
+
+        frame = frame.rename(columns=swap)
+
+        for col in colnames:
+            if col not in frame.columns:
+                frame[col] = None
+
+        frame = frame.ix[:, colnames]
+        return frame
+
+    p = './data/{show}/{kind}'
+    csv_path = p.format(show=show, kind='episodes')
+    files = ls_files_by_type(csv_path, ext='.csv')
+    episodes = pd.concat([ensure_columns(pd.read_csv(f)) for f in files])
+    return episodes
+
+def parse_title(txt, rg = re.compile('(.*)\\[\\d+\\]$')):
+    m = rg.findall(txt)
+    if len(m):
+        txt = m[0].strip()
+        txt = txt.replace('"', '')
+    return txt
+
+FOOTNOTE = re.compile('\\[\\d+\\]')
+ISO_DATE = re.compile('(\\d{4}-\\d{2}-\\d{2}(?: \\d{2}:\\d{2}:\\d{2})?)')
+PARENS   = re.compile('\\((.*?)\\)')
+
+def parse_dates(dates):
+    """
+    Parse a column of air dates in one pass.
+
+    Wikipedia tables mix ISO dates, "13 November 1990" and
+    "March 9, 2004 (2004-03-09)", any of them with a footnote marker
+    like `[4]`. Markers are dropped; then an ISO date found anywhere in
+    the text wins, then anything in parentheses, then the raw text, and
+    everything is handed to a single `to_datetime` call.
+
+    Returns the parsed dates and the number of non-empty values that
+    could not be parsed.
+    """
+    import numpy as np
+    import pandas as pd
+
+    txt = dates.where(dates.notnull(), '').astype(str)
+    txt = txt.str.replace(u'\xa0'.encode('utf-8'), ' ')
+    txt = txt.str.replace(FOOTNOTE.pattern, '').str.strip()
+
+    candidates = txt.str.extract(ISO_DATE, expand=False)
+    candidates = candidates.fillna(txt.str.extract(PARENS, expand=False))
+    candidates = candidates.fillna(txt)
+
+    parsed = pd.to_datetime(candidates.replace('', np.nan), errors='coerce')
+    failed = parsed.isnull() & (txt != '')
+    return parsed, int(failed.sum())
+
+NUMBER = re.compile('(\\d+(?:\\.\\d+)?)')
+
+def parse_viewers(viewers):
+    """
+    U.S. viewers in millions as a float column, dropping footnote
+    markers like `17.29[2]` and anything that is not a number (`N/A`).
+    """
+    txt = viewers.astype(str).str.replace(FOOTNOTE.pattern, '')
+    txt = txt.str.extract(NUMBER, expand=False)
+    return txt.astype(float)
+
+def drop_near_duplicates(recaps, threshold=THRESHOLD):
+    import numpy as np
+
+    drop = duplicates_to_drop(recaps.corpus.tolist(), threshold)
+    run.count('near_duplicates', len(drop))
+    if drop:
+        print 'Dropping %d near-duplicate recaps' % len(drop)
+    keep = np.ones(len(recaps), dtype=bool)
+    keep[drop] = False
+    return recaps[keep]
+
+def join_recaps(episodes, recaps):
+    """
+    Left join of recaps onto episodes, matched by title within a window
+    of seasons (see `law_and_order.titles`), with the title similarity
+    of each match in `match_confidence`.
+    """
+    episodes = episodes.reset_index(drop=True)
+    recaps = recaps.reset_index(drop=True)
+
+    matches = match_titles(
+        zip(episodes.nth_season, episodes.no_in_season, episodes.title),
+        zip(recaps.nth_season, recaps.nth_episode, recaps.episode_title))
+    run.count('recaps_matched', len(matches))
+
+    ep, rec, confidence = zip(*matches) if matches else ((), (), ())
+    matched = recaps.drop('nth_season', axis=1).iloc[list(rec)]
+    matched.index = list(ep)
+    matched['match_confidence'] = list(confidence)
+    return episodes.join(matched, how='left')
+
+def join_show(show, threshold=THRESHOLD):
+    print 'Processing %s' % show
+
+    episodes = read_episodes(show)
+    print 'Found %d episodes' % len(episodes)
+    run.count('episodes_in', len(episodes))
+    if len(episodes) > 0:
+        episodes.original_air_date, n_bad = \
+            parse_dates(episodes.original_air_date)
+        if n_bad:
+            print 'Unable to parse %d air dates' % n_bad
+
+        episodes.title = episodes.title.apply(parse_title)
+        episodes.title = episodes.title.str.strip('"')
+        episodes.title = episodes.title.apply(utf8ify)
+        episodes.title = episodes.title.str.title()
+
+        # this deals with rows where
+        # us_viewers_millions has a value like
+        # 0     17.29[2]
+        # 1     14.52[2]
+        episodes.us_viewers_millions = \
+            parse_viewers(episodes.us_viewers_millions) * 1000000
+
+        if show == 'trial_by_jury':
+            episodes.no_in_season = episodes.no_in_series
+
+    recaps = read_recaps(show)
+    print 'Found %d recaps' % len(recaps)
+    run.count('recaps_in', len(recaps))
+    if len(recaps) > 0:
+        recaps.corpus[recaps.corpus == ''] = None
+        recaps.episode_title = recaps.episode_title.apply(parse_title)
+        recaps.episode_title = recaps.episode_title.apply(utf8ify)
+        recaps.episode_title = recaps.episode_title.str.title()
+
+        if threshold:
+            recaps = drop_near_duplicates(recaps, threshold)
+
+        return join_recaps(episodes, recaps)
+
+def timed_join_show(show, threshold=THRESHOLD):
+    with run.stage('join.%s' % show) as stage:
+        joined = join_show(show, threshold)
+        stage.rows_in = stage.counters['episodes_in'] + stage.counters['recaps_in']
+        stage.rows_out = 0 if joined is None else len(joined)
+    return joined
+
+def join_all(shows=show_names, threshold=THRESHOLD):
+    """
+    Read, clean and join every show, then concatenate them once, in
+    `shows` order. Near-duplicate recaps at or above `threshold`
+    similarity are dropped; pass None to keep them all.
+
+    Shows are joined one after another. The work is pandas and regex
+    code that holds the GIL, and a thread per show measured slower on
+    the bench copies: 11.8-12.7 s against 10.3-12.4 s serially at 10x,
+    213-220 s against 201-206 s at 100x.
+    """
+    import pandas as pd
+
+    with run.stage('join') as stage:
+        joined = [timed_join_show(show, threshold) for show in shows]
+        joined = [frame for frame in joined if frame is not None]
+        combined = pd.concat(joined)
+        stage.rows_in = sum(len(frame) for frame in joined)
+        stage.rows_out = len(combined)
+
+    duped_columns = ['nth_episode', 'episode_title', 'show']
+    combined = combined.drop(duped_columns, axis=1)
+    combined = combined.rename(columns={'show_name': 'show'})
+    return combined
+
+def summarize(combined):
+    import numpy as np
+
+    print
+    print "n_shows:    %d" % (len(combined.show.unique()))
+    print "n_episodes: %d" % len(combined)
+    print
+
+    grouped    = combined.groupby(['show'])
+    n_corpuses = grouped.corpus.apply(lambda x: x.notnull().sum())
+    print "non-null corpuses\n"
+    print n_corpuses
+    print ("Total"+ "%d".rjust(16) % np.sum(n_corpuses))
+    print
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Join episodes and recaps for every show.')
+    parser.add_argument('--save', action='store_true',
+                        help='write the combined franchise files')
+    parser.add_argument('--dedup-threshold', type=float, default=THRESHOLD,
+                        help='drop recaps at least this similar to a longer '
+                             'one (default: %(default)s)')
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='keep near-duplicate recaps')
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    pd.options.display.width = 500
+    pd.options.display.max_columns = 15
+    pd.options.display.max_colwidth = 25
+
+    combined = join_all(threshold=None if args.no_dedup
+                        else args.dedup_threshold)
+    summarize(combined)
+
+    if args.save:
+        from law_and_order.franchise import write_franchise
+        combined = combined.ix[:, colorder]
+        write_franchise(combined)
+
+if __name__ == '__main__':
+    main()
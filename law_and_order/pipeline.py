@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+pipeline.py
+
+Runs the whole pipeline, skipping every stage whose inputs have not
+changed since it last ran:
+
+    crawl.wikipedia.<show>  ->  data/<show>/episodes/
+    crawl.tvdotcom.<show>   ->  data/<show>/recaps/
+    join                    ->  data/franchise/episodes_and_recaps.txt
+    entities                ->  ref/entities.txt
+    genders                 ->  ref/list_of_characters.txt
+
+Each stage declares the files and directories it reads and writes; a
+stage runs after every stage that writes one of its inputs. Stages with
+no dependencies between them, such as the crawls of different shows, run
+side by side, `--jobs` at a time, each in its own interpreter with its
+output in data/.pipeline/<stage>.log. The crawls share the HTTP
+response cache, which is safe to use from several processes at once.
+
+A stage is skipped when the content hashes of its inputs and of its
+sources are the ones it last ran with, and its outputs are still the
+ones it wrote. A stage's sources are its module and every module of
+this package it imports, directly or through other modules, so editing
+titles.py or dedup.py makes join out of date. File hashes are remembered together with each file's size and
+mtime, so unchanged files are never read again and a rerun with nothing
+to do costs one stat per file. Everything is recorded in
+data/.pipeline/state.json.
+
+The crawls have no inputs. They run only when their output directory is
+missing or empty, or when named with `--force`.
+
+    $ python -m law_and_order.pipeline
+    $ python -m law_and_order.pipeline --dry-run
+    $ python -m law_and_order.pipeline --force crawl.tvdotcom.svu --offline
+"""
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+import ujson as json
+
+from law_and_order.corpus import BLOB_FILE, INDEX_FILE
+from law_and_order.franchise import TEXT_FILE
+from law_and_order.instrument import run
+from law_and_order.join import show_names
+
+STATE_DIR  = './data/.pipeline'
+STATE_FILE = STATE_DIR + '/state.json'
+
+ENTITIES_FILE   = './ref/entities.txt'
+CHARACTERS_FILE = './ref/list_of_characters.txt'
+
+N_JOBS = 4
+
+PACKAGE = 'law_and_order'
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class Stage(object):
+    """
+    One script run with `python -m`. Directory outputs end in '/' and are
+    created before the stage runs.
+    """
+
+    def __init__(self, name, module, args=(), inputs=(), outputs=()):
+        self.name = name
+        self.module = module
+        self.args = list(args)
+        self.inputs = [os.path.normpath(p) for p in inputs]
+        self.outputs = [os.path.normpath(p) for p in outputs]
+        self.directories = [os.path.normpath(p) for p in outputs
+                            if p.endswith('/')]
+
+    def command(self):
+        return [sys.executable, '-m', self.module] + self.args
+
+    def __repr__(self):
+        return 'Stage(%r)' % self.name
+
+def module_file(module):
+    """Path to the source of a module of this package, or None."""
+    base = os.path.join(PACKAGE_DIR, *module.split('.')[1:])
+    for path in (base + '.py', os.path.join(base, '__init__.py')):
+        if os.path.isfile(path):
+            return os.path.relpath(path)
+    return None
+
+def package_imports(path):
+    """
+    Names of the modules of this package that the source at `path`
+    imports anywhere, including inside functions. `from package import
+    name` lists both the package and `package.name`, since `name` may be
+    a module.
+    """
+    import ast
+
+    with open(path, 'r') as fh:
+        tree = ast.parse(fh.read(), path)
+    found = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            found.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module \
+                and not node.level:
+            found.append(node.module)
+            found.extend('%s.%s' % (node.module, alias.name)
+                         for alias in node.names)
+    return [name for name in found if name.split('.')[0] == PACKAGE]
+
+def sources(stage):
+    """Sources of a stage's module and of every package module it imports."""
+    found, todo, seen = [], [stage.module], set()
+    while todo:
+        module = todo.pop()
+        if module in seen:
+            continue
+        seen.add(module)
+        path = module_file(module)
+        if path is None:
+            continue
+        found.append(path)
+        todo.extend(package_imports(path))
+    return sorted(set(found))
+
+def stages(shows=show_names, offline=False):
+    """Every stage of the pipeline, in no particular order."""
+    crawl_args = ['--offline'] if offline else []
+    found = []
+    for show in shows:
+        found.append(Stage('crawl.wikipedia.%s' % show,
+                           'law_and_order.crawl.wikipedia',
+                           ['--show', show] + crawl_args,
+                           outputs=['./data/%s/episodes/' % show]))
+        found.append(Stage('crawl.tvdotcom.%s' % show,
+                           'law_and_order.crawl.tvdotcom',
+                           ['--show', show] + crawl_args,
+                           outputs=['./data/%s/recaps/' % show]))
+
+    found.append(Stage('join', 'law_and_order.join', ['--save'],
+        inputs=['./data/%s/%s' % (show, kind) for show in show_names
+                for kind in ('episodes', 'recaps')],
+        outputs=[TEXT_FILE, BLOB_FILE, INDEX_FILE]))
+    # the recap store entities reads is written with the text file, from
+    # the same frame; its zipped index is not byte for byte reproducible
+    found.append(Stage('entities', 'law_and_order.entities',
+        inputs=[TEXT_FILE],
+        outputs=[ENTITIES_FILE]))
+    found.append(Stage('genders', 'law_and_order.genders',
+        inputs=[ENTITIES_FILE],
+        outputs=[CHARACTERS_FILE]))
+    return found
+
+def _covers(a, b):
+    return a == b or b.startswith(a + os.sep)
+
+def dependencies(stage, all_stages):
+    """Stages that write one of `stage`'s inputs."""
+    return [other for other in all_stages if other is not stage and
+            any(_covers(out, inp) or _covers(inp, out)
+                for inp in stage.inputs for out in other.outputs)]
+
+def levels(all_stages):
+    """
+    `all_stages` in dependency order, as lists of stages that do not
+    depend on each other.
+    """
+    deps = dict((stage.name, set(d.name for d in
+                                 dependencies(stage, all_stages)))
+                for stage in all_stages)
+    done, ordered = set(), []
+    remaining = list(all_stages)
+    while remaining:
+        ready = [stage for stage in remaining if deps[stage.name] <= done]
+        if not ready:
+            raise ValueError('dependency cycle among %s' %
+                             ', '.join(stage.name for stage in remaining))
+        ordered.append(ready)
+        done.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage not in ready]
+    return ordered
+
+def file_hash(path, seen):
+    """
+    sha1 of a file. `seen` maps paths to [size, mtime, sha1] and is
+    updated; a file whose size and mtime match is not read again.
+    """
+    st = os.stat(path)
+    size, mtime = st.st_size, repr(st.st_mtime)
+    known = seen.get(path)
+    if known and known[0] == size and known[1] == mtime:
+        return known[2]
+
+    h = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), ''):
+            h.update(block)
+    seen[path] = [size, mtime, h.hexdigest()]
+    return seen[path][2]
+
+def content_hash(path, seen):
+    """
+    sha1 of a file, or of the names and hashes of every file under a
+    directory. None if `path` does not exist.
+    """
+    if os.path.isfile(path):
+        return file_hash(path, seen)
+    if not os.path.isdir(path):
+        return None
+
+    h = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for f in sorted(files):
+            p = os.path.join(root, f)
+            h.update('%s %s\n' % (os.path.relpath(p, path), file_hash(p, seen)))
+    return h.hexdigest()
+
+def fingerprint(stage, seen):
+    """Hash of what a stage was run with: its sources, args and inputs."""
+    h = hashlib.sha1(' '.join([stage.module] + stage.args) + '\n')
+    for path in sources(stage) + stage.inputs:
+        h.update('%s %s\n' % (path, content_hash(path, seen)))
+    return h.hexdigest()
+
+def _exists(path):
+    return os.path.isfile(path) or (os.path.isdir(path) and
+                                    any(files for _, _, files in os.walk(path)))
+
+def is_fresh(stage, state, seen):
+    """True if `stage` would do nothing if it ran now."""
+    if not stage.inputs:
+        return all(_exists(p) for p in stage.outputs)
+
+    last = state['stages'].get(stage.name)
+    if last is None or last['fingerprint'] != fingerprint(stage, seen):
+        return False
+    return all(content_hash(p, seen) == last['outputs'].get(p)
+               for p in stage.outputs)
+
+def read_state(f=STATE_FILE):
+    if not os.path.exists(f):
+        return {'stages': {}, 'files': {}}
+    return json.loads(open(f, 'r').read())
+
+def write_state(state, f=STATE_FILE):
+    with open(f + '.tmp', 'w') as fh:
+        fh.write(json.dumps(state))
+    os.rename(f + '.tmp', f)
+
+def run_stage(stage, log_dir=STATE_DIR):
+    """Run `stage` with its output in a log file; returns the exit status."""
+    for d in stage.directories:
+        if not os.path.isdir(d):
+            os.makedirs(d)
+    log = os.path.join(log_dir, stage.name + '.log')
+    with open(log, 'w') as fh:
+        return subprocess.call(stage.command(), stdout=fh,
+                               stderr=subprocess.STDOUT)
+
+def run_pipeline(all_stages, force=(), n_jobs=N_JOBS, dry_run=False):
+    """
+    Run every stage that is out of date, in dependency order. Returns
+    the names of the stages that failed; stages that depend on them are
+    not run.
+    """
+    if not os.path.isdir(STATE_DIR):
+        os.makedirs(STATE_DIR)
+    state = read_state()
+    seen = state['files']
+    failed, changed = set(), set()
+    pool = ThreadPool(n_jobs)
+
+    try:
+        for level in levels(all_stages):
+            todo = []
+            for stage in level:
+                deps = set(d.name for d in dependencies(stage, all_stages))
+                if deps & failed:
+                    failed.add(stage.name)
+                    print '%-32s not run: %s failed' % (stage.name,
+                        ', '.join(sorted(deps & failed)))
+                elif dry_run and deps & changed:
+                    changed.add(stage.name)
+                    print '%-32s waits on %s' % (stage.name,
+                        ', '.join(sorted(deps & changed)))
+                elif stage.name in force or not is_fresh(stage, state, seen):
+                    todo.append(stage)
+                else:
+                    run.count('stages_skipped')
+                    print '%-32s up to date' % stage.name
+
+            if dry_run:
+                for stage in todo:
+                    changed.add(stage.name)
+                    print '%-32s out of date' % stage.name
+                continue
+
+            fingerprints = dict((stage.name, fingerprint(stage, seen))
+                                for stage in todo)
+            for stage in todo:
+                print '%-32s running' % stage.name
+
+            def timed(stage):
+                start = time.time()
+                return run_stage(stage), time.time() - start
+
+            for stage, (status, wall_s) in zip(todo, pool.map(timed, todo)):
+                run.count('stages_run')
+                if status != 0:
+                    failed.add(stage.name)
+                    print '%-32s FAILED (exit %d, see %s/%s.log)' % (
+                        stage.name, status, STATE_DIR, stage.name)
+                    continue
+                state['stages'][stage.name] = {
+                    'fingerprint': fingerprints[stage.name]
+                    , 'outputs': dict((p, content_hash(p, seen))
+                                      for p in stage.outputs)
+                }
+                print '%-32s done in %.1fs' % (stage.name, wall_s)
+
+            write_state(state)
+    finally:
+        pool.close()
+
+    return sorted(failed)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run every pipeline stage that is out of date.')
+    parser.add_argument('--show', action='append', choices=show_names,
+                        help='show to crawl; repeat for several '
+                             '(default: all)')
+    parser.add_argument('--force', action='append', default=[],
+                        metavar='STAGE',
+                        help='run this stage even if it is up to date')
+    parser.add_argument('--jobs', type=int, default=N_JOBS,
+                        help='stages run at once (default: %(default)s)')
+    parser.add_argument('--offline', action='store_true',
+                        help='crawl only from the HTTP cache')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='list what would run, without running it')
+    args = parser.parse_args(argv)
+
+    all_stages = stages(args.show or show_names, args.offline)
+    names = set(stage.name for stage in all_stages)
+    for name in args.force:
+        if name not in names:
+            parser.error('unknown stage %s (choose from %s)' % (
+                name, ', '.join(sorted(names))))
+
+    with run.stage('pipeline'):
+        failed = run_pipeline(all_stages, set(args.force), args.jobs,
+                              args.dry_run)
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
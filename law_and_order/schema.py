@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+schema.py
+
+Compact, typed in-memory forms of the franchise and character tables.
+
+Read as-is, every text column is an object column of separate Python
+strings and every number is 64 bits wide. Each table here has a schema
+that `apply_schema` uses to store it more tightly:
+
+    category    few distinct values (show, directed_by, written_by, ...):
+                small integer codes plus one copy of each value
+    str         mostly distinct text (title, character_name, ...):
+                interned, so equal strings share one object
+    Int8/Int16  small whole numbers (nth_season, no_in_season, ...):
+                pandas' nullable integer types when available; on older
+                pandas, int8/int16 if there are no nulls, else float32
+    float32     measurements that do not need double precision
+    datetime    parsed to datetime64
+    stored      the recap text (corpus): each row's int32 position in
+                the recap store of `law_and_order.corpus`, or -1, with
+                the text read on demand by `recap`; left as text if
+                there is no up to date store
+
+Entity lists get the same treatment. `EntityLists` keeps every recap's
+entities as ids into one shared vocabulary, in a single flat array,
+instead of a dict of lists of strings. `Character` is a `__slots__`
+record for one row of the character list.
+
+`memory_report` measures each column before and after. Strings shared
+between rows are counted once, so interning shows up in the numbers.
+Recaps in the store are memory-mapped file pages, shared between
+processes and dropped by the OS under pressure, so they are not counted.
+
+    $ python -m law_and_order.schema
+"""
+import argparse
+import sys
+from array import array
+
+from law_and_order.corpus import open_store
+from law_and_order.franchise import read_franchise
+
+CHARACTERS_FILE = './ref/list_of_characters.txt'
+
+FRANCHISE = {
+    'directed_by': 'category'
+    , 'no_in_season': 'Int16'
+    , 'no_in_series': 'Int16'
+    , 'original_air_date': 'datetime'
+    , 'production_code': 'str'
+    , 'title': 'str'
+    , 'us_viewers_millions': 'float32'
+    , 'written_by': 'category'
+    , 'nth_season': 'Int16'
+    , 'show': 'category'
+    , 'corpus_url': 'str'
+    , 'source': 'category'
+    , 'match_confidence': 'float32'
+    , 'corpus': 'stored'
+}
+
+# the columns a recap is keyed by in the store
+STORE_KEY = ['show', 'nth_season', 'no_in_season']
+
+CHARACTERS = {
+    'row_id': 'int32'
+    , 'character_name': 'str'
+    , 'male': 'Int8'
+    , 'female': 'Int8'
+}
+
+def intern_strings(series):
+    """`series` with equal strings sharing one interned object."""
+    return series.map(lambda v: intern(v) if type(v) is str else v)
+
+def small_int(series, dtype):
+    """
+    `series` as the nullable integer type `dtype` ('Int8', 'Int16', ...),
+    or the nearest type the installed pandas has.
+    """
+    import pandas as pd
+
+    if hasattr(pd, dtype + 'Dtype'):
+        return series.astype(dtype)
+    if series.isnull().any():
+        return series.astype('float32')
+    return series.astype(dtype.lower())
+
+def stored_positions(df, store):
+    """Position of each row's recap in `store`, or -1 if it has none."""
+    import numpy as np
+
+    positions = np.empty(len(df), dtype=np.int32)
+    keys = zip(df.show, df.nth_season, df.no_in_season)
+    for i, (show, nth_season, no_in_season) in enumerate(keys):
+        if no_in_season != no_in_season:
+            positions[i] = -1
+            continue
+        key = (show, int(nth_season), int(no_in_season))
+        positions[i] = store.positions.get(key, -1)
+    return positions
+
+def recap(store, position):
+    """The recap at a `stored` position, or None."""
+    return None if position < 0 else store.at(position)
+
+def apply_schema(df, schema, store=None):
+    """
+    A copy of `df` with every column named in `schema` converted.
+    `stored` columns need the `corpus.CorpusStore` as `store` and are
+    left alone without one.
+    """
+    import pandas as pd
+
+    df = df.copy()
+    for col, kind in schema.iteritems():
+        if col not in df.columns:
+            continue
+        if kind == 'stored':
+            if store is not None:
+                df[col] = stored_positions(df, store)
+        elif kind == 'category':
+            df[col] = df[col].astype('category')
+        elif kind == 'str':
+            df[col] = intern_strings(df[col])
+        elif kind == 'datetime':
+            df[col] = pd.to_datetime(df[col])
+        elif kind.startswith('Int'):
+            df[col] = small_int(df[col], kind)
+        else:
+            df[col] = df[col].astype(kind)
+    return df
+
+def column_bytes(series):
+    """
+    Resident size of a column. Object columns count the pointer array
+    plus each distinct object once, so shared strings are not counted
+    twice.
+    """
+    if series.dtype != object:
+        return int(series.memory_usage(index=False, deep=True))
+    seen = {}
+    for v in series.values:
+        seen[id(v)] = v
+    return series.values.nbytes + sum(sys.getsizeof(v)
+                                      for v in seen.itervalues())
+
+def memory_report(before, after):
+    """Bytes per column of `before` and `after`, with totals."""
+    import pandas as pd
+
+    report = pd.DataFrame({
+        'dtype_before': [str(before[c].dtype) for c in before.columns]
+        , 'dtype_after': [str(after[c].dtype) for c in before.columns]
+        , 'bytes_before': [column_bytes(before[c]) for c in before.columns]
+        , 'bytes_after': [column_bytes(after[c]) for c in before.columns]
+    }, index=before.columns)
+    report.loc['total', 'bytes_before'] = report.bytes_before.sum()
+    report.loc['total', 'bytes_after'] = report.bytes_after.sum()
+    report['ratio'] = report.bytes_before / report.bytes_after
+    return report.ix[:, ['dtype_before', 'dtype_after', 'bytes_before',
+                         'bytes_after', 'ratio']]
+
+def read_compact(columns=None, dropna=None, store=None):
+    """
+    `read_franchise` with the FRANCHISE schema applied. The corpus
+    becomes positions in `store`, or in the store `open_store` finds;
+    pass the same store to `recap` to read a recap.
+    """
+    store = store or open_store()
+    cols = columns
+    if store is not None and columns is not None and 'corpus' in columns:
+        cols = list(columns) + [c for c in STORE_KEY if c not in columns]
+    df = apply_schema(read_franchise(columns=cols, dropna=dropna),
+                      FRANCHISE, store)
+    return df if cols is columns else df[list(columns)]
+
+def read_characters(f=CHARACTERS_FILE, compact=True):
+    import pandas as pd
+
+    df = pd.read_csv(f, sep='|')
+    return apply_schema(df, CHARACTERS) if compact else df
+
+class Character(object):
+
+    __slots__ = ('row_id', 'name', 'male', 'female')
+
+    def __init__(self, row_id, name, male, female):
+        self.row_id = row_id
+        self.name = name
+        self.male = male
+        self.female = female
+
+    def __repr__(self):
+        return 'Character(%r, %r, %r, %r)' % (self.row_id, self.name,
+                                              self.male, self.female)
+
+def iter_characters(df):
+    """A `Character` for each row of the character table."""
+    for row in zip(df.row_id, df.character_name, df.male, df.female):
+        yield Character(*row)
+
+class EntityLists(object):
+    """
+    Entities found in each recap, keyed like the entity cache. Every
+    list is a run of ids in one flat array, delimited by a second array
+    of offsets; the names live once in a shared vocabulary.
+    """
+
+    __slots__ = ('vocabulary', '_ids', '_offsets', '_rows', '_ids_by_name')
+
+    def __init__(self):
+        self.vocabulary = []
+        self._ids = array('i')
+        self._offsets = array('i', [0])
+        self._rows = {}
+        self._ids_by_name = None
+
+    @classmethod
+    def from_cache(cls, cache):
+        lists = cls()
+        for key, names in cache.iteritems():
+            lists.add(key, names)
+        # the reverse index is only needed while adding
+        lists._ids_by_name = None
+        return lists
+
+    def add(self, key, names):
+        if self._ids_by_name is None:
+            self._ids_by_name = dict((name, i) for i, name in
+                                     enumerate(self.vocabulary))
+        for name in names:
+            i = self._ids_by_name.get(name)
+            if i is None:
+                i = self._ids_by_name[name] = len(self.vocabulary)
+                self.vocabulary.append(intern(name) if type(name) is str
+                                       else name)
+            self._ids.append(i)
+        self._rows[key] = len(self._offsets) - 1
+        self._offsets.append(len(self._ids))
+
+    def ids(self, key):
+        row = self._rows[key]
+        return self._ids[self._offsets[row]:self._offsets[row + 1]]
+
+    def __getitem__(self, key):
+        return [self.vocabulary[i] for i in self.ids(key)]
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def to_cache(self):
+        return dict((key, self[key]) for key in self._rows)
+
+    def nbytes(self):
+        """Approximate resident size, strings included."""
+        total = (sys.getsizeof(self._ids) + sys.getsizeof(self._offsets)
+                 + sys.getsizeof(self._rows)
+                 + sum(sys.getsizeof(k) + sys.getsizeof(v)
+                       for k, v in self._rows.iteritems())
+                 + sys.getsizeof(self.vocabulary)
+                 + sum(sys.getsizeof(v) for v in self.vocabulary))
+        if self._ids_by_name is not None:
+            total += sys.getsizeof(self._ids_by_name)
+        return total
+
+def cache_bytes(cache):
+    """Approximate resident size of an entity cache dict."""
+    seen = {}
+    total = sys.getsizeof(cache)
+    for key, names in cache.iteritems():
+        total += sys.getsizeof(key) + sys.getsizeof(names)
+        for name in names:
+            seen[id(name)] = name
+    return total + sum(sys.getsizeof(v) for v in seen.itervalues())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Report memory per column of the compact tables.')
+    parser.parse_args(argv)
+
+    import os
+    import pandas as pd
+    from law_and_order.entities import CACHE_FILE, read_cache
+
+    pd.options.display.width = 200
+
+    before = read_franchise()
+    store = open_store()
+    print 'franchise%s' % ('' if store is not None else
+                           ' (no up to date recap store; corpus left as text)')
+    print memory_report(before, apply_schema(before, FRANCHISE, store))
+    print
+
+    if os.path.exists(CHARACTERS_FILE):
+        before = read_characters(compact=False)
+        print 'characters'
+        print memory_report(before, apply_schema(before, CHARACTERS))
+        print
+
+    if os.path.exists(CACHE_FILE):
+        cache = read_cache()
+        lists = EntityLists.from_cache(cache)
+        print 'entity lists: %d bytes as a dict, %d as EntityLists' % (
+            cache_bytes(cache), lists.nbytes())
+
+if __name__ == '__main__':
+    main()
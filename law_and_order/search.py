@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+search.py
+
+Full-text search over episode recaps.
+
+Recaps are indexed into an on-disk inverted index (a sqlite file) with
+positional postings, so both single words and quoted phrases can be
+looked up without scanning the corpus. Results are ranked with BM25.
+
+    Project/
+    |-- data/
+    |   |-- franchise/
+    |   |   |-- episodes_and_recaps.txt
+    |   |   |-- search.db
+
+Build or update the index, then query it:
+
+    $ python -m law_and_order.search --index
+    $ python -m law_and_order.search 'jack mccoy "plea bargain"'
+
+Indexing is incremental. Episodes already in the index with unchanged
+recap text are skipped, so indexing a new season only touches the new
+episodes, and episodes that have left the franchise or lost their recap
+are deleted in the same transaction. Words in ref/stopwords.txt are not
+indexed.
+"""
+import argparse
+import hashlib
+import math
+import re
+import sqlite3
+from array import array
+from collections import defaultdict
+
+INDEX_FILE = './data/franchise/search.db'
+
+STOP_WORDS_FILE = './ref/stopwords.txt'
+
+TOKENS = re.compile("[a-z0-9]+(?:'[a-z]+)?")
+QUERY  = re.compile('"([^"]*)"|(\\S+)')
+
+# BM25 parameters
+K1 = 1.2
+B  = 0.75
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id INTEGER PRIMARY KEY,
+    show TEXT,
+    nth_season INTEGER,
+    no_in_season INTEGER,
+    title TEXT,
+    length INTEGER,
+    digest TEXT,
+    corpus TEXT,
+    UNIQUE (show, nth_season, no_in_season)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT,
+    doc_id INTEGER,
+    tf INTEGER,
+    positions BLOB,
+    PRIMARY KEY (term, doc_id)
+);
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+'''
+
+_stop_words = None
+
+def stop_words(f=STOP_WORDS_FILE):
+    global _stop_words
+    if _stop_words is None:
+        _stop_words = set(word for word in open(f).read().split('\n'))
+    return _stop_words
+
+def tokenize(txt):
+    return TOKENS.findall(txt.lower())
+
+def to_unicode(txt):
+    return txt.decode('utf-8') if isinstance(txt, str) else txt
+
+def digest(txt):
+    return hashlib.sha1(to_unicode(txt).encode('utf-8')).hexdigest()
+
+def connect(f=INDEX_FILE):
+    db = sqlite3.connect(f)
+    db.executescript(SCHEMA)
+    return db
+
+def index_episode(db, show, nth_season, no_in_season, title, corpus):
+    """
+    Add or refresh one episode. Returns False when the episode is already
+    indexed with the same recap text.
+    """
+    corpus = to_unicode(corpus)
+    title = to_unicode(title)
+    key = (show, nth_season, no_in_season)
+    d = digest(corpus)
+
+    row = db.execute('SELECT doc_id, digest FROM docs WHERE show=? '
+                     'AND nth_season=? AND no_in_season IS ?', key).fetchone()
+    if row is not None:
+        if row[1] == d:
+            return False
+        db.execute('DELETE FROM postings WHERE doc_id=?', (row[0],))
+        db.execute('DELETE FROM docs WHERE doc_id=?', (row[0],))
+
+    tokens = tokenize(corpus)
+    cur = db.execute('INSERT INTO docs (show, nth_season, no_in_season, '
+                     'title, length, digest, corpus) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     key + (title, len(tokens), d, corpus))
+    doc_id = cur.lastrowid
+
+    stop = stop_words()
+    positions = defaultdict(lambda: array('I'))
+    for i, token in enumerate(tokens):
+        if token not in stop:
+            positions[token].append(i)
+
+    db.executemany('INSERT INTO postings VALUES (?, ?, ?, ?)',
+        ((term, doc_id, len(pos), sqlite3.Binary(pos.tostring()))
+            for term, pos in positions.iteritems()))
+    return True
+
+def remove_episodes(db, keep):
+    """
+    Delete every indexed episode whose (show, season, episode) is not in
+    `keep`. Returns how many were deleted.
+    """
+    gone = [doc_id for doc_id, show, nth_season, no_in_season in
+            db.execute('SELECT doc_id, show, nth_season, no_in_season '
+                       'FROM docs')
+            if (show, nth_season, no_in_season) not in keep]
+    for doc_id in gone:
+        db.execute('DELETE FROM postings WHERE doc_id=?', (doc_id,))
+        db.execute('DELETE FROM docs WHERE doc_id=?', (doc_id,))
+    return len(gone)
+
+def build_index(df, f=INDEX_FILE):
+    """
+    Index every episode of the franchise frame that has a recap, and
+    delete episodes that are no longer in it or have lost their recap.
+    Returns the number of episodes added or refreshed, and the number
+    deleted.
+    """
+    db = connect(f)
+    added, keep = 0, set()
+    with db:
+        for _, row in df.iterrows():
+            if not isinstance(row['corpus'], basestring):
+                continue
+            no_in_season = row['no_in_season']
+            no_in_season = None if no_in_season != no_in_season \
+                else int(no_in_season)
+            title = row['title'] if isinstance(row['title'], basestring) else None
+            key = (to_unicode(row['show']), int(row['nth_season']), no_in_season)
+            keep.add(key)
+            added += index_episode(db, key[0], key[1], key[2], title,
+                                   row['corpus'])
+        removed = remove_episodes(db, keep)
+    db.close()
+    return added, removed
+
+def parse_query(q):
+    """
+    Split a query into phrases. Quoted text is one phrase; every other
+    word is a phrase of its own. Each phrase is a list of
+    (offset, term) pairs with stop words dropped but offsets kept.
+    """
+    stop = stop_words()
+    phrases = []
+    for quoted, word in QUERY.findall(q):
+        tokens = tokenize(quoted or word)
+        phrase = [(i, t) for i, t in enumerate(tokens) if t not in stop]
+        if phrase:
+            phrases.append(phrase)
+    return phrases
+
+def _postings(db, term):
+    rows = db.execute('SELECT doc_id, tf, positions FROM postings '
+                      'WHERE term=?', (term,))
+    return dict((doc_id, (tf, array('I', bytes(pos))))
+                for doc_id, tf, pos in rows)
+
+def _phrase_starts(phrase, postings, doc_id):
+    """Token positions in `doc_id` where the whole phrase starts."""
+    offset, term = phrase[0]
+    starts = set(p - offset for p in postings[term][doc_id][1])
+    for offset, term in phrase[1:]:
+        starts &= set(p - offset for p in postings[term][doc_id][1])
+    return starts
+
+def snippet(corpus, position, width=12):
+    spans = [m.span() for m in TOKENS.finditer(corpus.lower())]
+    lo = max(position - width, 0)
+    hi = min(position + width, len(spans) - 1)
+    txt = corpus[spans[lo][0]:spans[hi][1]]
+    return ('...' if lo > 0 else '') + txt + ('...' if hi < len(spans)-1 else '')
+
+def search(q, n=10, f=INDEX_FILE, db=None):
+    """
+    Episodes matching every phrase in `q`, best BM25 score first. Each
+    result is a dict with show, season, episode, title, score and a
+    snippet around the first match.
+    """
+    phrases = parse_query(q)
+    if not phrases:
+        return []
+
+    close = db is None
+    db = connect(f) if db is None else db
+
+    n_docs, avg_len = db.execute('SELECT COUNT(*), AVG(length) FROM docs').fetchone()
+    terms = set(term for phrase in phrases for _, term in phrase)
+    postings = dict((term, _postings(db, term)) for term in terms)
+
+    docs = None
+    for term in terms:
+        found = set(postings[term])
+        docs = found if docs is None else docs & found
+
+    matches = {}
+    for doc_id in docs:
+        starts = [_phrase_starts(phrase, postings, doc_id) for phrase in phrases]
+        if all(starts):
+            matches[doc_id] = min(min(s) for s in starts)
+
+    lengths = {}
+    if matches:
+        marks = ','.join('?' * len(matches))
+        lengths = dict(db.execute('SELECT doc_id, length FROM docs '
+                                  'WHERE doc_id IN (%s)' % marks, list(matches)))
+
+    scores = defaultdict(float)
+    for term in terms:
+        df = len(postings[term])
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for doc_id in matches:
+            tf = postings[term][doc_id][0]
+            norm = K1 * (1 - B + B * lengths[doc_id] / avg_len)
+            scores[doc_id] += idf * tf * (K1 + 1) / (tf + norm)
+
+    ranked = sorted(scores, key=lambda doc_id: -scores[doc_id])[:n]
+
+    results = []
+    for doc_id in ranked:
+        show, nth_season, no_in_season, title, corpus = db.execute(
+            'SELECT show, nth_season, no_in_season, title, corpus '
+            'FROM docs WHERE doc_id=?', (doc_id,)).fetchone()
+        results.append({
+            'show': show
+            , 'nth_season': nth_season
+            , 'no_in_season': no_in_season
+            , 'title': title
+            , 'score': scores[doc_id]
+            , 'snippet': snippet(corpus, matches[doc_id])
+        })
+
+    if close:
+        db.close()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search episode recaps.')
+    parser.add_argument('query', nargs='?', help='words or "quoted phrases"')
+    parser.add_argument('-n', type=int, default=10, help='number of results')
+    parser.add_argument('--index', action='store_true',
+                        help='index new or changed recaps first')
+    args = parser.parse_args(argv)
+
+    if args.index:
+        from law_and_order.franchise import read_franchise
+        df = read_franchise(columns=['show', 'nth_season', 'no_in_season',
+                                     'title', 'corpus'], dropna=['corpus'])
+        print 'Indexed %d new or changed recaps, removed %d' % build_index(df)
+
+    if args.query:
+        for res in search(args.query, n=args.n):
+            line = u'%(show)s s%(nth_season)s e%(no_in_season)s  %(title)s  (%(score).2f)'
+            print (line % res).encode('utf-8')
+            print '    %s' % res['snippet'].encode('utf-8')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+serve.py
+
+A local, read-only HTTP/JSON service for questions about the franchise,
+so they do not each need a Python shell and a fresh read of the data.
+
+The franchise table, the list of characters and the entity cache are
+read once at startup. `FranchiseIndex` keeps each episode as a small
+dict and indexes them by show, season, writer, director and character.
+Writer and director credits are split into single names ("Teleplay:
+X Story by: Y & Z" credits X, Y and Z) and matched without regard to
+case or accents. A character is in an episode when the entity cache has
+it among the entities of that episode's recap.
+
+Every answer is a lookup in those indexes, serialized once and kept in
+an LRU cache of `--cache-size` responses keyed by path and query. Each
+request is handled on its own thread, so slow clients do not hold up
+the others.
+
+    $ python -m law_and_order.serve --port 8013
+
+    GET /shows
+    GET /episodes?show=svu&season=5            filter by any of show,
+    GET /episodes?writer=rene+balcer           season, writer, director
+    GET /episodes?character=olivia+benson      and character
+    GET /episodes/svu/5/12                     one episode, its credits
+                                               and characters
+    GET /recaps/svu/5/12                       its recap
+    GET /viewership?show=svu&season=5          viewers per episode, with
+                                               totals; same filters
+    GET /writers?show=original                 names with episode counts
+    GET /directors?show=original
+    GET /characters?show=svu&season=5          characters with episode
+                                               counts; same filters
+
+Responses carry `X-Cache: hit` or `X-Cache: miss`. A bad query gets a
+4xx with an `error` message; anything else that goes wrong gets a 500,
+and the traceback goes to stderr.
+"""
+import argparse
+import os
+import re
+import threading
+import time
+import traceback
+import unicodedata
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from collections import OrderedDict, defaultdict
+from SocketServer import ThreadingMixIn
+from urlparse import parse_qs, urlparse
+
+import ujson as json
+
+from law_and_order.corpus import open_store
+from law_and_order.franchise import read_franchise
+
+HOST = '127.0.0.1'
+PORT = 8013
+
+CACHE_SIZE = 1024
+
+CHARACTERS_FILE = './ref/list_of_characters.txt'
+
+EPISODE_COLUMNS = ['show', 'nth_season', 'no_in_season', 'no_in_series',
+                   'title', 'original_air_date', 'us_viewers_millions',
+                   'written_by', 'directed_by', 'production_code']
+
+FILTERS = ['show', 'season', 'writer', 'director', 'character']
+
+CREDIT  = re.compile('\\b(?:teleplay|story|written)\\b(?:\\s+by\\b)?\\s*:?',
+                     re.IGNORECASE)
+NAMES   = re.compile('\\s*(?:&|,|\\band\\b)\\s*')
+
+class QueryError(Exception):
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+def fold(name):
+    """`name` lower-cased, without accents or extra whitespace."""
+    if isinstance(name, str):
+        name = name.decode('utf-8', 'ignore')
+    name = unicodedata.normalize('NFKD', name)
+    name = u''.join(ch for ch in name if not unicodedata.combining(ch))
+    return u' '.join(name.lower().split()).encode('utf-8')
+
+def credited(credit):
+    """Single names in a writing or directing credit."""
+    if not isinstance(credit, basestring):
+        return []
+    found = []
+    for name in NAMES.split(CREDIT.sub(',', credit)):
+        name = ' '.join(name.split())
+        if name and name not in found:
+            found.append(name)
+    return found
+
+def _value(v):
+    if v is None or v != v:
+        return None
+    if hasattr(v, 'item'):
+        return v.item()
+    return v
+
+def _date(v):
+    v = _value(v)
+    return None if v is None else str(v)[:10]
+
+class FranchiseIndex(object):
+    """Episodes of the franchise and the indexes that answer queries."""
+
+    def __init__(self, episodes, recaps=None, characters=None):
+        """
+        `episodes` are dicts with the EPISODE_COLUMNS. `recaps` maps
+        (show, season, episode) to recap text, or is a
+        `corpus.CorpusStore`; `characters` maps the same keys to the
+        names of the characters in each episode.
+        """
+        self.episodes = episodes
+        self.recaps = recaps or {}
+        self.characters = characters or {}
+        self.has_characters = characters is not None
+
+        self.by_key = {}
+        self.index = dict((name, defaultdict(list)) for name in FILTERS)
+        self.names = dict((name, {}) for name in FILTERS)
+
+        for i, episode in enumerate(episodes):
+            key = (episode['show'], episode['nth_season'],
+                   episode['no_in_season'])
+            self.by_key[key] = i
+            self._add('show', episode['show'], i)
+            self._add('season', (episode['show'], episode['nth_season']), i)
+            for name in credited(episode['written_by']):
+                self._add('writer', name, i)
+            for name in credited(episode['directed_by']):
+                self._add('director', name, i)
+            for name in self.characters.get(key, ()):
+                self._add('character', name, i)
+
+    def _add(self, kind, value, i):
+        folded = fold(value) if kind in ('writer', 'director', 'character') \
+            else value
+        rows = self.index[kind][folded]
+        if not rows or rows[-1] != i:
+            rows.append(i)
+        self.names[kind].setdefault(folded, value)
+
+    @classmethod
+    def from_files(cls, characters_file=CHARACTERS_FILE):
+        df = read_franchise(columns=EPISODE_COLUMNS + ['corpus'])
+        episodes = [dict((col, _date(v) if col == 'original_air_date'
+                          else _value(v)) for col, v in zip(EPISODE_COLUMNS, row))
+                    for row in zip(*[df[col] for col in EPISODE_COLUMNS])]
+
+        keys = [(e['show'], e['nth_season'], e['no_in_season'])
+                for e in episodes]
+        recaps = open_store()
+        if recaps is None:
+            recaps = dict((key, corpus) for key, corpus in
+                          zip(keys, df.corpus) if isinstance(corpus, basestring))
+        characters = episode_characters(keys, df.corpus, characters_file)
+        return cls(episodes, recaps, characters)
+
+    def rows(self, query):
+        """Positions of the episodes matching every filter in `query`."""
+        found = None
+        for kind in FILTERS:
+            if kind not in query:
+                continue
+            if kind == 'season':
+                if 'show' not in query:
+                    raise QueryError(400, 'season needs a show')
+                try:
+                    value = (query['show'], int(query['season']))
+                except ValueError:
+                    raise QueryError(400, 'season must be a number')
+            elif kind == 'character' and not self.has_characters:
+                raise QueryError(503, 'no entity cache; run entities first')
+            else:
+                value = query[kind]
+            rows = set(self._lookup(kind, value))
+            found = rows if found is None else found & rows
+        if found is None:
+            return range(len(self.episodes))
+        return sorted(found)
+
+    def _lookup(self, kind, value):
+        index = self.index[kind]
+        if kind not in ('writer', 'director', 'character'):
+            return index.get(value, ())
+        value = fold(value)
+        if value in index:
+            return index[value]
+        # no exact match: any name containing the query
+        return [i for name, rows in index.iteritems() if value in name
+                for i in rows]
+
+    def episode(self, show, nth_season, no_in_season):
+        key = (show, nth_season, no_in_season)
+        if key not in self.by_key:
+            raise QueryError(404, 'no episode %s %d %d' % key)
+        episode = dict(self.episodes[self.by_key[key]])
+        episode['writers'] = credited(episode['written_by'])
+        episode['directors'] = credited(episode['directed_by'])
+        episode['characters'] = sorted(self.characters.get(key, ()))
+        episode['has_recap'] = key in self.recaps
+        return episode
+
+    def recap(self, show, nth_season, no_in_season):
+        key = (show, nth_season, no_in_season)
+        if key not in self.recaps:
+            raise QueryError(404, 'no recap for %s %d %d' % key)
+        return {'show': show, 'nth_season': nth_season,
+                'no_in_season': no_in_season, 'corpus': self.recaps[key]}
+
+    def viewership(self, rows):
+        viewers = [(self.episodes[i], self.episodes[i]['us_viewers_millions'])
+                   for i in rows]
+        known = [v for _, v in viewers if v is not None]
+        return {
+            'n_episodes': len(viewers)
+            , 'n_rated': len(known)
+            , 'total': sum(known)
+            , 'mean': sum(known) / len(known) if known else None
+            , 'min': min(known) if known else None
+            , 'max': max(known) if known else None
+            , 'episodes': [{'show': e['show'], 'nth_season': e['nth_season'],
+                            'no_in_season': e['no_in_season'],
+                            'title': e['title'], 'us_viewers_millions': v}
+                           for e, v in viewers]
+        }
+
+    def counts(self, kind, rows):
+        """Names of `kind` in the episodes at `rows`, most frequent first."""
+        rows = set(rows)
+        found = [(self.names[kind][name], len(rows.intersection(hits)))
+                 for name, hits in self.index[kind].iteritems()]
+        found = [(name, n) for name, n in found if n]
+        found.sort(key=lambda (name, n): (-n, name))
+        return [{'name': name, 'n_episodes': n} for name, n in found]
+
+def episode_characters(keys, corpuses, characters_file=CHARACTERS_FILE):
+    """
+    {(show, season, episode): character names} from the entity cache, or
+    None if nltk, the character list or the entity cache is missing, or
+    the cache has none of these recaps. Recaps not in the cache have no
+    characters.
+    """
+    import pandas as pd
+
+    try:
+        from law_and_order.entities import (CACHE_FILE, cache_key, read_cache,
+                                            tagger_version)
+        version = tagger_version()
+    except ImportError:
+        return None
+    if not (os.path.exists(characters_file) and os.path.exists(CACHE_FILE)):
+        return None
+
+    known = set(pd.read_csv(characters_file, sep='|',
+                            usecols=['character_name']).character_name.dropna())
+    cache = read_cache()
+    found, n_cached = {}, 0
+    for key, corpus in zip(keys, corpuses):
+        if not isinstance(corpus, basestring):
+            continue
+        names = cache.get(cache_key(corpus, version))
+        n_cached += names is not None
+        found[key] = [name for name in names or () if name in known]
+    return found if n_cached else None
+
+class ResponseCache(object):
+    """Least recently used responses, at most `size` of them."""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self.items[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = value
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+def _episode_key(parts):
+    try:
+        return parts[0], int(parts[1]), int(parts[2])
+    except (IndexError, ValueError):
+        raise QueryError(404, 'expected /<show>/<season>/<episode>')
+
+def answer(index, path, query):
+    """The JSON-able answer to GET `path` with `query`."""
+    parts = [p for p in path.split('/') if p]
+    route = parts[0] if parts else ''
+
+    if route == 'shows':
+        return [{'show': show, 'n_episodes': len(rows),
+                 'n_seasons': len(set(s for (sh, s) in index.index['season']
+                                      if sh == show))}
+                for show, rows in sorted(index.index['show'].iteritems())]
+    if route == 'episodes' and len(parts) == 4:
+        return index.episode(*_episode_key(parts[1:]))
+    if route == 'episodes':
+        return [index.episodes[i] for i in index.rows(query)]
+    if route == 'recaps':
+        return index.recap(*_episode_key(parts[1:]))
+    if route == 'viewership':
+        return index.viewership(index.rows(query))
+    if route in ('writers', 'directors', 'characters'):
+        kind = route[:-1]
+        if kind == 'character' and not index.has_characters:
+            raise QueryError(503, 'no entity cache; run entities first')
+        return index.counts(kind, index.rows(query))
+    if route == '':
+        return {'routes': ['/shows', '/episodes', '/episodes/<show>/<season>/<episode>',
+                           '/recaps/<show>/<season>/<episode>', '/viewership',
+                           '/writers', '/directors', '/characters'],
+                'filters': FILTERS}
+    raise QueryError(404, 'no such route: /%s' % route)
+
+def make_handler(index, cache):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        verbose = False
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = dict((k, v[-1]) for k, v in parse_qs(url.query).iteritems())
+            key = url.path + '?' + '&'.join('%s=%s' % item
+                                            for item in sorted(query.items()))
+
+            body = cache.get(key)
+            status, hit = 200, body is not None
+            if body is None:
+                try:
+                    body = json.dumps(answer(index, url.path, query))
+                    cache.put(key, body)
+                except QueryError as e:
+                    status, body = e.status, json.dumps({'error': str(e)})
+                except Exception:
+                    traceback.print_exc()
+                    status, body = 500, json.dumps({'error': 'internal error'})
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('X-Cache', 'hit' if hit else 'miss')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            if self.verbose:
+                BaseHTTPRequestHandler.log_message(self, fmt, *args)
+
+    return Handler
+
+class Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serve franchise queries over HTTP as JSON.')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                        help='responses kept (default: %(default)s)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='log every request')
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    index = FranchiseIndex.from_files()
+    print 'Indexed %d episodes in %.1fs%s' % (len(index.episodes),
+        time.time() - start, '' if index.has_characters
+        else ' (no characters: entity cache or nltk missing)')
+
+    handler = make_handler(index, ResponseCache(args.cache_size))
+    handler.verbose = args.verbose
+    server = Server((args.host, args.port), handler)
+    print 'Serving on http://%s:%d/' % (args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+titles.py
+
+Matches tv.com recaps to wikipedia episodes by title.
+
+Episode numbers from the two sites drift apart (tv.com lists episodes in
+reverse order, skips some and splits others), so matching on
+(season, number) alone hands recaps to the wrong episodes. Titles are
+compared instead, after `normalize_title` lower-cases them, drops
+punctuation and spells "(2)", "Pt. 2", "(Part 2)" and "(Part II)" the
+same way.
+
+Titles are scored by the Jaccard similarity of their character
+trigrams. Wikipedia lists some two-part episodes once ("Day") where
+tv.com has a recap per part ("Day (2)", "Day (Part 2)"), so titles that
+differ only by a trailing part number score at least PART_SCORE.
+
+Recaps are indexed by (season, trigram), so an episode is only scored
+against recaps that share a trigram with it and are within SEASON_WINDOW
+seasons of it. The work per episode depends on the size of a season,
+not of the franchise.
+
+Each recap goes to at most one episode and each episode gets at most one
+recap. Pairs are taken best first, breaking ties by season and then by
+episode number. A pair scoring below MIN_SCORE is not matched, with one
+exception: a recap whose title matches no episode at all can still fill
+the episode at its own (season, number), if that episode is free. This
+catches titles that are written differently ("41 Shots" /
+"Forty-One Shots"). Every match carries its title score as its
+confidence.
+"""
+import re
+from string import punctuation
+
+N = 3
+
+SEASON_WINDOW = 1
+
+MIN_SCORE = 0.5
+
+PART_SCORE = 0.6
+
+# "(2)" and "pt. 2" both become "part 2"; "(part 2)" loses its brackets
+# with the rest of the punctuation, and "part ii" becomes "part 2"
+NUMBERED = re.compile('\\((\\d+)\\)')
+PT       = re.compile('\\bpt\\.?\\s*(\\d+)')
+ROMAN    = re.compile('\\bpart (i{1,3}|iv|v|vi{1,3}|ix|x)\\b')
+
+ROMAN_NUMERALS = dict((r, str(i)) for i, r in enumerate(
+    ['i', 'ii', 'iii', 'iv', 'v', 'vi', 'vii', 'viii', 'ix', 'x'], 1))
+
+PART     = re.compile(u' ?\\bpart \\d+$')
+
+PUNCTUATION = dict((ord(ch), u' ') for ch in punctuation)
+
+def normalize_title(title):
+    if not isinstance(title, basestring):
+        return ''
+    if isinstance(title, str):
+        title = title.decode('utf-8', 'ignore')
+    title = title.lower()
+    title = NUMBERED.sub(' part \\1 ', title)
+    title = PT.sub(' part \\1 ', title)
+    title = u' '.join(title.translate(PUNCTUATION).split())
+    return ROMAN.sub(lambda m: u'part ' + ROMAN_NUMERALS[m.group(1)], title)
+
+def grams(title, n=N):
+    """Character `n`-grams of a normalized title, padded with spaces."""
+    title = u' %s ' % title
+    return frozenset(title[i:i + n] for i in xrange(len(title) - n + 1))
+
+def similarity(a, b):
+    shared = len(a & b)
+    return float(shared) / (len(a) + len(b) - shared) if shared else 0.0
+
+def base_title(title):
+    """A normalized title without its trailing part number."""
+    return PART.sub(u'', title)
+
+def score(a, b):
+    """Similarity of two normalized titles."""
+    return part_score(similarity(grams(a), grams(b)),
+                      base_title(a), base_title(b))
+
+def part_score(s, base_a, base_b):
+    if s < PART_SCORE and base_a and base_a == base_b:
+        return PART_SCORE
+    return s
+
+class TitleIndex(object):
+    """Recap titles blocked by (season, trigram)."""
+
+    def __init__(self, seasons, titles, window=SEASON_WINDOW):
+        self.window = window
+        self.titles = [normalize_title(title) for title in titles]
+        self.bases = [base_title(title) for title in self.titles]
+        self.sizes = []
+        self.blocks = {}
+        for i, (season, title) in enumerate(zip(seasons, self.titles)):
+            g = grams(title)
+            self.sizes.append(len(g))
+            for gram in g:
+                self.blocks.setdefault((season, gram), []).append(i)
+
+    def candidates(self, season, title):
+        """{recap position: score} for recaps sharing a trigram."""
+        title = normalize_title(title)
+        base, g = base_title(title), grams(title)
+        shared = {}
+        for s in xrange(season - self.window, season + self.window + 1):
+            for gram in g:
+                for i in self.blocks.get((s, gram), ()):
+                    shared[i] = shared.get(i, 0) + 1
+        return dict((i, part_score(
+                        float(n) / (len(g) + self.sizes[i] - n),
+                        base, self.bases[i]))
+                    for i, n in shared.iteritems())
+
+def _number(x):
+    try:
+        return int(x)
+    except (TypeError, ValueError):
+        return None
+
+def match_titles(episodes, recaps, window=SEASON_WINDOW, min_score=MIN_SCORE):
+    """
+    One-to-one matches between episodes and recaps, each given as a list
+    of (season, number, title). Returns (episode, recap, confidence)
+    triples of list positions, in episode order.
+    """
+    index = TitleIndex([int(r[0]) for r in recaps], [r[2] for r in recaps],
+                       window)
+
+    pairs = []
+    best = {}
+    for e, (season, number, title) in enumerate(episodes):
+        number = _number(number)
+        for r, s in index.candidates(int(season), title).iteritems():
+            best[r] = max(best.get(r, 0.0), s)
+            if s < min_score:
+                continue
+            other = _number(recaps[r][1])
+            distance = abs(number - other) if None not in (number, other) \
+                else float('inf')
+            pairs.append((-s, abs(int(season) - int(recaps[r][0])),
+                          distance, e, r))
+    pairs.sort()
+
+    episode_of, recap_of, matches = {}, {}, []
+    for neg_score, _, _, e, r in pairs:
+        if e in recap_of or r in episode_of:
+            continue
+        recap_of[e], episode_of[r] = r, e
+        matches.append((e, r, -neg_score))
+
+    by_position = dict(((int(season), _number(number)), e)
+                       for e, (season, number, _) in enumerate(episodes)
+                       if e not in recap_of)
+    for r, (season, number, title) in enumerate(recaps):
+        if r in episode_of or best.get(r, 0.0) >= min_score:
+            continue
+        e = by_position.pop((int(season), _number(number)), None)
+        if e is not None:
+            recap_of[e], episode_of[r] = r, e
+            matches.append((e, r, score(normalize_title(episodes[e][2]),
+                                        index.titles[r])))
+
+    return sorted(matches)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+tokens.py
+
+Sentence split, tokenized and POS-tagged recaps, cached on disk so that
+no recap is ever tagged twice.
+
+POS tagging is the slowest step of every analysis that reads the words
+of a recap. `TokenCache` keeps the tagged form of each recap, keyed by a
+hash of its text and the tokenizer/tagger version, like the entity
+cache in `law_and_order.entities`. Words and tags are ids into two
+shared vocabularies, in flat arrays delimited by per-recap offsets as in
+`schema.EntityLists`. The top bit of a tag id marks the first word of a
+sentence.
+
+Only the index (keys, offsets and vocabularies) is held in memory. The
+word and tag ids live in two files next to it that are memory-mapped,
+so a cache read costs page cache, not heap, however large the corpus:
+
+    Project/
+    |-- ref/
+    |   |-- token_cache.npz         <- keys, offsets, vocabularies
+    |   |-- token_cache.words.bin   <- int32 word ids
+    |   |-- token_cache.tags.bin    <- uint8 tag ids
+
+Recaps tagged since the last `flush` are kept in memory until it appends
+them to the files, so callers that tag in batches flush after each one.
+
+`TokenCache.tagged` returns a recap's tagged sentences, tagging it and
+adding it to the cache first if it is new; entities and cooccurrence
+read their tags this way. vectorize only reads words it already has,
+with `cached_words`, and never tags.
+
+    $ python -m law_and_order.tokens     # tag whatever is missing
+"""
+import argparse
+import hashlib
+import os
+from array import array
+
+from law_and_order.franchise import CHUNK_ROWS, iter_franchise
+from law_and_order.instrument import run
+
+CACHE_FILE = './ref/token_cache.npz'
+
+# bump when iter_tagged changes what it produces
+TAGGER = 'sent_tokenize+word_tokenize+pos_tag'
+
+SENTENCE_START = 0x80
+
+def tagger_version():
+    import nltk
+    return 'nltk-%s/%s' % (nltk.__version__, TAGGER)
+
+def corpus_key(corpus, version):
+    """sha1 of `version` and a recap's text, which may be a buffer."""
+    if isinstance(corpus, unicode):
+        corpus = corpus.encode('utf-8')
+    h = hashlib.sha1(version + '\0')
+    h.update(corpus)
+    return h.hexdigest()
+
+def iter_tagged(corpus):
+    """A list of (word, tag) pairs for each sentence of `corpus`."""
+    import nltk
+    for sentence in nltk.sent_tokenize(corpus):
+        yield nltk.pos_tag(nltk.word_tokenize(sentence))
+
+def tag_recap(corpus):
+    return list(iter_tagged(corpus))
+
+def _id(ids, vocabulary, value):
+    i = ids.get(value)
+    if i is None:
+        i = ids[value] = len(vocabulary)
+        vocabulary.append(intern(value) if type(value) is str else value)
+    return i
+
+def data_files(f=CACHE_FILE):
+    """The word id and tag id files of the cache indexed by `f`."""
+    base = os.path.splitext(f)[0]
+    return base + '.words.bin', base + '.tags.bin'
+
+def cache_files(f=CACHE_FILE):
+    return [f] + list(data_files(f))
+
+def _append(path, size, values):
+    """Write `values` to `path` after its first `size` bytes."""
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as fh:
+        fh.truncate(size)
+        fh.seek(size)
+        values.tofile(fh)
+
+class TokenCache(object):
+    """
+    Tagged sentences of each recap, keyed by `corpus_key`. Kept in memory
+    only, unless it is given the index file `f` to live in.
+    """
+
+    def __init__(self, version=None, f=None):
+        self._version = version
+        self.f = f
+        self.words = []
+        self.tags = []
+        self._word_ids = {}
+        self._tag_ids = {}
+        # ids on disk, memory-mapped, and ids added since the last flush
+        self._n_mapped = 0
+        self._mapped_words = self._mapped_tags = None
+        self._words = array('i')
+        self._tags = array('B')
+        self._offsets = array('l', [0])
+        self._rows = {}
+        self.changed = False
+
+    @property
+    def version(self):
+        if self._version is None:
+            self._version = tagger_version()
+        return self._version
+
+    def key(self, corpus):
+        return corpus_key(corpus, self.version)
+
+    def add(self, key, sentences):
+        if key in self._rows:
+            return
+        for sentence in sentences:
+            start = SENTENCE_START
+            for word, tag in sentence:
+                tag_id = _id(self._tag_ids, self.tags, tag)
+                if tag_id >= SENTENCE_START:
+                    raise ValueError('more than %d POS tags' % SENTENCE_START)
+                self._words.append(_id(self._word_ids, self.words, word))
+                self._tags.append(tag_id | start)
+                start = 0
+        self._rows[key] = len(self._offsets) - 1
+        self._offsets.append(self._n_mapped + len(self._words))
+        self.changed = True
+
+    def _span(self, key):
+        row = self._rows[key]
+        return self._offsets[row], self._offsets[row + 1]
+
+    def _ids(self, start, end):
+        """Word and tag ids from `start` to `end`, on disk or not."""
+        if end <= self._n_mapped:
+            return (self._mapped_words[start:end].tolist(),
+                    self._mapped_tags[start:end].tolist())
+        start, end = start - self._n_mapped, end - self._n_mapped
+        return self._words[start:end], self._tags[start:end]
+
+    def sentences(self, key):
+        """The recap at `key` as a list of (word, tag) lists."""
+        words, tags = self._ids(*self._span(key))
+        found = []
+        for word, tag in zip(words, tags):
+            if tag & SENTENCE_START:
+                found.append([])
+            found[-1].append((self.words[word],
+                              self.tags[tag & ~SENTENCE_START]))
+        return found
+
+    def tokens(self, key):
+        """Every word of the recap at `key`, in order."""
+        words, _ = self._ids(*self._span(key))
+        return [self.words[i] for i in words]
+
+    def _tag(self, corpus, key=None):
+        key = key or self.key(corpus)
+        if key not in self._rows:
+            if not isinstance(corpus, basestring):
+                corpus = str(corpus)
+            self.add(key, iter_tagged(corpus))
+            run.count('recaps_pos_tagged')
+        return key
+
+    def tagged(self, corpus, key=None):
+        """Tagged sentences of `corpus`, tagging it if it is not cached."""
+        return self.sentences(self._tag(corpus, key))
+
+    def words_of(self, corpus, key=None):
+        """Every word of `corpus`, tagging it if it is not cached."""
+        return self.tokens(self._tag(corpus, key))
+
+    def cached_words(self, corpus, key=None):
+        """Every word of `corpus` if it is cached, else None. Never tags."""
+        key = key or self.key(corpus)
+        return self.tokens(key) if key in self._rows else None
+
+    def keys(self):
+        return self._rows.keys()
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def n_tokens(self):
+        return self._n_mapped + len(self._words)
+
+    def _map(self):
+        import numpy as np
+
+        if self._n_mapped == 0:
+            self._mapped_words = self._mapped_tags = None
+            return
+        words_file, tags_file = data_files(self.f)
+        self._mapped_words = np.memmap(words_file, dtype=np.int32, mode='r',
+                                       shape=(self._n_mapped,))
+        self._mapped_tags = np.memmap(tags_file, dtype=np.uint8, mode='r',
+                                      shape=(self._n_mapped,))
+
+    def flush(self):
+        """
+        Append the ids added since the last flush to the files on disk
+        and write the index. Does nothing for a cache without a file.
+        """
+        if self.f is None or not self.changed:
+            return
+        words_file, tags_file = data_files(self.f)
+        _append(words_file, 4 * self._n_mapped, self._words)
+        _append(tags_file, self._n_mapped, self._tags)
+        self._n_mapped += len(self._words)
+        self._words, self._tags = array('i'), array('B')
+        self._write_index()
+        self._map()
+        self.changed = False
+
+    def _write_index(self):
+        import numpy as np
+
+        # rows are written in the order they were added
+        keys = sorted(self._rows, key=self._rows.get)
+        with open(self.f + '.tmp', 'wb') as fh:
+            np.savez(fh,
+                keys=np.array(keys, dtype='S40'),
+                offsets=np.frombuffer(self._offsets, dtype=np.int64),
+                words=np.frombuffer(_blob(self.words), dtype=np.uint8),
+                tags=np.frombuffer(_blob(self.tags), dtype=np.uint8),
+                n_tokens=np.int64(self._n_mapped))
+        os.rename(self.f + '.tmp', self.f)
+
+    def prune(self, keys):
+        """
+        Drop every recap not in `keys`, and any words only they used. On
+        disk, the kept ids are copied a recap at a time into new files.
+        """
+        import numpy as np
+
+        keys = set(keys)
+        if keys.issuperset(self._rows):
+            return
+        self.flush()
+        kept = sorted(keys.intersection(self._rows), key=self._rows.get)
+
+        used = np.zeros(len(self.words), dtype=bool)
+        for key in kept:
+            used[np.asarray(self._ids(*self._span(key))[0])] = True
+        new_ids = np.cumsum(used, dtype=np.int32) - 1
+
+        words, tags = array('i'), array('B')
+        offsets, rows = array('l', [0]), {}
+        if self.f is not None:
+            words_file, tags_file = data_files(self.f)
+            out_words = open(words_file + '.tmp', 'wb')
+            out_tags = open(tags_file + '.tmp', 'wb')
+        for key in kept:
+            word_ids, tag_ids = self._ids(*self._span(key))
+            word_ids = new_ids[np.asarray(word_ids)]
+            tag_ids = np.asarray(tag_ids, dtype=np.uint8)
+            if self.f is None:
+                words.extend(word_ids.tolist())
+                tags.extend(tag_ids.tolist())
+            else:
+                word_ids.tofile(out_words)
+                tag_ids.tofile(out_tags)
+            rows[key] = len(offsets) - 1
+            offsets.append(offsets[-1] + len(word_ids))
+
+        self.words = [w for w, u in zip(self.words, used) if u]
+        self._word_ids = dict((w, i) for i, w in enumerate(self.words))
+        self._offsets, self._rows = offsets, rows
+        self.changed = True
+        if self.f is None:
+            self._words, self._tags = words, tags
+            return
+
+        out_words.close()
+        out_tags.close()
+        self._mapped_words = self._mapped_tags = None
+        os.rename(words_file + '.tmp', words_file)
+        os.rename(tags_file + '.tmp', tags_file)
+        self._n_mapped = offsets[-1]
+        self._write_index()
+        self._map()
+        self.changed = False
+
+def _blob(values):
+    return '\n'.join(v.encode('utf-8') if isinstance(v, unicode) else v
+                     for v in values)
+
+def read_token_cache(f=CACHE_FILE, version=None):
+    """
+    The cache indexed by `f`, with its ids memory-mapped. Empty if `f`
+    is missing or was written in an older format.
+    """
+    cache = TokenCache(version, f)
+    if not os.path.exists(f):
+        return cache
+
+    import numpy as np
+
+    npz = np.load(f)
+    if 'n_tokens' not in npz.files:
+        return cache
+    n_tokens = int(npz['n_tokens'])
+    if any(not os.path.exists(p) or os.path.getsize(p) < size
+           for p, size in zip(data_files(f), (4 * n_tokens, n_tokens))):
+        return cache
+
+    words, tags = npz['words'].tostring(), npz['tags'].tostring()
+    cache.words = [intern(w) for w in words.split('\n')] if words else []
+    cache.tags = tags.split('\n') if tags else []
+    cache._word_ids = dict((w, i) for i, w in enumerate(cache.words))
+    cache._tag_ids = dict((t, i) for i, t in enumerate(cache.tags))
+    cache._offsets = array('l', npz['offsets'].tolist())
+    cache._rows = dict((key, i) for i, key in enumerate(npz['keys'].tolist()))
+    cache._n_mapped = n_tokens
+    cache._map()
+    return cache
+
+def open_token_cache(f=CACHE_FILE):
+    """The token cache if one has been written, else None."""
+    return read_token_cache(f) if os.path.exists(f) else None
+
+def save_token_cache(cache, keys=None):
+    """
+    Write what `cache` added to disk, first dropping recaps not in
+    `keys` when given.
+    """
+    if keys is not None:
+        cache.prune(keys)
+    cache.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Tag every recap that is not in the token cache yet.')
+    parser.add_argument('--batch-rows', type=int, default=CHUNK_ROWS,
+                        help='recaps read from the franchise at a time')
+    args = parser.parse_args(argv)
+
+    with run.stage('tokens') as stage:
+        cache = read_token_cache()
+        keys = []
+        for df in iter_franchise(columns=['corpus'], dropna=['corpus'],
+                                 chunksize=args.batch_rows):
+            for corpus in df.corpus:
+                keys.append(cache._tag(corpus))
+            cache.flush()
+        save_token_cache(cache, keys)
+        stage.rows_in = len(keys)
+        stage.rows_out = cache.n_tokens()
+
+    print 'Tagged %d of %d recaps; %d words, %d distinct' % (
+        stage.counters['recaps_pos_tagged'], len(keys), cache.n_tokens(),
+        len(cache.words))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+vectorize.py
+
+Builds the episode x term count matrix for every recap once and keeps it
+on disk, so analyses can start from the matrix instead of tokenizing the
+corpus again:
+
+    Project/
+    |-- data/
+    |   |-- franchise/
+    |   |   |-- dtm.npz     <- sparse counts, row ids and vocabulary
+    |   |   |-- dtm.json    <- corpus digest and vectorizer settings
+
+The matrix is rebuilt automatically when the recap text, the stop words
+or the vectorizer settings change.
+
+When the token cache in `law_and_order.tokens` has every recap, words
+come from it and are split with CountVectorizer's own token pattern.
+Otherwise, or with `--no-token-cache`, the raw text is vectorized; one
+matrix never mixes the two, and vectorize never tags anything.
+
+    $ python -m law_and_order.vectorize              # build or refresh
+    $ python -m law_and_order.vectorize --no-token-cache
+    $ python -m law_and_order.vectorize topics -k 20 # NMF topics
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+import ujson as json
+
+from law_and_order.franchise import read_franchise
+from law_and_order.tokens import open_token_cache
+
+DTM_FILE  = './data/franchise/dtm.npz'
+META_FILE = './data/franchise/dtm.json'
+
+STOP_WORDS_FILE = './ref/stopwords.txt'
+
+PARAMS = {'min_df': 2, 'max_df': 0.95, 'lowercase': True}
+
+# recaps per batch, and passes over them, of a --minibatch topic fit
+BATCH_ROWS = 256
+N_EPOCHS   = 20
+
+EPS = 1e-10
+
+# CountVectorizer's default token_pattern
+TERMS = re.compile('(?u)\\b\\w\\w+\\b')
+
+def read_stop_words(f=STOP_WORDS_FILE):
+    return [word for word in open(f).read().split('\n') if word]
+
+def corpus_digest(df, params=PARAMS, version=None, stop_words=()):
+    h = hashlib.sha1(json.dumps(params, sort_keys=True))
+    if version is not None:
+        h.update(version)
+    h.update('\0'.join(sorted(stop_words)) + '\0\0')
+    for row_id, corpus in zip(df.index, df.corpus):
+        if isinstance(corpus, unicode):
+            corpus = corpus.encode('utf-8')
+        h.update('%d\0%s\0' % (row_id, corpus))
+    return h.hexdigest()
+
+def terms(words, stop_words):
+    """Lower-cased terms in already tokenized words, stop words dropped."""
+    return [term for word in words for term in TERMS.findall(word.lower())
+            if term not in stop_words]
+
+def build_dtm(df, params=PARAMS, tokens=None, stop_words=None):
+    """
+    Counts of every term in every recap, and the vocabulary. With a
+    `tokens.TokenCache` as `tokens`, terms come from its words.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    if stop_words is None:
+        stop_words = read_stop_words()
+    if tokens is None:
+        vec = CountVectorizer(stop_words=stop_words, **params)
+        counts = vec.fit_transform(df.corpus).tocsr()
+    else:
+        stop_words = frozenset(stop_words)
+        vec = CountVectorizer(analyzer=lambda doc: doc, **params)
+        counts = vec.fit_transform(terms(tokens.cached_words(corpus),
+                                         stop_words)
+                                   for corpus in df.corpus).tocsr()
+    vocabulary = sorted(vec.vocabulary_, key=vec.vocabulary_.get)
+    return counts, vocabulary
+
+def save_dtm(counts, row_ids, vocabulary, digest, f=DTM_FILE, meta=META_FILE):
+    import numpy as np
+
+    np.savez(f,
+        data=counts.data,
+        indices=counts.indices,
+        indptr=counts.indptr,
+        shape=counts.shape,
+        row_id=np.asarray(row_ids),
+        vocabulary=np.asarray(vocabulary))
+
+    with open(meta, 'w') as fh:
+        fh.write(json.dumps({
+            'digest': digest
+            , 'n_docs': counts.shape[0]
+            , 'n_terms': counts.shape[1]
+            , 'params': PARAMS
+        }))
+
+def read_dtm(f=DTM_FILE):
+    import numpy as np
+    from scipy import sparse
+
+    npz = np.load(f)
+    counts = sparse.csr_matrix(
+        (npz['data'], npz['indices'], npz['indptr']), shape=npz['shape'])
+    return counts, npz['row_id'], list(npz['vocabulary'])
+
+def load_dtm(df=None, f=DTM_FILE, meta=META_FILE, tokens=None):
+    """
+    The episode x term count matrix, its franchise row ids and its
+    vocabulary. Built and saved first if missing or stale, from the words
+    in `tokens` when given and it has every recap.
+    """
+    if df is None:
+        df = read_franchise(columns=['corpus'], dropna=['corpus'])
+    if tokens is not None and not all(tokens.key(corpus) in tokens
+                                      for corpus in df.corpus):
+        tokens = None
+    stop_words = read_stop_words()
+    digest = corpus_digest(df, version=None if tokens is None
+                           else tokens.version, stop_words=stop_words)
+
+    if os.path.exists(f) and os.path.exists(meta):
+        saved = json.loads(open(meta, 'r').read())
+        if saved['digest'] == digest:
+            return read_dtm(f)
+
+    print 'Vectorizing %d recaps' % len(df)
+    counts, vocabulary = build_dtm(df, tokens=tokens, stop_words=stop_words)
+    save_dtm(counts, df.index.values, vocabulary, digest, f, meta)
+    return counts, df.index.values, vocabulary
+
+def minibatch_nmf(X, k, batch_rows=BATCH_ROWS, n_epochs=N_EPOCHS,
+        n_inner=10, forget=0.7, random_state=0):
+    """
+    Components of a rank `k` NMF of the sparse matrix `X`, fit on
+    `batch_rows` shuffled rows at a time with multiplicative updates for
+    the Frobenius loss. Only one batch's weights and two k x n_terms
+    running sums are held besides `X` itself, which is never densified.
+    Sums from earlier batches are discounted by `forget` each batch.
+    """
+    import numpy as np
+
+    rng = np.random.RandomState(random_state)
+    X = X.tocsr()
+    n_rows, n_terms = X.shape
+    scale = np.sqrt(X.sum() / float(n_rows * n_terms * k))
+    H = scale * rng.rand(k, n_terms)
+    A = np.zeros((k, n_terms))
+    B = np.zeros((k, k))
+
+    for epoch in xrange(n_epochs):
+        order = rng.permutation(n_rows)
+        for start in xrange(0, n_rows, batch_rows):
+            batch = X[order[start:start + batch_rows]]
+            W = np.full((batch.shape[0], k), scale)
+            XHt, HHt = batch.dot(H.T), H.dot(H.T)
+            for _ in xrange(n_inner):
+                W *= XHt / np.maximum(W.dot(HHt), EPS)
+
+            A = forget * A + batch.T.dot(W).T
+            B = forget * B + W.T.dot(W)
+            for _ in xrange(n_inner):
+                H *= A / np.maximum(B.dot(H), EPS)
+    return H
+
+def topics(counts, vocabulary, k=10, n_words=10, minibatch=False):
+    """
+    Top `n_words` terms for each of `k` NMF topics, fit on the tf-idf
+    weighted counts. `minibatch` fits `BATCH_ROWS` recaps at a time to
+    bound memory, with scikit-learn's MiniBatchNMF when it has one and
+    `minibatch_nmf` otherwise.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfTransformer
+    from sklearn import decomposition
+
+    tfidf = TfidfTransformer().fit_transform(counts)
+
+    if minibatch and hasattr(decomposition, 'MiniBatchNMF'):
+        model = decomposition.MiniBatchNMF(n_components=k, init='nndsvda',
+                                           batch_size=BATCH_ROWS)
+        components = model.fit(tfidf).components_
+    elif minibatch:
+        components = minibatch_nmf(tfidf, k)
+    else:
+        model = decomposition.NMF(n_components=k, init='nndsvd')
+        components = model.fit(tfidf).components_
+
+    return [[vocabulary[i] for i in np.argsort(-component)[:n_words]]
+                for component in components]
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--no-token-cache', action='store_true',
+                        help='vectorize the raw text instead')
+    parser = argparse.ArgumentParser(description='Episode x term matrix.')
+    sub = parser.add_subparsers(dest='command')
+    sub.add_parser('build', help='build or refresh the matrix',
+                   parents=[common])
+    p = sub.add_parser('topics', help='NMF topics from the matrix',
+                       parents=[common])
+    p.add_argument('-k', type=int, default=10, help='number of topics')
+    p.add_argument('-n', type=int, default=10, help='words per topic')
+    p.add_argument('--minibatch', action='store_true',
+                   help='fit %d recaps at a time' % BATCH_ROWS)
+
+    # build is the default command, options and all
+    if not argv or argv[0].startswith('-') and argv[0] not in ('-h',
+                                                                '--help'):
+        argv = ['build'] + list(argv)
+    args = parser.parse_args(argv)
+
+    tokens = None if args.no_token_cache else open_token_cache()
+    counts, row_ids, vocabulary = load_dtm(tokens=tokens)
+    print '%d episodes x %d terms' % counts.shape
+
+    if args.command == 'topics':
+        for i, words in enumerate(topics(counts, vocabulary, args.k, args.n,
+                                         args.minibatch)):
+            print 'Topic %d: %s' % (i + 1, ' '.join(words))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+`law_and_order.crawl.cache.ResponseCache`.
+
+    $ python -m unittest discover
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from law_and_order.crawl.cache import ResponseCache
+
+HEADERS = {'ETag': '"v1"'}
+
+def store_pages(path, worker, n_pages):
+    cache = ResponseCache(path, save_interval=0)
+    for i in range(n_pages):
+        cache.store('http://a/%d/%d' % (worker, i), u'page %d' % i, HEADERS)
+    cache.close()
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.caches = []
+
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        shutil.rmtree(self.dir)
+
+    def cache(self, **kwargs):
+        cache = ResponseCache(os.path.join(self.dir, 'cache'), **kwargs)
+        self.caches.append(cache)
+        return cache
+
+    def test_store_same_body_twice(self):
+        cache = self.cache()
+        cache.store('http://a/1', u'recap', HEADERS)
+        cache.store('http://a/1', u'recap', HEADERS)
+        self.assertIsNotNone(cache.lookup('http://a/1'))
+        self.assertEqual(cache.read('http://a/1'), u'recap')
+        self.assertEqual(cache.size(), len('recap'))
+
+    def test_replaced_body_is_deleted(self):
+        cache = self.cache()
+        cache.store('http://a/1', u'old', HEADERS)
+        old = cache._object_path(cache.lookup('http://a/1')['digest'])
+        cache.store('http://a/1', u'new', HEADERS)
+        self.assertFalse(os.path.exists(old))
+        self.assertEqual(cache.read('http://a/1'), u'new')
+        self.assertEqual(cache.size(), len('new'))
+
+    def test_shared_body_outlives_one_url(self):
+        cache = self.cache(max_bytes=10)
+        cache.store('http://a/1', u'same', HEADERS)
+        cache.store('http://a/2', u'same', HEADERS)
+        self.assertEqual(cache.size(), 4)
+        cache.store('http://a/1', u'other', HEADERS)
+        self.assertEqual(cache.read('http://a/2'), u'same')
+
+    def test_least_recently_used_is_evicted(self):
+        cache = self.cache(max_bytes=10)
+        cache.store('http://a/1', u'aaaa', HEADERS)
+        cache.store('http://a/2', u'bbbb', HEADERS)
+        cache.read('http://a/1')
+        cache.store('http://a/3', u'cccc', HEADERS)
+        self.assertIsNone(cache.lookup('http://a/2'))
+        self.assertEqual(cache.read('http://a/1'), u'aaaa')
+        self.assertEqual(cache.size(), 8)
+
+    def test_index_is_written_on_close(self):
+        cache = self.cache()
+        cache.store('http://a/1', u'recap', HEADERS)
+        cache.close()
+        again = self.cache()
+        self.assertEqual(again.read('http://a/1'), u'recap')
+        self.assertEqual(again.validators(again.lookup('http://a/1')),
+                         {'If-None-Match': '"v1"'})
+
+    def test_processes_keep_each_others_entries(self):
+        path = os.path.join(self.dir, 'cache')
+        workers = [multiprocessing.Process(target=store_pages,
+                                           args=(path, worker, 50))
+                   for worker in range(4)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        cache = self.cache()
+        self.assertEqual(len(cache.index), 200)
+        self.assertEqual(cache.read('http://a/3/49'), u'page 49')
+        self.assertEqual(cache.size(), sum(len('page %d' % i)
+                                           for i in range(50)))
+
+if __name__ == '__main__':
+    unittest.main()
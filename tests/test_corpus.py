@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+`law_and_order.corpus`: writing the recap store and reading single
+recaps back from it.
+
+    $ python -m unittest discover
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from law_and_order import corpus
+
+RECAPS = [
+    ('svu', 2, 1, 'Benson takes the case.'),
+    ('original', 1, 2, u'Stone visits the caf\xe9.'),
+    ('svu', 1, 5, None),
+    ('svu', 1, 4, 'Stabler chases a suspect.'),
+]
+
+def frame(recaps):
+    import pandas as pd
+    return pd.DataFrame.from_records(recaps, columns=corpus.KEY + ['corpus'])
+
+class CorpusStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.blob = os.path.join(self.dir, 'corpus.bin')
+        self.index = os.path.join(self.dir, 'corpus_index.npz')
+        self.text = os.path.join(self.dir, 'episodes_and_recaps.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def store(self, recaps=RECAPS):
+        corpus.write_store(frame(recaps), self.blob, self.index)
+        return corpus.CorpusStore(self.blob, self.index)
+
+    def test_write_skips_missing_recaps(self):
+        self.assertEqual(corpus.write_store(frame(RECAPS), self.blob,
+                                            self.index), 3)
+
+    def test_keys_are_sorted(self):
+        with self.store() as store:
+            self.assertEqual(store.keys(), [('original', 1, 2), ('svu', 1, 4),
+                                            ('svu', 2, 1)])
+            self.assertEqual(len(store), 3)
+
+    def test_reads_recaps_as_utf8(self):
+        with self.store() as store:
+            self.assertEqual(store['svu', 2, 1], 'Benson takes the case.')
+            self.assertEqual(store['original', 1, 2],
+                             'Stone visits the caf\xc3\xa9.')
+            self.assertEqual(str(store.view(('svu', 1, 4))),
+                             'Stabler chases a suspect.')
+            self.assertEqual(store.at(1), 'Stabler chases a suspect.')
+            self.assertEqual(store.nbytes(), sum(len(store[key])
+                                                 for key in store.keys()))
+
+    def test_keys_from_the_command_line(self):
+        with self.store() as store:
+            self.assertIn(['svu', '2', '1'], store)
+            self.assertEqual(store[['svu', '2', '1']], store['svu', 2, 1])
+
+    def test_missing_recaps(self):
+        with self.store() as store:
+            self.assertNotIn(('svu', 1, 5), store)
+            self.assertIsNone(store.get(('svu', 1, 5)))
+            self.assertEqual(store.get(('svu', 9, 9), ''), '')
+            with self.assertRaises(KeyError):
+                store['svu', 1, 5]
+
+    def test_empty_store(self):
+        with self.store(RECAPS[2:3]) as store:
+            self.assertEqual(len(store), 0)
+            self.assertEqual(store.nbytes(), 0)
+
+    def test_open_store_only_when_up_to_date(self):
+        self.assertIsNone(corpus.open_store(self.blob, self.index, self.text))
+        self.store().close()
+        open(self.text, 'w').close()
+        os.utime(self.index, (1000000, 1000000))
+        self.assertIsNone(corpus.open_store(self.blob, self.index, self.text))
+        os.utime(self.text, (1000000, 1000000))
+        store = corpus.open_store(self.blob, self.index, self.text)
+        self.assertEqual(len(store), 3)
+        store.close()
+
+    def test_attached_store(self):
+        self.store().close()
+        corpus.attach(self.blob, self.index)
+        try:
+            self.assertEqual(corpus.stored(('svu', 2, 1)),
+                             'Benson takes the case.')
+        finally:
+            corpus._store.close()
+            corpus._store = None
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+`law_and_order.dedup`: which near-duplicate recaps are dropped and which
+one of each group is kept.
+
+    $ python -m unittest discover
+"""
+import random
+import unittest
+
+from law_and_order import dedup
+
+def recap(seed, n=200):
+    rng = random.Random(seed)
+    return ' '.join('w%d' % rng.randint(0, 5000) for _ in xrange(n))
+
+def edit(txt, position, word='x'):
+    words = txt.split()
+    words[position] = word
+    return ' '.join(words)
+
+class ShinglesTest(unittest.TestCase):
+
+    def test_case_and_punctuation_do_not_matter(self):
+        self.assertEqual(list(dedup.shingles('Jack McCoy objects, your honor!')),
+                         list(dedup.shingles('jack mccoy objects your honor')))
+
+    def test_short_texts_have_one_shingle(self):
+        self.assertEqual(len(dedup.shingles('objection sustained')), 1)
+        self.assertEqual(len(dedup.shingles('')), 0)
+
+class DuplicatesToDropTest(unittest.TestCase):
+
+    def test_distinct_recaps_are_kept(self):
+        texts = [recap(i) for i in range(20)]
+        self.assertEqual(dedup.duplicates_to_drop(texts), [])
+
+    def test_exact_copy_keeps_the_first(self):
+        a = recap(1)
+        self.assertEqual(dedup.duplicates_to_drop([a, recap(2), a]), [2])
+
+    def test_small_edits_keep_the_longest(self):
+        a = recap(1)
+        longer = a + ' and one more sentence at the end'
+        texts = [edit(a, 50), recap(2), longer, edit(a, 150)]
+        self.assertEqual(dedup.duplicates_to_drop(texts), [0, 3])
+
+    def test_groups_are_transitive(self):
+        a = recap(1)
+        b = edit(edit(a, 40), 160)
+        c = edit(edit(b, 80), 120)
+        similarity = lambda x, y: dedup.jaccard(dedup.shingles(x),
+                                                dedup.shingles(y))
+        # a and c are only alike through b
+        self.assertLess(similarity(a, c), 0.85)
+        self.assertGreater(min(similarity(a, b), similarity(b, c)), 0.85)
+        # every edit shortens the text, so a is kept
+        self.assertEqual(dedup.duplicates_to_drop([c, b, a], threshold=0.85),
+                         [0, 1])
+
+    def test_threshold(self):
+        a = recap(1)
+        b = edit(edit(edit(a, 40), 100), 160)
+        similarity = dedup.jaccard(dedup.shingles(a), dedup.shingles(b))
+        self.assertTrue(0.8 < similarity < 0.9, similarity)
+        self.assertEqual(dedup.duplicates_to_drop([a, b], threshold=0.9), [])
+        self.assertEqual(dedup.duplicates_to_drop([a, b], threshold=0.8), [1])
+
+    def test_missing_recaps_never_match(self):
+        a = recap(1)
+        texts = [None, a, '', float('nan'), '   ', None]
+        self.assertEqual(dedup.duplicates_to_drop(texts), [])
+
+    def test_near_duplicates_reports_similarity(self):
+        a = recap(1)
+        [(i, j, similarity)] = dedup.near_duplicates([a, recap(2), edit(a, 100)])
+        self.assertEqual((i, j), (0, 2))
+        self.assertAlmostEqual(similarity, dedup.jaccard(
+            dedup.shingles(a), dedup.shingles(edit(a, 100))))
+
+if __name__ == '__main__':
+    unittest.main()
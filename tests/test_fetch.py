@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+`law_and_order.crawl.fetch` against a local stand-in server: result
+order, retries with backoff, the per-host concurrency cap, and a whole
+tv.com season crawled from the saved pages in tests/fixtures/tvdotcom/.
+
+    $ python -m unittest discover
+"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import ujson as json
+
+# cache is imported here because the crawl imports it lazily, after
+# CrawlTest has changed directory
+from law_and_order.crawl import cache, fetch, tvdotcom
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'fixtures', 'tvdotcom')
+
+SEASON = '/shows/law-and-order-trial-by-jury/season-1/'
+GONE = '/shows/law-and-order-trial-by-jury/day-1075612/recap'
+
+class Response(object):
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+class Error(Exception):
+
+    def __init__(self, status_code=None):
+        Exception.__init__(self)
+        if status_code is not None:
+            self.response = Response(status_code)
+
+class TerminalTest(unittest.TestCase):
+
+    def test_client_errors_are_terminal(self):
+        for status in (400, 403, 404, 410):
+            self.assertTrue(fetch.is_terminal(Error(status)), status)
+
+    def test_timeouts_and_rate_limits_are_retried(self):
+        for status in (408, 429):
+            self.assertFalse(fetch.is_terminal(Error(status)), status)
+            self.assertIn(status, fetch.RETRY_STATUS)
+
+    def test_server_and_connection_errors_are_not_terminal(self):
+        self.assertFalse(fetch.is_terminal(Error(503)))
+        self.assertFalse(fetch.is_terminal(Error()))
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.times = {}
+        self.in_flight = self.max_in_flight = 0
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    /page/N      "page N", after a delay that is longest for the first
+                 pages, so they finish last
+    /flaky/N/K   503 for the first K requests, then "ok"
+    /status/S    always answers S
+    /slow/N      "slow N" after 50ms, counting requests in flight
+    anything else is a fixture: the season page, or a recap
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body='', content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            server.times.setdefault(self.path, []).append(time.time())
+            hits = server.hits[self.path]
+        parts = self.path.strip('/').split('/')
+
+        if parts[0] == 'page':
+            time.sleep(0.02 * (10 - int(parts[1])))
+            self.send(200, 'page %s' % parts[1])
+        elif parts[0] == 'flaky':
+            if hits <= int(parts[2]):
+                self.send(503)
+            else:
+                self.send(200, 'ok')
+        elif parts[0] == 'status':
+            self.send(int(parts[1]))
+        elif parts[0] == 'slow':
+            with server.lock:
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight,
+                                           server.in_flight)
+            time.sleep(0.05)
+            with server.lock:
+                server.in_flight -= 1
+            self.send(200, 'slow %s' % parts[1])
+        elif self.path == SEASON:
+            self.send_fixture('season.html')
+        elif self.path == GONE:
+            self.send(404)
+        elif self.path.endswith('/recap'):
+            self.send_fixture('recap.html')
+        else:
+            self.send(404)
+
+    def send_fixture(self, name):
+        with io.open(os.path.join(FIXTURES, name), encoding='utf-8') as fh:
+            body = fh.read().encode('utf-8')
+        self.send(200, body, 'text/html; charset=utf-8')
+
+class LocalServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.fetcher = fetch.Fetcher(retries=3, backoff=0.05, per_host=2,
+                                     verbose=False)
+
+    def tearDown(self):
+        self.fetcher.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path):
+        return self.base + path
+
+class FetcherTest(LocalServerTest):
+
+    def test_results_keep_url_order(self):
+        urls = [self.url('/page/%d' % i) for i in range(10)]
+        self.assertEqual(self.fetcher.fetch_all(urls, n_workers=8),
+                         ['page %d' % i for i in range(10)])
+
+    def test_server_errors_are_retried_with_backoff(self):
+        path = '/flaky/1/2'
+        self.assertEqual(self.fetcher.get(self.url(path)), 'ok')
+        self.assertEqual(self.server.hits[path], 3)
+        times = self.server.times[path]
+        # sleeps of backoff * 1, then backoff * 2
+        self.assertGreaterEqual(times[1] - times[0], 0.05)
+        self.assertGreaterEqual(times[2] - times[1], 0.1)
+
+    def test_retries_give_up(self):
+        path = '/flaky/2/10'
+        with self.assertRaises(fetch.FetchError):
+            self.fetcher.get(self.url(path))
+        self.assertEqual(self.server.hits[path], 4)
+
+    def test_rate_limits_are_retried_not_terminal(self):
+        url, text, error = list(self.fetcher.iter_fetch(
+            [self.url('/status/429')], errors=True))[0]
+        self.assertIsNone(text)
+        self.assertEqual(self.server.hits['/status/429'], 4)
+        self.assertFalse(fetch.is_terminal(error))
+
+    def test_client_errors_are_not_retried(self):
+        url, text, error = list(self.fetcher.iter_fetch(
+            [self.url('/status/404')], errors=True))[0]
+        self.assertIsNone(text)
+        self.assertEqual(self.server.hits['/status/404'], 1)
+        self.assertTrue(fetch.is_terminal(error))
+
+    def test_per_host_cap(self):
+        urls = [self.url('/slow/%d' % i) for i in range(12)]
+        pages = self.fetcher.fetch_all(urls, n_workers=8)
+        self.assertEqual(pages, ['slow %d' % i for i in range(12)])
+        self.assertEqual(self.server.max_in_flight, 2)
+
+class CrawlTest(LocalServerTest):
+
+    def setUp(self):
+        LocalServerTest.setUp(self)
+        self.cwd = os.getcwd()
+        self.dir = tempfile.mkdtemp()
+        os.chdir(self.dir)
+        os.makedirs('./data/trial_by_jury/recaps')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+        LocalServerTest.tearDown(self)
+
+    def test_crawl_season_from_base_url(self):
+        tvdotcom.main(['--show', 'trial_by_jury', '--workers', '2',
+                       '--base-url', self.base + '/'])
+        with open('./data/trial_by_jury/recaps/season_1.json') as fh:
+            recaps = json.loads(fh.read())['episode_recaps']
+
+        self.assertEqual(len(recaps), 4)
+        self.assertTrue(all(rec['corpus_url'].startswith(self.base)
+                            for rec in recaps))
+        failed = [rec for rec in recaps if 'error' in rec]
+        self.assertEqual([rec['corpus_url'] for rec in failed],
+                         [self.url(GONE)])
+        done = [rec for rec in recaps if 'error' not in rec]
+        self.assertTrue(all(rec['corpus'].startswith(
+            'A young mother is found dead') for rec in done))
+        self.assertEqual(self.server.hits[SEASON], 1)
+
+if __name__ == '__main__':
+    unittest.main()
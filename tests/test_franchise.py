@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+The Feather copy of the franchise against the text file it is made from.
+
+    $ python -m unittest discover
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from law_and_order import franchise
+
+def episodes():
+    return pd.DataFrame({
+        'show': ['svu', 'original', 'svu']
+        , 'nth_season': [2, 1, 1]
+        , 'no_in_season': [1, 3, 2]
+        , 'title': ['Caf\xc3\xa9 Society', 'Subterranean Homeboy Blues',
+                    'Wrong Is Right']
+        , 'original_air_date': ['2000-10-20', None, '1999-09-27']
+        , 'us_viewers_millions': [17.29, np.nan, 14.5]
+        , 'corpus': [np.nan, 'A young mother is found dead.', 'Jos\xc3\xa9.']
+    }, columns=['show', 'nth_season', 'no_in_season', 'title',
+                'original_air_date', 'us_viewers_millions', 'corpus'])
+
+@unittest.skipIf(franchise._arrow() is None, 'pyarrow is not installed')
+class FeatherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.text_file = os.path.join(self.dir, 'episodes_and_recaps.txt')
+        self.feather_file = os.path.join(self.dir,
+                                         'episodes_and_recaps.feather')
+        df = episodes()
+        df.to_csv(self.text_file, sep='|', index=False, encoding='utf-8')
+        franchise.write_feather(df, self.feather_file, self.text_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, **kwargs):
+        return franchise.read_franchise(text_file=self.text_file,
+                                        feather_file=self.feather_file,
+                                        **kwargs)
+
+    def read_text(self, **kwargs):
+        os.utime(self.feather_file, (0, 0))
+        try:
+            return self.read(**kwargs)
+        finally:
+            os.utime(self.feather_file, None)
+
+    def test_feather_is_written_and_used(self):
+        self.assertTrue(os.path.exists(self.feather_file))
+        self.assertTrue(franchise._use_feather(self.text_file,
+                                               self.feather_file))
+
+    def test_same_rows_as_the_text_file(self):
+        fast, text = self.read(), self.read_text()
+        text.original_air_date = pd.to_datetime(text.original_air_date)
+        self.assertEqual(list(fast.columns), list(text.columns))
+        self.assertEqual(fast.index.tolist(), text.index.tolist())
+        self.assertEqual(fast.index.tolist(), [1, 2, 0])
+        for col in fast.columns:
+            self.assertEqual(fast[col].dtype, text[col].dtype, col)
+            self.assertTrue(fast[col].equals(text[col]), col)
+        self.assertIs(type(fast.title[0]), str)
+
+    def test_columns_and_dropna(self):
+        df = self.read(columns=['title', 'corpus'], dropna=['corpus'])
+        self.assertEqual(list(df.columns), ['title', 'corpus'])
+        self.assertEqual(df.index.tolist(), [1, 2])
+
+    def test_chunks(self):
+        chunks = list(franchise.iter_franchise(
+            columns=['corpus'], chunksize=2, text_file=self.text_file,
+            feather_file=self.feather_file))
+        self.assertEqual([len(df) for df in chunks], [2, 1])
+        self.assertTrue(pd.concat(chunks).corpus.equals(self.read().corpus))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Reading crawled recaps and cleaning wikipedia columns in
+`law_and_order.join`.
+
+    $ python -m unittest discover
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import ujson as json
+
+from law_and_order import join
+
+class RecapFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, recaps):
+        f = os.path.join(self.dir, 'season_2.json')
+        with open(f, 'w') as fh:
+            fh.write(json.dumps({'episode_recaps': recaps}))
+        return f
+
+    def test_failed_pages_are_left_out(self):
+        ok = {'show': 'svu', 'nth_season': 2, 'nth_episode': 1,
+              'episode_title': 'Wrong Is Right', 'corpus': 'A body.',
+              'corpus_url': 'http://example.com/1'}
+        failed = dict(ok, nth_episode=2, corpus='',
+                      error='404 Client Error: Not Found')
+        df = join.json_to_dataframe(self.write([ok, failed]))
+        self.assertEqual(len(df), 1)
+        self.assertNotIn('error', df.columns)
+        self.assertEqual(df.corpus.tolist(), ['A body.'])
+
+    def test_only_failed_pages(self):
+        failed = {'show': 'svu', 'nth_season': 2, 'nth_episode': 2,
+                  'corpus': '', 'error': '410 Client Error: Gone'}
+        self.assertEqual(len(join.json_to_dataframe(self.write([failed]))), 0)
+
+if __name__ == '__main__':
+    unittest.main()
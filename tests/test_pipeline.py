@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Stage ordering and fingerprints in `law_and_order.pipeline`.
+
+    $ python -m unittest discover
+"""
+import os
+import unittest
+
+from law_and_order import pipeline
+
+def stage(name):
+    return [s for s in pipeline.stages(['svu']) if s.name == name][0]
+
+class SourcesTest(unittest.TestCase):
+
+    def names(self, name):
+        return [os.path.basename(p) for p in pipeline.sources(stage(name))]
+
+    def test_imported_modules_are_sources(self):
+        names = self.names('join')
+        for f in ('join.py', 'titles.py', 'dedup.py', 'corpus.py'):
+            self.assertIn(f, names)
+
+    def test_lazy_imports_are_sources(self):
+        names = self.names('entities')
+        self.assertIn('tokens.py', names)
+        self.assertIn('corpus.py', names)
+
+    def test_unrelated_modules_are_not(self):
+        self.assertNotIn('serve.py', self.names('join'))
+
+class LevelsTest(unittest.TestCase):
+
+    def test_crawls_run_side_by_side(self):
+        first = pipeline.levels(pipeline.stages())[0]
+        self.assertEqual(len(first), 2 * len(pipeline.show_names))
+        self.assertTrue(all(s.name.startswith('crawl.') for s in first))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+`law_and_order.search`: BM25 ranking, phrase matching, and incremental
+indexing that refreshes changed recaps and deletes stale ones.
+
+    $ python -m unittest discover
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from law_and_order import search
+
+RECAPS = [
+    ('svu', 1, 1, 'Payback', 'Benson and Stabler chase a cab driver. '
+     'The driver takes a plea bargain.'),
+    ('svu', 1, 2, 'Wanderlust', 'A plea is made to the jury, and the '
+     'bargain is struck later.'),
+    ('original', 1, 1, 'Prescription for Death', 'Stone offers a plea '
+     'bargain, then another plea bargain, then a third plea bargain.'),
+    ('original', 1, 2, 'Subterranean Homeboy Blues', 'Jack the Ripper '
+     'is quoted in court. Jack and the ripper theory fall apart.'),
+]
+
+def frame(recaps):
+    import pandas as pd
+    return pd.DataFrame.from_records(recaps, columns=['show', 'nth_season',
+        'no_in_season', 'title', 'corpus'])
+
+def keys(results):
+    return [(r['show'], r['nth_season'], r['no_in_season']) for r in results]
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.db = os.path.join(self.dir, 'search.db')
+        self._stop_words = search._stop_words
+        search._stop_words = set(['a', 'and', 'the', 'is', 'in', 'to'])
+
+    def tearDown(self):
+        search._stop_words = self._stop_words
+        shutil.rmtree(self.dir)
+
+    def find(self, q):
+        return keys(search.search(q, f=self.db))
+
+    def test_build_index(self):
+        self.assertEqual(search.build_index(frame(RECAPS), self.db), (4, 0))
+        self.assertEqual(self.find('cab'), [('svu', 1, 1)])
+        self.assertEqual(self.find('nothing'), [])
+
+    def test_bm25_ranks_frequent_terms_first(self):
+        search.build_index(frame(RECAPS), self.db)
+        results = search.search('plea', f=self.db)
+        self.assertEqual(keys(results)[0], ('original', 1, 1))
+        self.assertEqual(sorted(keys(results)), [('original', 1, 1),
+                                                 ('svu', 1, 1), ('svu', 1, 2)])
+        scores = [r['score'] for r in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_phrase_must_be_contiguous(self):
+        search.build_index(frame(RECAPS), self.db)
+        self.assertEqual(sorted(self.find('"plea bargain"')),
+                         [('original', 1, 1), ('svu', 1, 1)])
+        # both words, but not side by side
+        self.assertEqual(len(self.find('plea bargain')), 3)
+
+    def test_phrase_keeps_stop_word_offsets(self):
+        search.build_index(frame(RECAPS), self.db)
+        results = search.search('"jack the ripper"', f=self.db)
+        self.assertEqual(keys(results), [('original', 1, 2)])
+        self.assertTrue(results[0]['snippet'].startswith('Jack the Ripper'))
+        self.assertEqual(self.find('"jack ripper"'), [])
+
+    def test_every_phrase_must_match(self):
+        search.build_index(frame(RECAPS), self.db)
+        self.assertEqual(self.find('"plea bargain" driver'), [('svu', 1, 1)])
+
+    def test_unchanged_recaps_are_skipped(self):
+        search.build_index(frame(RECAPS), self.db)
+        self.assertEqual(search.build_index(frame(RECAPS), self.db), (0, 0))
+
+    def test_changed_recap_is_reindexed(self):
+        search.build_index(frame(RECAPS), self.db)
+        recaps = list(RECAPS)
+        recaps[0] = recaps[0][:4] + ('Benson finds the cab in a garage.',)
+        self.assertEqual(search.build_index(frame(recaps), self.db), (1, 0))
+        self.assertEqual(self.find('garage'), [('svu', 1, 1)])
+        self.assertEqual(self.find('driver'), [])
+
+    def test_stale_episodes_are_removed(self):
+        search.build_index(frame(RECAPS), self.db)
+        recaps = list(RECAPS[1:])
+        # an episode that lost its recap is removed too
+        recaps[0] = recaps[0][:4] + (None,)
+        self.assertEqual(search.build_index(frame(recaps), self.db), (0, 2))
+        self.assertEqual(self.find('cab'), [])
+        self.assertEqual(self.find('jury'), [])
+        self.assertEqual(self.find('ripper'), [('original', 1, 2)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+`law_and_order.serve`: credit splitting, name folding, episode filters,
+the response cache, and the status codes the handler sends.
+
+    $ python -m unittest discover
+"""
+import threading
+import unittest
+import urllib2
+
+import ujson as json
+
+from law_and_order import serve
+
+def episode(show, season, no, written_by=None, directed_by=None,
+            viewers=None):
+    return {'show': show, 'nth_season': season, 'no_in_season': no,
+            'no_in_series': no, 'title': '%s %d %d' % (show, season, no),
+            'original_air_date': None, 'us_viewers_millions': viewers,
+            'written_by': written_by, 'directed_by': directed_by,
+            'production_code': None}
+
+EPISODES = [
+    episode('svu', 1, 1, 'Dick Wolf', 'Jean de Segonzac', 12.5),
+    episode('svu', 1, 2, 'Teleplay: Robert Palm Story by: Dick Wolf & '
+            'Ren\xc3\xa9 Balcer', 'Constantine Makris'),
+    episode('svu', 2, 1, 'Ren\xc3\xa9 Balcer', 'Jean de Segonzac', 14.0),
+    episode('original', 1, 1, 'Dick Wolf and Robert Palm', 'Ed Sherin'),
+]
+
+CHARACTERS = {
+    ('svu', 1, 1): ['Olivia Benson', 'Elliot Stabler'],
+    ('svu', 2, 1): ['Olivia Benson'],
+}
+
+class CreditedTest(unittest.TestCase):
+
+    def test_splits_teleplay_and_story(self):
+        self.assertEqual(serve.credited(EPISODES[1]['written_by']),
+                         ['Robert Palm', 'Dick Wolf', 'Ren\xc3\xa9 Balcer'])
+
+    def test_splits_and_and_commas(self):
+        self.assertEqual(serve.credited('A One, B Two and C Three'),
+                         ['A One', 'B Two', 'C Three'])
+
+    def test_repeated_names_once(self):
+        self.assertEqual(serve.credited('Written by: A One & A One'),
+                         ['A One'])
+
+    def test_missing_credit(self):
+        self.assertEqual(serve.credited(None), [])
+        self.assertEqual(serve.credited(float('nan')), [])
+
+class FoldTest(unittest.TestCase):
+
+    def test_case_accents_and_whitespace(self):
+        self.assertEqual(serve.fold('  Ren\xc3\xa9   BALCER '), 'rene balcer')
+        self.assertEqual(serve.fold(u'Ren\xe9 Balcer'), 'rene balcer')
+
+class RowsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = serve.FranchiseIndex(EPISODES, characters=CHARACTERS)
+
+    def test_no_filters_is_everything(self):
+        self.assertEqual(list(self.index.rows({})), [0, 1, 2, 3])
+
+    def test_show_and_season(self):
+        self.assertEqual(self.index.rows({'show': 'svu'}), [0, 1, 2])
+        self.assertEqual(self.index.rows({'show': 'svu', 'season': '1'}),
+                         [0, 1])
+
+    def test_writer_without_accents_or_case(self):
+        self.assertEqual(self.index.rows({'writer': 'rene balcer'}), [1, 2])
+        self.assertEqual(self.index.rows({'writer': 'DICK WOLF'}), [0, 1, 3])
+
+    def test_partial_name(self):
+        self.assertEqual(self.index.rows({'director': 'segonzac'}), [0, 2])
+
+    def test_filters_combine(self):
+        self.assertEqual(self.index.rows({'writer': 'dick wolf',
+                                          'show': 'svu'}), [0, 1])
+        self.assertEqual(self.index.rows({'character': 'olivia benson',
+                                          'show': 'svu', 'season': '2'}), [2])
+
+    def test_no_match(self):
+        self.assertEqual(self.index.rows({'writer': 'nobody'}), [])
+
+    def test_bad_season(self):
+        for query in ({'show': 'svu', 'season': 'five'}, {'season': '1'}):
+            with self.assertRaises(serve.QueryError) as e:
+                self.index.rows(query)
+            self.assertEqual(e.exception.status, 400)
+
+    def test_characters_need_an_entity_cache(self):
+        index = serve.FranchiseIndex(EPISODES)
+        self.assertFalse(index.has_characters)
+        with self.assertRaises(serve.QueryError) as e:
+            index.rows({'character': 'olivia benson'})
+        self.assertEqual(e.exception.status, 503)
+        with self.assertRaises(serve.QueryError) as e:
+            serve.answer(index, '/characters', {})
+        self.assertEqual(e.exception.status, 503)
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = serve.ResponseCache(size=2)
+        cache.put('a', '1')
+        cache.put('b', '2')
+        self.assertEqual(cache.get('a'), '1')
+        cache.put('c', '3')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), '1')
+        self.assertEqual(cache.get('c'), '3')
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_put_replaces(self):
+        cache = serve.ResponseCache(size=2)
+        cache.put('a', '1')
+        cache.put('a', '2')
+        self.assertEqual(len(cache.items), 1)
+        self.assertEqual(cache.get('a'), '2')
+
+class Broken(serve.FranchiseIndex):
+
+    def viewership(self, rows):
+        raise KeyError('us_viewers_millions')
+
+class HandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        index = Broken(EPISODES, characters=CHARACTERS)
+        handler = serve.make_handler(index, serve.ResponseCache())
+        self.server = serve.Server(('127.0.0.1', 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def get(self, path):
+        url = 'http://127.0.0.1:%d%s' % (self.server.server_address[1], path)
+        try:
+            response = urllib2.urlopen(url)
+        except urllib2.HTTPError as e:
+            response = e
+        return (response.getcode(), response.info().get('X-Cache'),
+                json.loads(response.read()))
+
+    def test_answers_and_caches(self):
+        self.assertEqual(self.get('/episodes?show=original')[:2], (200, 'miss'))
+        status, hit, body = self.get('/episodes?show=original')
+        self.assertEqual((status, hit), (200, 'hit'))
+        self.assertEqual([e['title'] for e in body], ['original 1 1'])
+
+    def test_query_errors(self):
+        self.assertEqual(self.get('/episodes?season=1')[0], 400)
+        self.assertEqual(self.get('/episodes/svu/9/9')[0], 404)
+
+    def test_unexpected_errors_are_500(self):
+        # keep the expected traceback out of the test output
+        print_exc = serve.traceback.print_exc
+        serve.traceback.print_exc = lambda: None
+        try:
+            status, _, body = self.get('/viewership?show=svu')
+        finally:
+            serve.traceback.print_exc = print_exc
+        self.assertEqual(status, 500)
+        self.assertEqual(body, {'error': 'internal error'})
+        # the server is still up
+        self.assertEqual(self.get('/shows')[0], 200)
+
+if __name__ == '__main__':
+    unittest.main()
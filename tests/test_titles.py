@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+`law_and_order.titles`: title normalization and one-to-one matching of
+recaps to episodes across numbering that drifts between sites.
+
+    $ python -m unittest discover
+"""
+import unittest
+
+from law_and_order import titles
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_part_numbers_are_spelled_one_way(self):
+        for title in ['Day (2)', 'Day Pt. 2', 'Day (Part 2)', 'Day (Part II)',
+                      'day, part 2']:
+            self.assertEqual(titles.normalize_title(title), u'day part 2')
+
+    def test_punctuation_and_case(self):
+        self.assertEqual(titles.normalize_title('"Sheltered"  Life!'),
+                         u'sheltered life')
+        self.assertEqual(titles.normalize_title('Caf\xc3\xa9'), u'caf\xe9')
+
+    def test_missing_title(self):
+        self.assertEqual(titles.normalize_title(None), '')
+        self.assertEqual(titles.normalize_title(float('nan')), '')
+
+class MatchTitlesTest(unittest.TestCase):
+
+    def test_matches_by_title_not_number(self):
+        episodes = [(1, 1, 'Payback'), (1, 2, 'Wanderlust'),
+                    (1, 3, 'Sophomore Jinx')]
+        # listed in reverse, numbered the other way round
+        recaps = [(1, 1, 'Sophomore Jinx'), (1, 2, 'Wanderlust'),
+                  (1, 3, 'Payback')]
+        self.assertEqual(titles.match_titles(episodes, recaps),
+                         [(0, 2, 1.0), (1, 1, 1.0), (2, 0, 1.0)])
+
+    def test_each_recap_and_episode_matched_once(self):
+        episodes = [(1, 1, 'Payback'), (1, 2, 'Payback')]
+        recaps = [(1, 2, 'Payback')]
+        # the tie goes to the episode with the same number
+        self.assertEqual(titles.match_titles(episodes, recaps),
+                         [(1, 0, 1.0)])
+
+    def test_seasons_outside_the_window_are_not_matched(self):
+        episodes = [(1, 1, 'Payback'), (3, 1, 'Payback')]
+        recaps = [(3, 5, 'Payback')]
+        self.assertEqual(titles.match_titles(episodes, recaps),
+                         [(1, 0, 1.0)])
+        self.assertEqual(titles.match_titles(episodes[:1], recaps), [])
+        self.assertEqual(titles.match_titles(episodes[:1], recaps, window=2),
+                         [(0, 0, 1.0)])
+
+    def test_parts_of_a_two_part_episode(self):
+        episodes = [(2, 10, 'Day')]
+        recaps = [(2, 10, 'Day (Part 2)')]
+        [(e, r, confidence)] = titles.match_titles(episodes, recaps)
+        self.assertEqual((e, r), (0, 0))
+        self.assertGreaterEqual(confidence, titles.PART_SCORE)
+
+    def test_unmatched_title_falls_back_to_position(self):
+        episodes = [(4, 7, '41 Shots'), (4, 8, 'Payback')]
+        recaps = [(4, 7, 'Forty-One Shots'), (4, 8, 'Payback')]
+        matches = titles.match_titles(episodes, recaps)
+        self.assertEqual([(e, r) for e, r, _ in matches], [(0, 0), (1, 1)])
+        self.assertLess(matches[0][2], titles.MIN_SCORE)
+
+    def test_no_fallback_onto_a_taken_episode(self):
+        episodes = [(1, 1, 'Payback')]
+        recaps = [(1, 2, 'Payback'), (1, 1, 'Something Else Entirely')]
+        self.assertEqual(titles.match_titles(episodes, recaps),
+                         [(0, 0, 1.0)])
+
+    def test_weak_matches_are_dropped(self):
+        episodes = [(1, 1, 'Payback')]
+        recaps = [(1, 9, 'Paycheck')]
+        self.assertEqual(titles.match_titles(episodes, recaps), [])
+        self.assertEqual(titles.match_titles(episodes, recaps, min_score=0.1),
+                         [(0, 0, titles.score(u'payback', u'paycheck'))])
+
+if __name__ == '__main__':
+    unittest.main()
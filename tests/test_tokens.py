@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+The memory-mapped token cache in `law_and_order.tokens`.
+
+    $ python -m unittest discover
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from law_and_order import tokens
+
+VERSION = 'test'
+
+RECAPS = {
+    'a': [[('Briscoe', 'NNP'), ('laughs', 'VBZ'), ('.', '.')],
+          [('Green', 'NNP'), ('does', 'VBZ'), ("n't", 'RB'), ('.', '.')]],
+    'b': [[('Logan', 'NNP'), ('runs', 'VBZ'), ('.', '.')]],
+    'c': [[('McCoy', 'NNP'), ('objects', 'VBZ'), ('.', '.')]],
+}
+
+class TokenCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.f = os.path.join(self.dir, 'token_cache.npz')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        return tokens.read_token_cache(self.f, VERSION)
+
+    def test_flushed_recaps_are_mapped(self):
+        cache = self.read()
+        cache.add('a', RECAPS['a'])
+        cache.flush()
+        cache.add('b', RECAPS['b'])
+        self.assertEqual(cache.sentences('a'), RECAPS['a'])
+        self.assertEqual(cache.sentences('b'), RECAPS['b'])
+        self.assertIsNotNone(cache._mapped_words)
+        self.assertEqual(len(cache._words), 3)
+        cache.flush()
+
+        again = self.read()
+        self.assertEqual(len(again), 2)
+        self.assertEqual(len(again._words), 0)
+        for key in ('a', 'b'):
+            self.assertEqual(again.sentences(key), RECAPS[key])
+        self.assertEqual(again.tokens('b'), ['Logan', 'runs', '.'])
+
+    def test_unflushed_tail_is_not_read(self):
+        cache = self.read()
+        cache.add('a', RECAPS['a'])
+        cache.flush()
+        words_file, _ = tokens.data_files(self.f)
+        with open(words_file, 'ab') as fh:
+            fh.write('\0' * 12)
+        cache = self.read()
+        cache.add('b', RECAPS['b'])
+        cache.flush()
+        self.assertEqual(self.read().sentences('b'), RECAPS['b'])
+        self.assertEqual(os.path.getsize(words_file), 4 * 10)
+
+    def test_prune(self):
+        cache = self.read()
+        for key in sorted(RECAPS):
+            cache.add(key, RECAPS[key])
+        cache.flush()
+        tokens.save_token_cache(cache, ['a', 'c'])
+        self.assertNotIn('Logan', cache.words)
+
+        again = self.read()
+        self.assertEqual(sorted(again.keys()), ['a', 'c'])
+        self.assertEqual(again.sentences('c'), RECAPS['c'])
+        self.assertEqual(again.sentences('a'), RECAPS['a'])
+        self.assertEqual(again.n_tokens(), 10)
+
+    def test_prune_in_memory(self):
+        cache = tokens.TokenCache(VERSION)
+        for key in sorted(RECAPS):
+            cache.add(key, RECAPS[key])
+        cache.prune(['b'])
+        self.assertEqual(cache.keys(), ['b'])
+        self.assertEqual(cache.sentences('b'), RECAPS['b'])
+        self.assertEqual(sorted(cache.words), ['.', 'Logan', 'runs'])
+
+    def test_cached_words(self):
+        cache = self.read()
+        key = cache.key('Logan runs.')
+        cache.add(key, RECAPS['b'])
+        self.assertEqual(cache.cached_words('Logan runs.'),
+                         ['Logan', 'runs', '.'])
+        self.assertIsNone(cache.cached_words('McCoy objects.'))
+
+    def test_missing_or_old_cache_is_empty(self):
+        self.assertIsNone(tokens.open_token_cache(self.f))
+        import numpy as np
+        np.savez(open(self.f, 'wb'), keys=np.array(['a'], dtype='S40'))
+        self.assertEqual(len(self.read()), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+The targeted tv.com parsers against full-document parsing.
+
+`law_and_order.crawl.tvdotcom` strains season pages down to the episode
+list and reads recap text with one lxml XPath. Both must give what the
+crawler used to get from a BeautifulSoup tree of the whole page, which
+is kept here as `full_links` and `full_corpus`. The pages are saved in
+tests/fixtures/tvdotcom/.
+
+    $ python -m unittest discover
+"""
+import io
+import os
+import unittest
+
+from law_and_order.crawl import tvdotcom
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'fixtures', 'tvdotcom')
+
+def fixture(name):
+    with io.open(os.path.join(FIXTURES, name), encoding='utf-8') as fh:
+        return fh.read()
+
+def season_links(soup):
+    return tvdotcom.identify_links([tvdotcom.find_links(ep)
+                                    for ep in tvdotcom.find_episodes(soup)])
+
+def full_links(html):
+    return season_links(tvdotcom.make_soup(html))
+
+def full_corpus(html):
+    corpus = tvdotcom.make_soup(html).find_all('div', {'class': 'text'})
+    if len(corpus) == 1:
+        return tvdotcom.utf8ify(corpus[0].get_text())
+    return ''
+
+class SeasonPageTest(unittest.TestCase):
+
+    def links(self, name):
+        html = fixture(name)
+        fast = season_links(tvdotcom.make_soup(
+            html, parse_only=tvdotcom.season_strainer()))
+        self.assertEqual(fast, full_links(html))
+        return fast
+
+    def test_episode_list(self):
+        links = self.links('season.html')
+        self.assertEqual([link['title'] for link in links],
+                         [u'Day', u'Baby Boom',
+                          u'Truth & Consequences – Part\xa0I',
+                          u'Caf\xe9 Society'])
+        self.assertEqual(links[1]['Episode Overview'],
+                         '/shows/law-and-order-trial-by-jury/baby-boom-414263/')
+
+    def test_no_episodes(self):
+        self.assertEqual(self.links('season_no_episodes.html'), [])
+
+class RecapPageTest(unittest.TestCase):
+
+    def corpus(self, name):
+        html = fixture(name)
+        fast = tvdotcom.find_corpus(html)
+        self.assertEqual(fast, full_corpus(html))
+        return fast
+
+    def test_recap(self):
+        corpus = self.corpus('recap.html')
+        self.assertTrue(corpus.startswith('A young mother is found dead'))
+        self.assertIn('Kibre\xe2\x80\x99s case', corpus)
+        self.assertIn('Jos\xc3\xa9 Ram\xc3\xadrez', corpus)
+
+    def test_missing_recap(self):
+        self.assertEqual(self.corpus('recap_missing.html'), '')
+
+    def test_two_recaps(self):
+        self.assertEqual(self.corpus('recap_two_texts.html'), '')
+
+    def test_malformed_recap(self):
+        self.assertIn('loan shark', self.corpus('recap_malformed.html'))
+
+    def test_preformatted_recap(self):
+        corpus = self.corpus('recap_preformatted.html')
+        self.assertIn('Count 1:   Guilty\n    Count 2:', corpus)
+
+    def test_empty_page(self):
+        self.assertEqual(tvdotcom.find_corpus(u'  '), '')
+
+if __name__ == '__main__':
+    unittest.main()
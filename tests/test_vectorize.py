@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+The cached episode x term matrix in `law_and_order.vectorize`, in a
+throwaway project directory.
+
+    $ python -m unittest discover
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from law_and_order import vectorize
+
+RECAPS = [
+    'Briscoe and Green find the body of a doctor in the park.',
+    'The doctor was poisoned, and the park ranger saw everything.',
+    'McCoy argues the ranger lied about the poison and the doctor.',
+]
+
+class DtmTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.dir = tempfile.mkdtemp()
+        os.chdir(self.dir)
+        os.makedirs('data/franchise')
+        os.makedirs('ref')
+        with open('data/franchise/episodes_and_recaps.txt', 'w') as fh:
+            fh.write('show|nth_season|no_in_season|corpus\n')
+            for i, corpus in enumerate(RECAPS):
+                fh.write('original|1|%d|%s\n' % (i + 1, corpus))
+        self.stop_words(['the', 'and'])
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def stop_words(self, words):
+        with open('ref/stopwords.txt', 'w') as fh:
+            fh.write('\n'.join(words))
+
+    def test_stop_words_change_the_matrix(self):
+        _, _, vocabulary = vectorize.load_dtm()
+        self.assertEqual(vocabulary, ['park', 'ranger'])
+
+        self.stop_words(['the', 'and', 'park'])
+        _, _, vocabulary = vectorize.load_dtm()
+        self.assertEqual(vocabulary, ['ranger'])
+
+    def test_unchanged_matrix_is_reused(self):
+        vectorize.load_dtm()
+        os.utime(vectorize.DTM_FILE, (1000000, 1000000))
+        vectorize.load_dtm()
+        self.assertEqual(os.path.getmtime(vectorize.DTM_FILE), 1000000)
+
+    def test_options_without_a_command_build(self):
+        vectorize.main(['--no-token-cache'])
+        self.assertTrue(os.path.exists(vectorize.DTM_FILE))
+
+class MinibatchTest(unittest.TestCase):
+
+    def test_same_topics_as_a_full_fit(self):
+        import numpy as np
+        from scipy import sparse
+
+        rng = np.random.RandomState(0)
+        W = np.repeat(np.eye(3), 20, axis=0)
+        H = np.repeat(np.eye(3), 5, axis=1)
+        X = sparse.csr_matrix(W.dot(H) * (1 + 0.1 * rng.rand(60, 15)))
+        components = vectorize.minibatch_nmf(X, 3, batch_rows=16)
+        found = sorted(tuple(np.argsort(-c)[:5]) for c in components)
+        self.assertEqual([sorted(t) for t in found],
+                         [range(0, 5), range(5, 10), range(10, 15)])
+
+if __name__ == '__main__':
+    unittest.main()